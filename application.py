@@ -2,11 +2,13 @@ from __future__ import annotations
 
 import streamlit as st
 import pandas as pd
-import yfinance as yf
 from pathlib import Path
 from datetime import datetime
 import time
 
+from market_data import get_provider
+from workbook_cache import read_excel_cached
+
 
 # =========================================================
 # CONFIG — PUT YOUR FILE PATH HERE
@@ -51,7 +53,7 @@ class FutureExpiryProcessor:
         if not self.file_path.exists():
             raise DataFileError("Data file not found")
 
-        self.df = pd.read_excel(self.file_path)
+        self.df = read_excel_cached(self.file_path)
 
     # -----------------------------
     # Validate Columns
@@ -109,20 +111,18 @@ class PriceFetcher:
     @staticmethod
     def fetch_prices(tickers):
 
+        # One batched, cached lookup for the whole table
+        price_map = get_provider().last_prices(tickers)
+
         prices = []
 
         for ticker in tickers:
 
-            try:
-                stock = yf.Ticker(ticker)
-                price = stock.fast_info.last_price
+            price = price_map.get(str(ticker).strip())
 
-                prices.append(
-                    round(price, 2) if price else None
-                )
-
-            except Exception:
-                prices.append(None)
+            prices.append(
+                round(price, 2) if price else None
+            )
 
         return prices
 
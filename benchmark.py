@@ -0,0 +1,671 @@
+"""
+Pipeline Benchmark Harness
+--------------------------
+Times each ETL stage against synthetic workbooks, the deterministic fake
+market-data backend and a SQLite stand-in for SQL Server, so the
+pipelines can be measured without a live database or Yahoo connection.
+
+    python benchmark.py --rows 1000 100000 --repeat 3
+    python benchmark.py --rows 1000 --compare benchmark_results/abc1234.json
+    python benchmark.py --stages startup      # cold-start latency of the jobs
+    python benchmark.py --stages whisper      # per-chunk transcription latency
+
+Results are written as JSON (one file per commit) for regression tracking.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+from market_data import FakeMarketDataProvider, set_provider
+
+
+logger = logging.getLogger("PipelineBenchmark")
+
+RESULTS_DIR = Path("benchmark_results")
+WORKBOOK_DIR = Path(tempfile.gettempdir()) / "pipeline_benchmark_workbooks"
+
+UNIVERSE = [
+    "AAPL", "MSFT", "AMZN", "NVDA", "GOOGL", "META", "TSLA", "JPM", "V", "XOM",
+    "PG", "MA", "HD", "LLY", "CVX", "MRK", "ABBV", "PEP", "KO", "AVGO",
+    "COST", "BAC", "TMO", "WMT", "CSCO", "MCD", "ABT", "CRM", "ACN", "DHR",
+    "LIN", "ORCL", "ADBE", "NKE", "TXN", "NEE", "AMD", "NFLX", "QCOM", "HON",
+    "INTC", "IBM", "INTU", "CAT", "AMAT", "GE", "BA", "GS", "BLK", "UBER",
+]
+
+BENCH_TODAY = pd.Timestamp(datetime.today().date())
+
+
+# ============================================================
+# Synthetic Workbooks
+# ============================================================
+
+def _trade_dates(rng: np.random.Generator, rows: int) -> pd.DatetimeIndex:
+    days = pd.bdate_range(BENCH_TODAY - timedelta(days=730), BENCH_TODAY)
+    return pd.DatetimeIndex(days[rng.integers(0, len(days), rows)])
+
+
+def synthetic_option_entries(rows: int, seed: int = 7) -> pd.DataFrame:
+    """OptionEntries layout used by extraction.py and filled_data.py."""
+
+    rng = np.random.default_rng(seed)
+    trade_dates = _trade_dates(rng, rows)
+    expiry = trade_dates + pd.to_timedelta(rng.integers(3, 90, rows), unit="D")
+
+    price = np.round(rng.uniform(20, 500, rows), 2)
+    sp_end = np.round(price * rng.normal(1.0, 0.05, rows), 2)
+
+    df = pd.DataFrame({
+        "Date": trade_dates,
+        "Sticker": rng.choice(UNIVERSE, rows),
+        "Expiry Date": expiry,
+        "Stock Price": price,
+        "SP_End": sp_end,
+    })
+
+    # Gaps the enrichment scripts are meant to fill
+    df.loc[rng.random(rows) < 0.3, "Stock Price"] = np.nan
+    df.loc[rng.random(rows) < 0.4, "SP_End"] = np.nan
+    df.loc[rng.random(rows) < 0.2, "Expiry Date"] = pd.NaT
+
+    return df
+
+
+def synthetic_option_spreads(rows: int, seed: int = 11) -> pd.DataFrame:
+    """Layout of option_spreads_data.xlsx / dbo.option_spreads."""
+
+    rng = np.random.default_rng(seed)
+    trade_dates = _trade_dates(rng, rows)
+    days = rng.integers(7, 60, rows)
+    expiry = trade_dates + pd.to_timedelta(days, unit="D")
+
+    ticker_price = np.round(rng.uniform(20, 500, rows), 2)
+    width = rng.choice([1.0, 2.5, 5.0, 10.0], rows)
+    lower = np.round(ticker_price * rng.uniform(0.85, 1.05, rows), 0)
+    upper = lower + width
+    option_price = np.round(width * rng.uniform(0.1, 0.45, rows), 2)
+    quantity = rng.integers(1, 20, rows)
+    contract_amount = np.round(option_price * quantity * 100, 2)
+    coll_amount = np.round((width - option_price) * quantity * 100, 2)
+
+    status = rng.choice(["OPEN", "CLOSED", "EXPIRED"], rows, p=[0.3, 0.4, 0.3])
+    closed = status != "OPEN"
+
+    return pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "trade_date": trade_dates,
+        "ticker": rng.choice(UNIVERSE, rows),
+        "ticker_price": ticker_price,
+        "option_type": rng.choice(["PUT", "CALL"], rows),
+        "tran_type": rng.choice(["Credit", "Debit"], rows, p=[0.8, 0.2]),
+        "option_price": option_price,
+        "strike_price_lower": lower,
+        "strike_price_upper": upper,
+        "option_quantity": quantity,
+        "contract_amount": contract_amount,
+        "coll_amount": coll_amount,
+        "rate_of_return": np.round(contract_amount / coll_amount, 4),
+        "expiration_date": expiry,
+        "num_of_days": days,
+        "status": status,
+        "status_change_date": pd.Series(expiry).where(closed),
+        "status_change_price": np.where(closed, np.round(ticker_price * rng.normal(1, 0.05, rows), 2), np.nan),
+        "cost_of_contract": contract_amount,
+        "cost_of_close": np.where(closed, np.round(contract_amount * rng.uniform(0, 0.5, rows), 2), np.nan),
+    })
+
+
+def synthetic_sp500(rows: int, seed: int = 13) -> pd.DataFrame:
+    """Layout of the SP500 workbook loaded into dbo.TickerMaster."""
+
+    rng = np.random.default_rng(seed)
+    symbols = [UNIVERSE[i % len(UNIVERSE)] + (f".{i // len(UNIVERSE)}" if i >= len(UNIVERSE) else "") for i in range(rows)]
+
+    return pd.DataFrame({
+        "tickerSymbol": symbols,
+        "companyName": [f"Company {i}" for i in range(rows)],
+        "sector": rng.choice(["Technology", "Health Care", "Financials", "Energy", "Industrials"], rows),
+        "marketCap": np.round(rng.lognormal(24, 1.2, rows), 0),
+    })
+
+
+WORKBOOKS: Dict[str, Callable[[int], pd.DataFrame]] = {
+    "option_entries": synthetic_option_entries,
+    "option_spreads": synthetic_option_spreads,
+    "sp500": synthetic_sp500,
+}
+
+
+def ensure_workbook(kind: str, rows: int, directory: Path = WORKBOOK_DIR) -> Path:
+    """Generate (once) and return the path of a synthetic workbook."""
+
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{kind}_{rows}.xlsx"
+
+    if not path.exists():
+        logger.warning("Generating %s (%d rows)...", path.name, rows)
+        WORKBOOKS[kind](rows).to_excel(path, index=False)
+
+    return path
+
+
+# ============================================================
+# SQLite Stand-in for SQL Server
+# ============================================================
+
+OPTION_SPREADS_DDL = """
+CREATE TABLE IF NOT EXISTS dbo.option_spreads (
+    id TEXT, date DATE, ticker TEXT, ticker_price REAL, option_type TEXT,
+    tran_type TEXT, option_price REAL, strike_price_lower REAL,
+    strike_price_upper REAL, option_quantity REAL, contract_amount REAL,
+    coll_amount REAL, rate_of_return REAL, expiration_date DATE,
+    num_of_days INTEGER, status TEXT, status_change_date DATE,
+    status_change_price REAL, cost_of_contract REAL, cost_of_close REAL
+)
+"""
+
+SPREAD_PRICES_DDL = """
+CREATE TABLE IF NOT EXISTS dbo.Spread_Prices (
+    Ticker TEXT, Date_Time TIMESTAMP, Price REAL
+)
+"""
+
+SPREAD_LATEST_DDL = """
+CREATE TABLE IF NOT EXISTS dbo.Spread_Latest (
+    Ticker TEXT PRIMARY KEY, Price REAL NOT NULL, Date_Time TIMESTAMP NOT NULL,
+    Open_Spreads INTEGER NOT NULL DEFAULT 0, Breached_Spreads INTEGER NOT NULL DEFAULT 0,
+    Is_Breached INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+class _QmarkCursor:
+    """sqlite3 cursor accepting pyodbc-style ``execute(sql, *params)``."""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def execute(self, sql: str, *params):
+
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+
+        self._cursor.execute(sql, params)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _PyodbcStyleConnection:
+    """Context-managed like pyodbc: ``with conn:`` commits and closes."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def cursor(self) -> _QmarkCursor:
+        return _QmarkCursor(self._conn.cursor())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+
+        if exc_type is None:
+            self._conn.commit()
+        self._conn.close()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class SQLiteStandIn:
+    """
+    File-backed SQLite database with a second database attached as
+    ``dbo``, so the repo's ``dbo.<table>`` SQL runs unchanged.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self.main_path = self.directory / "main.db"
+        self.dbo_path = self.directory / "dbo.db"
+
+        self._engine: Optional[Engine] = None
+
+    def connect(self) -> sqlite3.Connection:
+
+        conn = sqlite3.connect(self.main_path)
+        conn.execute("ATTACH DATABASE ? AS dbo", (str(self.dbo_path),))
+        return conn
+
+    def connect_pyodbc_style(self) -> _PyodbcStyleConnection:
+        """Connection for code written against pyodbc's calling style."""
+        return _PyodbcStyleConnection(self.connect())
+
+    @property
+    def engine(self) -> Engine:
+
+        if self._engine is None:
+            engine = create_engine(f"sqlite:///{self.main_path}")
+            dbo_path = str(self.dbo_path)
+
+            @event.listens_for(engine, "connect")
+            def _attach_dbo(dbapi_conn, _record):
+                dbapi_conn.execute("ATTACH DATABASE ? AS dbo", (dbo_path,))
+
+            self._engine = engine
+
+        return self._engine
+
+    def execute(self, *statements: str) -> None:
+
+        with self.connect() as conn:
+            for statement in statements:
+                conn.execute(statement)
+
+    def count(self, table: str) -> int:
+
+        with contextlib.closing(self.connect()) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+# ============================================================
+# Timing
+# ============================================================
+
+def time_stage(
+    name: str,
+    fn: Callable[[], object],
+    repeat: int,
+    rows: int,
+    setup: Optional[Callable[[], None]] = None,
+) -> dict:
+    """Run ``fn`` ``repeat`` times (after optional ``setup``) and summarise."""
+
+    timings: List[float] = []
+
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+
+    result = {
+        "stage": name,
+        "rows": rows,
+        "repeat": repeat,
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "max_s": max(timings),
+        "rows_per_s": rows / min(timings) if min(timings) > 0 else None,
+    }
+
+    print(f"{name:<36} rows={rows:<8} median={result['median_s']:.4f}s")
+
+    return result
+
+
+def _fresh_fake_provider() -> None:
+    set_provider(FakeMarketDataProvider(today=BENCH_TODAY))
+
+
+# ============================================================
+# Stages
+# ============================================================
+
+def bench_excel(rows: int, repeat: int, workdir: Path) -> List[dict]:
+
+    from workbook_cache import WorkbookCache
+
+    results = []
+
+    for kind in WORKBOOKS:
+        path = ensure_workbook(kind, rows)
+        cache = WorkbookCache(cache_dir=workdir / "sidecars")
+        cache.read_excel(path)
+
+        results.append(time_stage(f"excel_parse_cold[{kind}]", lambda: pd.read_excel(path), repeat, rows))
+        results.append(time_stage(f"excel_parse_cached[{kind}]", lambda: cache.read_excel(path), repeat, rows))
+
+    return results
+
+
+def bench_enrichment(rows: int, repeat: int, workdir: Path) -> List[dict]:
+
+    from extraction import OptionTradeProcessor
+    from filled_data import StockDataProcessor
+
+    path = ensure_workbook("option_entries", rows)
+
+    extraction = OptionTradeProcessor(path)
+    filler = StockDataProcessor(path)
+
+    def setup_extraction():
+        _fresh_fake_provider()
+        extraction.load_excel()
+
+    def setup_filler():
+        _fresh_fake_provider()
+        filler.load_data()
+        # filled_data.py expects every row to carry an expiry date
+        filler.df["Expiry Date"] = filler.df["Expiry Date"].fillna(
+            filler.df["Date"] + timedelta(days=30)
+        )
+
+    return [
+        time_stage("enrich_option_trades", extraction.enrich_data, repeat, rows, setup_extraction),
+        time_stage("fill_stock_data", filler.fill_missing_values, repeat, rows, setup_filler),
+    ]
+
+
+def bench_sql_load(rows: int, repeat: int, workdir: Path) -> List[dict]:
+
+    import load_to_sql
+    from excel_to_sqlserver import DBConfig, SQLServerLoader
+    from stocks_history import StocksHistoryETL
+
+    db = SQLiteStandIn(workdir / "sql_load")
+    db.execute(OPTION_SPREADS_DDL)
+
+    class SQLiteLoader(SQLServerLoader):
+        def _create_engine(self) -> Engine:
+            return db.engine
+
+    class SQLiteStocksHistoryETL(StocksHistoryETL):
+        def _create_engine(self):
+            return db.engine
+
+    spreads = load_to_sql.clean_data(pd.read_excel(ensure_workbook("option_spreads", rows)))
+    tickers = pd.read_excel(ensure_workbook("sp500", rows))
+
+    days = max(1, rows // len(UNIVERSE))
+    bars = FakeMarketDataProvider(today=BENCH_TODAY).daily_bars(
+        UNIVERSE, BENCH_TODAY - timedelta(days=int(days * 1.45) + 7), BENCH_TODAY
+    ).head(rows)
+    history = pd.DataFrame({
+        "ticker": bars["ticker"],
+        "date": bars["date"].dt.date,
+        "open_price": bars["open"].round(2),
+        "close_price": bars["close"].round(2),
+        "high": bars["high"].round(2),
+        "low": bars["low"].round(2),
+        "volume": bars["volume"],
+    })
+
+    ticker_loader = SQLiteLoader(DBConfig("sqlite", "bench", "TickerMaster"))
+    history_etl = SQLiteStocksHistoryETL("sqlite", "bench")
+
+    def insert_spreads():
+        with contextlib.closing(db.connect()) as conn:
+            load_to_sql.insert_spreads(conn, spreads)
+
+    return [
+        time_stage(
+            "sql_load_option_spreads", insert_spreads, repeat, len(spreads),
+            lambda: db.execute("DELETE FROM dbo.option_spreads"),
+        ),
+        time_stage(
+            "sql_load_ticker_master", lambda: ticker_loader.load_dataframe(tickers), repeat, len(tickers),
+            lambda: db.execute("DROP TABLE IF EXISTS dbo.TickerMaster"),
+        ),
+        time_stage(
+            "sql_load_stocks_history", lambda: history_etl.load_to_sql(history), repeat, len(history),
+            lambda: db.execute("DROP TABLE IF EXISTS dbo.Stocks_History"),
+        ),
+    ]
+
+
+def bench_collector(rows: int, repeat: int, workdir: Path) -> List[dict]:
+
+    import load_to_sql
+    import spread_price_collector as spc
+
+    db = SQLiteStandIn(workdir / "collector")
+    db.execute(OPTION_SPREADS_DDL, SPREAD_PRICES_DDL, SPREAD_LATEST_DDL)
+
+    spreads = load_to_sql.clean_data(synthetic_option_spreads(rows))
+    # Shift expiries so a realistic share of positions is still active
+    spreads["expiration_date"] = pd.Timestamp(datetime.today().date()) + pd.to_timedelta(
+        spreads["num_of_days"] - 20, unit="D"
+    )
+
+    with contextlib.closing(db.connect()) as conn:
+        load_to_sql.insert_spreads(conn, spreads)
+
+    class SQLiteDatabaseManager(spc.DatabaseManager):
+
+        def get_connection(self):
+            return db.connect_pyodbc_style()
+
+        def get_active_tickers(self) -> List[str]:
+            # Same query as production, minus the T-SQL GETDATE()
+            with contextlib.closing(db.connect()) as conn:
+                rows_ = conn.execute(
+                    f"SELECT DISTINCT ticker FROM {spc.Config.SPREADS_TABLE} "
+                    "WHERE expiration_date >= date('now')"
+                ).fetchall()
+            return [row[0] for row in rows_]
+
+    collector = spc.SpreadPriceCollector()
+    collector.db = SQLiteDatabaseManager()
+
+    return [
+        time_stage("collector_cycle", collector.run, repeat, rows, _fresh_fake_provider),
+    ]
+
+
+# Cold-start commands for the scheduled jobs; each runs in a fresh interpreter
+STARTUP_COMMANDS = {
+    "cli_help": ["cli.py", "--help"],
+    "cli_status": ["cli.py", "status"],
+    "latest_help": ["cli.py", "latest", "--help"],
+    "previous_help": ["cli.py", "previous", "--help"],
+    "collector_help": ["cli.py", "collect-spreads", "--help"],
+    "import_load_to_sql": ["-c", "import load_to_sql"],
+    "import_stocks_history_ai": ["-c", "import stocks_history_ai"],
+}
+
+STARTUP_BUDGET_S = 1.0
+
+
+def bench_startup(rows: int, repeat: int, workdir: Path) -> List[dict]:
+    """Wall time from process start to exit; ``rows`` is ignored."""
+
+    repo = Path(__file__).resolve().parent
+    env = {**os.environ, "MARKET_DATA_BACKEND": "fake"}
+    env.pop("ETL_METRICS_FILE", None)
+
+    results = []
+
+    for label, args in STARTUP_COMMANDS.items():
+
+        def start() -> None:
+            subprocess.run(
+                [sys.executable, *args],
+                cwd=repo,
+                env=env,
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+
+        result = time_stage(f"startup_{label}", start, repeat, 0)
+
+        if result["median_s"] > STARTUP_BUDGET_S:
+            print(f"  ⚠ over the {STARTUP_BUDGET_S:.1f}s startup budget")
+
+        results.append(result)
+
+    return results
+
+
+def synthetic_speech_chunk(seconds: float, sample_rate: int = 16000, seed: int = 17) -> np.ndarray:
+    """int16 (frames, 1) chunk shaped like AudioRecorder output: noise plus voiced tones."""
+
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+
+    envelope = (np.sin(2 * np.pi * 0.7 * t) > 0).astype(np.float64)
+    signal = envelope * (np.sin(2 * np.pi * 220 * t) + 0.5 * np.sin(2 * np.pi * 440 * t))
+    signal += 0.05 * rng.standard_normal(t.size)
+
+    return (np.clip(signal * 0.3, -1, 1) * 32767).astype(np.int16).reshape(-1, 1)
+
+
+def bench_whisper(rows: int, repeat: int, workdir: Path) -> List[dict]:
+    """
+    Per-chunk Whisper latency, in-memory array vs. temp-WAV round trip;
+    ``rows`` is ignored. Needs openai-whisper (and ffmpeg for the file path).
+    """
+
+    import voice_to_txt
+
+    transcriber = voice_to_txt.SpeechTranscriber(voice_to_txt.MODEL_SIZE)
+    chunk = synthetic_speech_chunk(voice_to_txt.RECORD_SECONDS, voice_to_txt.SAMPLE_RATE)
+
+    # Warm-up, so model initialization is not charged to either path
+    transcriber.transcribe(chunk, voice_to_txt.SAMPLE_RATE)
+
+    return [
+        time_stage(
+            "whisper_chunk_file",
+            lambda: transcriber.transcribe_file(chunk, voice_to_txt.SAMPLE_RATE),
+            repeat,
+            0,
+        ),
+        time_stage(
+            "whisper_chunk_memory",
+            lambda: transcriber.transcribe(chunk, voice_to_txt.SAMPLE_RATE),
+            repeat,
+            0,
+        ),
+    ]
+
+
+STAGES: Dict[str, Callable[[int, int, Path], List[dict]]] = {
+    "excel": bench_excel,
+    "enrich": bench_enrichment,
+    "sql": bench_sql_load,
+    "collector": bench_collector,
+    "startup": bench_startup,
+    "whisper": bench_whisper,
+}
+
+# Stages that need optional packages run only when asked for
+DEFAULT_STAGES = [name for name in STAGES if name != "whisper"]
+
+
+# ============================================================
+# Reporting
+# ============================================================
+
+def git_revision() -> str:
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare_results(current: List[dict], baseline_path: Path) -> None:
+
+    baseline = {
+        (r["stage"], r["rows"]): r
+        for r in json.loads(baseline_path.read_text())["results"]
+    }
+
+    print(f"\nComparison against {baseline_path}:")
+
+    for result in current:
+        before = baseline.get((result["stage"], result["rows"]))
+        if before is None:
+            continue
+
+        change = (result["median_s"] / before["median_s"] - 1) * 100 if before["median_s"] else 0.0
+        print(
+            f"  {result['stage']:<32} rows={result['rows']:<8} "
+            f"{before['median_s']:.4f}s → {result['median_s']:.4f}s ({change:+.1f}%)"
+        )
+
+
+def run(stages: List[str], row_counts: List[int], repeat: int) -> dict:
+
+    results: List[dict] = []
+
+    with tempfile.TemporaryDirectory(prefix="pipeline_bench_") as tmp:
+        for rows in row_counts:
+            for name in stages:
+                workdir = Path(tmp) / f"{name}_{rows}"
+                results.extend(STAGES[name](rows, repeat, workdir))
+
+    set_provider(None)
+
+    return {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+
+    parser = argparse.ArgumentParser(description="Benchmark the ETL pipelines offline")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000], help="row counts, e.g. 1000 100000 1000000")
+    parser.add_argument("--stages", nargs="+", choices=sorted(STAGES), default=DEFAULT_STAGES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, default=None, help="JSON file (default: benchmark_results/<rev>.json)")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier results JSON to diff against")
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    args = parse_args(argv)
+
+    report = run(args.stages, args.rows, args.repeat)
+
+    output = args.output or RESULTS_DIR / f"{report['revision']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    print(f"Results written to {output}")
+
+    if args.compare is not None:
+        compare_results(report["results"], args.compare)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
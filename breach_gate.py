@@ -0,0 +1,196 @@
+"""
+Agent Breach Gate
+-----------------
+Cheap pre-filter in front of the portfolio agent. For a whole watchlist
+it computes, in one vectorized pass:
+
+    move_pct              price change since the ticker's reference price
+    strike_distance_pct   distance to the nearest open-spread strike
+
+A ticker triggers when its move crosses the configured threshold or it
+enters the strike-proximity band (staying inside does not re-trigger). Only then is the agent invoked, once, with a
+single prompt covering every triggered ticker.
+
+A ticker's reference price is the price when it was first seen or last
+reported to the agent, so a slow drift still adds up to a trigger.
+
+    AGENT_MOVE_PCT=2.0          # |move| that triggers, percent
+    AGENT_PROXIMITY_PCT=1.0     # strike distance that triggers, percent
+    AGENT_WATCHLIST=AAPL,MSFT   # in addition to tickers with open spreads
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger("BreachGate")
+
+
+class GateConfig:
+    """Gate settings, read from the environment when a gate runs rather than at import."""
+
+    def __init__(self, environ: Mapping[str, str] = os.environ):
+        self.move_pct = float(environ.get("AGENT_MOVE_PCT", "2.0"))
+        self.proximity_pct = float(environ.get("AGENT_PROXIMITY_PCT", "1.0"))
+        self.watchlist = [t.strip().upper() for t in environ.get("AGENT_WATCHLIST", "AAPL").split(",") if t.strip()]
+        self.state_file = Path(environ.get("AGENT_GATE_STATE", "agent_gate_state.json"))
+
+
+# ================================================================
+# State (reference price and strike-band flag per ticker)
+# ================================================================
+def _read_state(path: Optional[Path]) -> dict:
+
+    try:
+        return json.loads(Path(path or GateConfig().state_file).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def load_state(path: Optional[Path] = None) -> Dict[str, float]:
+    """Reference price per ticker."""
+    return dict(_read_state(path).get("prices", {}))
+
+
+def load_near(path: Optional[Path] = None) -> Dict[str, bool]:
+    """Whether each ticker was inside the strike band when last recorded."""
+    return dict(_read_state(path).get("near", {}))
+
+
+def save_state(
+    prices: Mapping[str, Optional[float]],
+    path: Optional[Path] = None,
+    near: Optional[Mapping[str, bool]] = None,
+) -> None:
+    """Merge reference prices (and band flags) into the state file."""
+
+    path = Path(path or GateConfig().state_file)
+    state = _read_state(path)
+
+    state.setdefault("prices", {}).update({t: p for t, p in prices.items() if p is not None})
+    state.setdefault("near", {}).update({t: bool(flag) for t, flag in (near or {}).items()})
+
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(state, indent=1, sort_keys=True))
+    os.replace(tmp_path, path)
+
+
+# ================================================================
+# Evaluation
+# ================================================================
+def strike_levels(spreads: pd.DataFrame) -> pd.DataFrame:
+    """Long (ticker, strike) frame of both strikes of every open spread."""
+
+    return pd.concat(
+        [
+            spreads[["ticker", "strike_price_lower"]].rename(columns={"strike_price_lower": "strike"}),
+            spreads[["ticker", "strike_price_upper"]].rename(columns={"strike_price_upper": "strike"}),
+        ],
+        ignore_index=True,
+    ).dropna()
+
+
+def evaluate(
+    prices: Mapping[str, Optional[float]],
+    previous: Mapping[str, float],
+    strikes: Optional[pd.DataFrame] = None,
+    move_pct: Optional[float] = None,
+    proximity_pct: Optional[float] = None,
+    was_near: Optional[Mapping[str, bool]] = None,
+) -> pd.DataFrame:
+    """
+    One row per ticker in ``prices`` with the gate inputs and a
+    ``triggered`` flag. Tickers without a previous price cannot trigger
+    on movement; tickers without strikes cannot trigger on proximity.
+
+    Proximity triggers on entering the band: ``near_strike`` is the
+    current level, ``entered_band`` is set only if the ticker was not
+    near a strike last time (``was_near``), so a ticker parked next to
+    a strike does not invoke the agent on every check.
+    """
+
+    config = GateConfig()
+    move_pct = config.move_pct if move_pct is None else move_pct
+    proximity_pct = config.proximity_pct if proximity_pct is None else proximity_pct
+
+    price = pd.Series(prices, dtype="float64", name="price")
+    price.index.name = "ticker"
+
+    out = price.to_frame()
+    out["previous"] = pd.Series(previous, dtype="float64").reindex(out.index)
+    out["move_pct"] = (out["price"] / out["previous"] - 1.0) * 100
+
+    out["nearest_strike"] = np.nan
+    out["strike_distance_pct"] = np.nan
+
+    if strikes is not None and not strikes.empty:
+        levels = strikes[strikes["ticker"].isin(out.index)].copy()
+        levels["distance_pct"] = (
+            (levels["strike"] - levels["ticker"].map(out["price"])).abs()
+            / levels["ticker"].map(out["price"]) * 100
+        )
+        levels = levels.dropna(subset=["distance_pct"])
+
+        if not levels.empty:
+            nearest = levels.loc[levels.groupby("ticker")["distance_pct"].idxmin()].set_index("ticker")
+            out["nearest_strike"] = nearest["strike"]
+            out["strike_distance_pct"] = nearest["distance_pct"]
+
+    out["moved"] = out["move_pct"].abs() >= move_pct
+    out["near_strike"] = out["strike_distance_pct"] <= proximity_pct
+
+    previously_near = pd.Series(was_near or {}, dtype=bool).reindex(out.index, fill_value=False)
+    out["entered_band"] = out["near_strike"] & ~previously_near
+
+    out["triggered"] = out["moved"] | out["entered_band"]
+
+    return out
+
+
+def build_prompt(triggered: pd.DataFrame) -> str:
+    """One prompt covering every triggered ticker."""
+
+    lines = []
+
+    for ticker, row in triggered.iterrows():
+        reasons = []
+        if row["moved"]:
+            reasons.append(f"moved {row['move_pct']:+.2f}% since {row['previous']:.2f}")
+        if row["near_strike"]:
+            reasons.append(f"{row['strike_distance_pct']:.2f}% from the {row['nearest_strike']:.2f} strike")
+        lines.append(f"- {ticker} at {row['price']:.2f}: {'; '.join(reasons)}")
+
+    return (
+        "These watchlist tickers crossed an alert threshold:\n"
+        + "\n".join(lines)
+        + "\nConfirm the current prices of all of these tickers with a single fetch_prices call, "
+          "then for each ticker assess the risk to any open option spreads and summarize the "
+          "market status in one or two sentences."
+    )
+
+
+# ================================================================
+# Inputs
+# ================================================================
+def load_strikes(conn) -> pd.DataFrame:
+    """Strikes of all open spreads; ``conn`` is a DB-API connection."""
+
+    from spread_pnl import load_open_spreads
+
+    return strike_levels(load_open_spreads(conn))
+
+
+def watchlist(strikes: Optional[pd.DataFrame], extra: Optional[Iterable[str]] = None) -> List[str]:
+
+    tickers = list(dict.fromkeys(GateConfig().watchlist if extra is None else extra))
+    if strikes is not None:
+        tickers += [t for t in pd.unique(strikes["ticker"]) if t not in tickers]
+    return tickers
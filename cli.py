@@ -0,0 +1,215 @@
+"""
+Unified Command Line
+--------------------
+One entry point for every pipeline. Only the standard library is imported
+up front; a subcommand's module (and pandas, yfinance, SQLAlchemy, ...) is
+loaded when that subcommand runs, so ``--help`` and ``status`` return
+immediately.
+
+    python cli.py --help
+    python cli.py latest --start 2026-02-12 --end 2026-02-18
+    python cli.py collect-spreads --metrics-port 9108
+    python cli.py status
+    python cli.py check-help       # every '<command> --help' parses without side effects
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+
+HERE = Path(__file__).resolve().parent
+
+
+class Command(NamedTuple):
+    target: str     # "module:function" or a streamlit script
+    help: str
+    streamlit: bool = False
+
+
+COMMANDS: Dict[str, Command] = {
+    "stocks-history": Command("stocks_history:main", "Load daily bars via StocksHistoryETL"),
+    "latest": Command("latest_Data:main", "Load recent daily bars into Stocks_History"),
+    "previous": Command("previous_Data:main", "Backfill one more month of Stocks_History"),
+    "load-spreads": Command("load_to_sql:main", "Insert the option spreads workbook into SQL Server"),
+    "excel-to-sql": Command("excel_to_sqlserver:main", "Load the SP500 workbook into SQL Server"),
+    "history": Command("history_store:main", "Sync or query the local Parquet mirror of Stocks_History"),
+    "indicators": Command("indicators:main", "Refresh SMA, realized volatility and ATR for all tickers"),
+    "arrays": Command("ohlcv_store:main", "Build or append the memory-mapped OHLCV array store"),
+    "pipeline": Command("pipeline:main", "Run the enrichment → load DAG, redoing only changed stages"),
+    "extract": Command("extraction:main", "Fill missing expirations and trade prices"),
+    "fill": Command("filled_data:main", "Fill missing stock prices in option entries"),
+    "collect-spreads": Command("spread_price_collector:main", "Collect spread prices during market hours"),
+    "spread-pnl": Command("spread_pnl:main", "Mark open option spreads to market"),
+    "agent": Command("stocks_history_ai:main", "Run the scheduled portfolio agent"),
+    "transcribe": Command("voice_to_txt:main", "Record and transcribe a voice note"),
+    "benchmark": Command("benchmark:main", "Run the offline pipeline benchmark"),
+    "metrics-report": Command("instrumentation:main", "Summarize a JSON-lines metrics file"),
+    "memory-report": Command("memprofile:main", "Show or compare --profile-memory reports"),
+    "dashboard": Command("application.py", "Open the future-expiry dashboard", streamlit=True),
+    "contracts": Command("streamlit_application.py", "Open the contract entry app", streamlit=True),
+}
+
+
+# ============================================================
+# Dispatch
+# ============================================================
+
+def run_command(name: str, args: List[str]) -> int:
+
+    command = COMMANDS[name]
+
+    if command.streamlit:
+        return subprocess.call(
+            [sys.executable, "-m", "streamlit", "run", str(HERE / command.target), *args]
+        )
+
+    module_name, func_name = command.target.split(":")
+
+    # Every main() takes argv; sys.argv[0] only sets the prog name in their usage
+    sys.argv = [f"cli.py {name}", *args]
+
+    module = importlib.import_module(module_name)
+    result = getattr(module, func_name)(args)
+
+    return result if isinstance(result, int) else 0
+
+
+# ============================================================
+# Status
+# ============================================================
+
+def _dir_size(path: Path) -> tuple:
+
+    files = [p for p in path.rglob("*") if p.is_file()] if path.is_dir() else []
+    return len(files), sum(p.stat().st_size for p in files)
+
+
+def status() -> int:
+    """Checkpoint, failure and cache state, without importing any pipeline."""
+
+    checkpoint = Path("last_loaded.txt")
+    failed = Path("failed_tickers.txt")
+    cache_dir = Path(os.environ.get("WORKBOOK_CACHE_DIR", ".workbook_cache"))
+
+    print(f"previous_Data next month : {checkpoint.read_text().strip() if checkpoint.exists() else 'not started'}")
+
+    if failed.exists():
+        lines = [line for line in failed.read_text().splitlines() if line.strip()]
+        print(f"failed tickers           : {len(lines)} recorded in {failed}")
+    else:
+        print("failed tickers           : none")
+
+    files, size = _dir_size(cache_dir)
+    print(f"workbook cache           : {files} files, {size / 1024 / 1024:.1f} MB in {cache_dir}")
+
+    print(f"market data backend      : {os.environ.get('MARKET_DATA_BACKEND', 'yfinance')}")
+    print(f"metrics file             : {os.environ.get('ETL_METRICS_FILE', 'disabled')}")
+
+    return 0
+
+
+# ============================================================
+# Help Check
+# ============================================================
+
+# None of these may load for '<command> --help': they connect, record or are slow
+HELP_FORBIDDEN_MODULES = ("pyodbc", "yfinance", "whisper", "sounddevice", "scipy", "crewai", "streamlit")
+
+_HELP_PROBE = """
+import json, sys
+import cli
+try:
+    code = cli.main([sys.argv[1], "--help"])
+except SystemExit as exc:
+    code = exc.code
+loaded = [m for m in cli.HELP_FORBIDDEN_MODULES if m in sys.modules]
+print(json.dumps({"code": code or 0, "loaded": loaded}))
+"""
+
+
+def check_help() -> int:
+    """Run '<command> --help' for every subcommand in a fresh interpreter."""
+
+    env = {**os.environ, "MARKET_DATA_BACKEND": "fake"}
+    env.pop("ETL_METRICS_FILE", None)
+
+    failed = 0
+
+    for name, command in COMMANDS.items():
+        if command.streamlit:
+            continue
+
+        proc = subprocess.run(
+            [sys.executable, "-c", _HELP_PROBE, name],
+            cwd=HERE, env=env, capture_output=True, text=True, timeout=120,
+        )
+
+        lines = proc.stdout.strip().splitlines()
+        problems = []
+
+        try:
+            probe = json.loads(lines[-1])
+        except (IndexError, ValueError):
+            probe = {"code": proc.returncode, "loaded": []}
+            problems.append((proc.stderr.strip().splitlines() or ["no output"])[-1])
+
+        if probe["code"] != 0:
+            problems.append(f"exit code {probe['code']}")
+        if not any(line.startswith("usage:") for line in lines):
+            problems.append("no usage text (did main() run instead?)")
+        if probe["loaded"]:
+            problems.append(f"imported {', '.join(probe['loaded'])}")
+
+        print(f"{name:<18} {'; '.join(problems) or 'ok'}")
+        failed += bool(problems)
+
+    return 1 if failed else 0
+
+
+# ============================================================
+# Entry Point
+# ============================================================
+
+def build_parser() -> argparse.ArgumentParser:
+
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Run any of the investment data pipelines.",
+        epilog="Arguments after the subcommand are passed to it; use '<command> --help' for its options.",
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    subparsers.required = True
+
+    subparsers.add_parser("status", help="Show checkpoints, failed tickers and cache size")
+    subparsers.add_parser("check-help", help="Check that '<command> --help' works for every subcommand")
+
+    for name, command in COMMANDS.items():
+        subparsers.add_parser(name, help=command.help, add_help=False)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+
+    argv = sys.argv[1:] if argv is None else argv
+    args, rest = build_parser().parse_known_args(argv)
+
+    if args.command == "status":
+        return status()
+
+    if args.command == "check-help":
+        return check_help()
+
+    return run_command(args.command, rest)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+"""
+Contracts Data Access
+---------------------
+Queries behind the Options Contract Entry app (streamlit_application.py).
+
+    engine = create_pooled_engine()          # share one per process
+    page = fetch_page(engine, ContractFilters(ticker="AAPL"), page_size=50)
+    page.table                               # pyarrow.Table for st.dataframe
+    page = fetch_page(engine, filters, before_id=page.last_id)
+
+    valid, errors = validate_contracts(read_contracts(uploaded_file))
+    insert_contracts(engine, valid.to_dict("records"))
+
+Browsing is keyset-paginated on ``id`` (``WHERE id < :last ORDER BY id
+DESC``), so every page costs the same however large ``contracts`` grows.
+Filters are applied in SQL, and only the displayed columns are selected.
+Queries are SQLAlchemy Core, which renders ``TOP`` on SQL Server and
+``LIMIT`` elsewhere.
+
+Bulk imports validate every row at once with column masks. Valid rows
+go in one transaction; the rest come back with a message per row.
+"""
+
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy import column, create_engine, select, table
+
+from instrumentation import count, timed
+
+
+CONNECTION_STRING = (
+    "DRIVER={ODBC Driver 17 for SQL Server};"
+    "SERVER=.\\SQLEXPRESS02;"
+    "DATABASE=INVESTMENTS;"
+    "Trusted_Connection=yes;"
+)
+
+CONTRACT_TYPES = ["Credit", "Debit"]
+OPTION_TYPES = ["PUT", "CALL"]
+
+# Columns written by the entry form, in display order after ``id``
+CONTRACT_COLUMNS = [
+    "contract_date",
+    "ticker",
+    "contract_type",
+    "option_type",
+    "contract_price",
+    "upper_limit",
+    "lower_limit",
+]
+
+CONTRACTS = table("contracts", column("id"), *(column(name) for name in CONTRACT_COLUMNS))
+
+# Accepted spellings of bulk-import headers
+COLUMN_ALIASES = {
+    "date": "contract_date",
+    "trade_date": "contract_date",
+    "symbol": "ticker",
+    "type": "contract_type",
+    "tran_type": "contract_type",
+    "price": "contract_price",
+    "option_price": "contract_price",
+    "upper": "upper_limit",
+    "strike_price_upper": "upper_limit",
+    "lower": "lower_limit",
+    "strike_price_lower": "lower_limit",
+}
+
+# Keyset paging needs id as the clustered key; filtered browsing benefits from
+#   CREATE INDEX ix_contracts_ticker_date ON contracts (ticker, contract_date) INCLUDE (option_type)
+
+
+def create_pooled_engine(connection_string: str = CONNECTION_STRING, pool_size: int = 5):
+    """Pooled SQL Server engine; connections are checked out per query and returned."""
+
+    from urllib.parse import quote_plus
+
+    return create_engine(
+        f"mssql+pyodbc:///?odbc_connect={quote_plus(connection_string)}",
+        pool_size=pool_size,
+        pool_pre_ping=True,
+        fast_executemany=True,
+    )
+
+
+# ================================================================
+# Browsing
+# ================================================================
+@dataclass(frozen=True)
+class ContractFilters:
+    ticker: Optional[str] = None
+    start: Optional[date] = None
+    end: Optional[date] = None
+    option_type: Optional[str] = None
+
+    def apply(self, query):
+
+        if self.ticker:
+            query = query.where(CONTRACTS.c.ticker.startswith(self.ticker.strip().upper(), autoescape=True))
+        if self.start is not None:
+            query = query.where(CONTRACTS.c.contract_date >= self.start)
+        if self.end is not None:
+            query = query.where(CONTRACTS.c.contract_date <= self.end)
+        if self.option_type:
+            query = query.where(CONTRACTS.c.option_type == self.option_type)
+
+        return query
+
+
+class Page(NamedTuple):
+    table: pa.Table
+    last_id: Optional[int]     # pass as ``before_id`` for the next page
+    has_more: bool
+
+
+@timed("sql_read", component="contracts_db")
+def fetch_page(
+    engine,
+    filters: ContractFilters = ContractFilters(),
+    before_id: Optional[int] = None,
+    page_size: int = 50,
+) -> Page:
+    """Newest contracts matching ``filters`` with ``id < before_id``."""
+
+    query = select(CONTRACTS.c.id, *(CONTRACTS.c[name] for name in CONTRACT_COLUMNS))
+    query = filters.apply(query)
+
+    if before_id is not None:
+        query = query.where(CONTRACTS.c.id < before_id)
+
+    # One extra row tells us whether another page exists
+    query = query.order_by(CONTRACTS.c.id.desc()).limit(page_size + 1)
+
+    with engine.connect() as conn:
+        result = conn.execute(query)
+        names = list(result.keys())
+        rows = result.fetchall()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    columns = list(zip(*rows)) if rows else [[] for _ in names]
+    arrow = pa.table({name: pa.array(values) for name, values in zip(names, columns)})
+
+    return Page(arrow, rows[-1][0] if rows else None, has_more)
+
+
+# ================================================================
+# Writes
+# ================================================================
+@timed("sql_write", component="contracts_db")
+def insert_contracts(engine, rows: List[Dict[str, object]]) -> int:
+    """Insert rows (dicts keyed by CONTRACT_COLUMNS) in one transaction."""
+
+    if not rows:
+        return 0
+
+    with engine.begin() as conn:
+        conn.execute(CONTRACTS.insert(), rows)
+
+    count("rows_written", len(rows), component="contracts_db", table="contracts")
+
+    return len(rows)
+
+
+# ================================================================
+# Bulk Import
+# ================================================================
+def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+
+    names = [str(name).strip().lower().replace(" ", "_") for name in df.columns]
+    return df.set_axis([COLUMN_ALIASES.get(name, name) for name in names], axis=1)
+
+
+def read_contracts(source, filename: Optional[str] = None) -> pd.DataFrame:
+    """
+    Rows from an uploaded CSV/XLSX (file object or path) or pasted text.
+    Pasted text may be comma- or tab-separated, with or without a header;
+    without one, columns are taken in CONTRACT_COLUMNS order, starting at
+    ``ticker`` when there is one column fewer (no date).
+    """
+
+    name = (filename or getattr(source, "name", "") or "").lower()
+
+    if isinstance(source, str) and not name:
+        lines = [line for line in source.strip().splitlines() if line.strip()]
+        if not lines:
+            return pd.DataFrame(columns=CONTRACT_COLUMNS)
+
+        sep = "\t" if "\t" in lines[0] else ","
+        first = [cell.strip().lower().replace(" ", "_") for cell in lines[0].split(sep)]
+        has_header = any(COLUMN_ALIASES.get(cell, cell) in CONTRACT_COLUMNS for cell in first)
+
+        # One column short of CONTRACT_COLUMNS: the date was left out
+        if len(first) == len(CONTRACT_COLUMNS) - 1:
+            names = CONTRACT_COLUMNS[1:]
+        else:
+            names = CONTRACT_COLUMNS[: len(first)]
+
+        df = pd.read_csv(
+            io.StringIO("\n".join(lines)),
+            sep=sep,
+            header=0 if has_header else None,
+            names=None if has_header else names,
+            dtype=str,
+            skipinitialspace=True,
+        )
+    elif name.endswith((".xlsx", ".xls")):
+        df = pd.read_excel(source, dtype=str)
+    else:
+        df = pd.read_csv(source, dtype=str, skipinitialspace=True)
+
+    return _normalize_columns(df)
+
+
+@timed("transform", component="contracts_db")
+def validate_contracts(
+    df: pd.DataFrame,
+    default_date: Optional[date] = None,
+    known_tickers: Optional[Sequence[str]] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Split rows into (valid, errors). ``valid`` has CONTRACT_COLUMNS with
+    clean types; ``errors`` has the source ``row`` (1-based), the raw
+    values and an ``error`` message. A missing date column defaults to
+    ``default_date`` (today). With ``known_tickers`` (e.g.
+    ``TickerIndex.symbols``), tickers are normalized to that form and
+    unknown ones are rejected.
+    """
+
+    n = len(df)
+    raw = df.reset_index(drop=True)
+    missing = [c for c in CONTRACT_COLUMNS if c not in raw.columns and c != "contract_date"]
+
+    def text_col(name):
+        if name not in raw.columns:
+            return pd.Series([""] * n, dtype="object")
+        return raw[name].fillna("").astype(str).str.strip()
+
+    def number_col(name):
+        return pd.to_numeric(text_col(name).str.replace(",", "", regex=False), errors="coerce")
+
+    if "contract_date" in raw.columns:
+        dates = pd.to_datetime(text_col("contract_date"), errors="coerce")
+    else:
+        dates = pd.Series(pd.Timestamp(default_date or date.today()), index=raw.index)
+
+    ticker = text_col("ticker").str.upper()
+    contract_type = text_col("contract_type").str.capitalize()
+    option_type = text_col("option_type").str.upper()
+    price = number_col("contract_price")
+    upper = number_col("upper_limit")
+    lower = number_col("lower_limit")
+
+    unknown = pd.Series(False, index=raw.index)
+    if known_tickers is not None:
+        ticker = ticker.str.replace(".", "-", regex=False)
+        unknown = ticker.ne("") & ~ticker.isin(known_tickers)
+
+    checks = [
+        (dates.isna(), "invalid date"),
+        (ticker.eq(""), "ticker is empty"),
+        (unknown, "ticker not in TickerMaster"),
+        (~contract_type.isin(CONTRACT_TYPES), f"contract type must be one of {CONTRACT_TYPES}"),
+        (~option_type.isin(OPTION_TYPES), f"option type must be one of {OPTION_TYPES}"),
+        (price.isna() | (price < 0), "contract price must be a number >= 0"),
+        (upper.isna() | (upper < 0), "upper limit must be a number >= 0"),
+        (lower.isna() | (lower < 0), "lower limit must be a number >= 0"),
+        (lower > upper, "lower limit is above upper limit"),
+    ]
+
+    errors = pd.Series("", index=raw.index, dtype="object")
+    for failed, message in checks:
+        errors = errors.mask(failed, errors + message + "; ")
+
+    if missing:
+        errors = errors + f"missing columns {missing}; "
+
+    bad = errors.ne("")
+
+    valid = pd.DataFrame({
+        "contract_date": dates.dt.date,
+        "ticker": ticker,
+        "contract_type": contract_type,
+        "option_type": option_type,
+        "contract_price": price.round(2),
+        "upper_limit": upper.round(2),
+        "lower_limit": lower.round(2),
+    })[~bad].reset_index(drop=True)
+
+    rejected = raw[bad].assign(error=errors[bad].str.rstrip("; "))
+    rejected.insert(0, "row", rejected.index + 1)
+
+    return valid, rejected.reset_index(drop=True)
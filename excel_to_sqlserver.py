@@ -1,24 +1,24 @@
 from __future__ import annotations
 
+import argparse
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-import pandas as pd
-from sqlalchemy import create_engine
-from sqlalchemy.engine import Engine
+from instrumentation import count, timed
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from sqlalchemy.engine import Engine
 
 
 # ================================================================
 # Logging Configuration
 # ================================================================
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-)
-
 logger = logging.getLogger("ExcelToSQLServerETL")
 
+EXCEL_FILE = r"C:\Users\user\Downloads\SP500_Data 4.xlsx"
+
 
 # ================================================================
 # Configuration Model
@@ -50,6 +50,9 @@ class SQLServerLoader:
         self.engine: Engine = self._create_engine()
 
     def _create_engine(self) -> Engine:
+        # Imported here so --help and imports stay cheap
+        from sqlalchemy import create_engine
+
         logger.info("Creating SQL Server connection engine")
 
         connection_string = (
@@ -60,6 +63,7 @@ class SQLServerLoader:
 
         return create_engine(connection_string)
 
+    @timed("sql_write", component="ExcelToSQLServerETL")
     def load_dataframe(self, df: pd.DataFrame) -> None:
         """
         Upload DataFrame to SQL Server table.
@@ -80,6 +84,8 @@ class SQLServerLoader:
             index=False,
         )
 
+        count("rows_written", len(df), component="ExcelToSQLServerETL", table=self.config.table)
+
         logger.info("Data successfully loaded into SQL Server")
 
 
@@ -94,14 +100,17 @@ class ExcelExtractor:
     def __init__(self, file_path: str | Path):
         self.file_path = Path(file_path)
 
+    @timed("excel_read", component="ExcelToSQLServerETL")
     def extract(self) -> pd.DataFrame:
 
         if not self.file_path.exists():
             raise FileNotFoundError(f"Excel file not found: {self.file_path}")
 
+        from workbook_cache import read_excel_cached
+
         logger.info("Reading Excel file: %s", self.file_path)
 
-        df = pd.read_excel(self.file_path)
+        df = read_excel_cached(self.file_path)
 
         if df.empty:
             raise ValueError("Excel file contains no data")
@@ -123,6 +132,7 @@ class ExcelToSQLServerETL:
         self.extractor = ExcelExtractor(excel_path)
         self.loader = SQLServerLoader(db_config)
 
+    @timed("etl_run", component="ExcelToSQLServerETL")
     def run(self) -> None:
 
         logger.info("Starting ETL pipeline")
@@ -137,19 +147,34 @@ class ExcelToSQLServerETL:
 # ================================================================
 # Entry Point
 # ================================================================
-def main():
+def parse_args(argv=None):
 
-    excel_file = r"C:\Users\user\Downloads\SP500_Data 4.xlsx"
+    parser = argparse.ArgumentParser(description="Load the SP500 workbook into SQL Server")
+    parser.add_argument("--file", default=EXCEL_FILE, help="workbook to load")
+    parser.add_argument("--server", default=r".\SQLEXPRESS02")
+    parser.add_argument("--database", default="INVESTMENTS")
+    parser.add_argument("--table", default="TickerMaster")
 
-    db_config = DBConfig(
-        server = r".\SQLEXPRESS02",    
-        database="INVESTMENTS", 
-        table = "TickerMaster",
-        schema = "dbo"
+    return parser.parse_args(argv)
 
+
+def main(argv=None):
+
+    args = parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+
+    db_config = DBConfig(
+        server=args.server,
+        database=args.database,
+        table=args.table,
+        schema="dbo",
     )
 
-    etl = ExcelToSQLServerETL(excel_file, db_config)
+    etl = ExcelToSQLServerETL(args.file, db_config)
 
     etl.run()
 
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import argparse
 import logging
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional
 
 import pandas as pd
-import yfinance as yf
+
+from market_data import IncompleteDataError, get_provider
+from instrumentation import count, timed
+import memprofile
+from workbook_cache import read_excel_cached
 
 
 # ================================================================
@@ -24,6 +29,27 @@ logger = logging.getLogger("OptionTradeEnrichment")
 # Yahoo Finance Service Layer
 # ================================================================
 class YahooFinanceService:
+    """
+    Thin adapter over the shared market-data provider.
+    """
+
+    PRICE_WINDOW_DAYS = 3
+
+    # ------------------------------------------------------------
+    # Warm the provider cache for every ticker in one batched call
+    # ------------------------------------------------------------
+    @staticmethod
+    def prefetch_prices(
+        tickers: list[str], first_date: pd.Timestamp, last_date: pd.Timestamp
+    ) -> None:
+
+        window = timedelta(days=YahooFinanceService.PRICE_WINDOW_DAYS)
+
+        try:
+            get_provider().daily_bars(tickers, first_date - window, last_date + window)
+        except IncompleteDataError as exc:
+            # Rows for these tickers are retried individually later
+            logger.warning("Prefetch incomplete: %s", exc)
 
     # ------------------------------------------------------------
     # Fetch stock price near trade date
@@ -34,35 +60,22 @@ class YahooFinanceService:
     ) -> Optional[float]:
 
         try:
-            start = trade_date - timedelta(days=3)
-            end = trade_date + timedelta(days=3)
-
-            data = yf.download(
-                ticker,
-                start=start.strftime("%Y-%m-%d"),
-                end=end.strftime("%Y-%m-%d"),
-                progress=False,
-                auto_adjust=True,
-                threads=False,
+            window = timedelta(days=YahooFinanceService.PRICE_WINDOW_DAYS)
+
+            data = get_provider().daily_bars(
+                [ticker], trade_date - window, trade_date + window
             )
 
             if data.empty:
                 logger.warning("No price data for %s near %s", ticker, trade_date)
                 return None
 
-            data.index = pd.to_datetime(data.index)
-
             # Find nearest trading day
-            deltas = (data.index - trade_date).to_series().abs()
-            closest_idx = deltas.argmin()
+            deltas = (data["date"] - trade_date).abs()
+            closest_idx = deltas.to_numpy().argmin()
 
-            close_value = data.iloc[closest_idx]["Close"]
-
-            # Handle Series case
-            if isinstance(close_value, pd.Series):
-                close_value = close_value.iloc[0]
-
-            return float(close_value)
+            # Adjusted close, as with yf.download(auto_adjust=True)
+            return float(data["adj_close"].iloc[closest_idx])
 
         except Exception as exc:
             logger.exception("Failed to fetch price for %s: %s", ticker, exc)
@@ -77,14 +90,13 @@ class YahooFinanceService:
     ) -> Optional[pd.Timestamp]:
 
         try:
-            tk = yf.Ticker(ticker)
-            expirations = tk.options
+            expirations = get_provider().expirations(ticker)
 
             if not expirations:
                 logger.warning("No option expirations available for %s", ticker)
                 return None
 
-            expiry_dates = pd.to_datetime(expirations)
+            expiry_dates = pd.DatetimeIndex(expirations)
 
             future_expiry = expiry_dates[expiry_dates >= trade_date]
 
@@ -121,6 +133,7 @@ class OptionTradeProcessor:
     # ------------------------------------------------------------
     # Load Excel
     # ------------------------------------------------------------
+    @timed("excel_read", component="OptionTradeProcessor")
     def load_excel(self) -> None:
 
         if not self.file_path.exists():
@@ -128,7 +141,10 @@ class OptionTradeProcessor:
 
         logger.info("Loading Excel file: %s", self.file_path)
 
-        df = pd.read_excel(self.file_path)
+        self.load_frame(read_excel_cached(self.file_path))
+
+    def load_frame(self, df: pd.DataFrame) -> None:
+        """Validate and normalise an already-loaded entries frame."""
 
         missing_cols = set(self.REQUIRED_COLUMNS.keys()) - set(df.columns)
         if missing_cols:
@@ -175,9 +191,31 @@ class OptionTradeProcessor:
 
         return self.yf_service.fetch_stock_price(ticker, trade_date)
 
+    # ------------------------------------------------------------
+    # Batch-download bars for every row that needs a price
+    # ------------------------------------------------------------
+    @timed("yahoo_fetch", component="OptionTradeProcessor")
+    def _prefetch_missing_prices(self) -> None:
+
+        missing = self.df[
+            self.df["price"].isna() & self.df["trade_date"].notna()
+        ]
+
+        if missing.empty:
+            return
+
+        tickers = missing["ticker"].astype(str).str.strip().unique().tolist()
+
+        self.yf_service.prefetch_prices(
+            tickers,
+            missing["trade_date"].min(),
+            missing["trade_date"].max(),
+        )
+
     # ------------------------------------------------------------
     # Enrich dataset
     # ------------------------------------------------------------
+    @timed("transform", component="OptionTradeProcessor")
     def enrich_data(self) -> None:
 
         if self.df is None:
@@ -189,10 +227,13 @@ class OptionTradeProcessor:
         )
 
         logger.info("Filling missing stock prices...")
+        self._prefetch_missing_prices()
         self.df["final_trade_price"] = self.df.apply(
             self._fill_price, axis=1
         )
 
+        count("rows_processed", len(self.df), component="OptionTradeProcessor")
+
     # ------------------------------------------------------------
     # Get processed result
     # ------------------------------------------------------------
@@ -213,6 +254,7 @@ class OptionTradeProcessor:
     # ------------------------------------------------------------
     # Save output
     # ------------------------------------------------------------
+    @timed("excel_write", component="OptionTradeProcessor")
     def save_output(self, output_path: str | Path) -> None:
 
         result = self.get_result()
@@ -233,7 +275,19 @@ class OptionTradeProcessor:
 # ================================================================
 # Entry Point
 # ================================================================
-def main():
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(description="Fill missing expirations and trade prices.")
+    memprofile.add_argument(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+
+    args = parse_args(argv)
+
+    if args.profile_memory:
+        memprofile.enable()
 
     input_file = r"C:\Users\user\Downloads\OptionEntries.xlsx"
 
@@ -242,11 +296,26 @@ def main():
 
     processor = OptionTradeProcessor(input_file)
 
-    result_df = processor.run()
+    def frames():
+        return {"workbook": processor.df, "bar_cache": get_provider().cached_bytes()}
+
+    try:
+        with memprofile.memory_stage("load_excel", frames):
+            processor.load_excel()
+
+        with memprofile.memory_stage("enrich_data", frames):
+            processor.enrich_data()
+
+        result_df = processor.get_result()
+
+        print(result_df.head())
 
-    print(result_df.head())
+        with memprofile.memory_stage("save_output", frames):
+            processor.save_output(output_file)
 
-    processor.save_output(output_file)
+    finally:
+        if args.profile_memory:
+            memprofile.finish(args.profile_memory)
 
 
 if __name__ == "__main__":
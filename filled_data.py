@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import argparse
 import logging
 from datetime import datetime, date, timedelta
 from pathlib import Path
 from typing import Optional
 
 import pandas as pd
-import yfinance as yf
+
+from market_data import IncompleteDataError, get_provider
+from instrumentation import count, timed
+import memprofile
+from workbook_cache import read_excel_cached
 
 
 # ==========================================================
@@ -26,12 +31,18 @@ logger = logging.getLogger("StockDataFiller")
 class YahooFinanceService:
     LOOKBACK_DAYS = 7
 
+    # ------------------------------------------------------
     @staticmethod
-    def _clean_columns(data: pd.DataFrame) -> pd.DataFrame:
-        """Flatten MultiIndex columns if present."""
-        if isinstance(data.columns, pd.MultiIndex):
-            data.columns = data.columns.get_level_values(0)
-        return data
+    def prefetch(tickers: list[str], first_date: date, last_date: date) -> None:
+        """Warm the provider cache for all tickers with one batched call."""
+        try:
+            get_provider().daily_bars(
+                tickers,
+                first_date - timedelta(days=YahooFinanceService.LOOKBACK_DAYS),
+                last_date + timedelta(days=1),
+            )
+        except IncompleteDataError as e:
+            logger.warning(f"Prefetch incomplete: {e}")
 
     # ------------------------------------------------------
     @staticmethod
@@ -39,20 +50,16 @@ class YahooFinanceService:
         try:
             start_date = target_date - timedelta(days=YahooFinanceService.LOOKBACK_DAYS)
 
-            data = yf.download(
-                ticker,
-                start=start_date,
-                end=target_date + timedelta(days=1),
-                progress=False,
-                auto_adjust=False,
+            data = get_provider().daily_bars(
+                [ticker],
+                start_date,
+                target_date + timedelta(days=1),
             )
 
             if data.empty:
                 logger.warning(f"No data for {ticker}")
                 return pd.DataFrame()
 
-            data = YahooFinanceService._clean_columns(data)
-
             return data
 
         except Exception as e:
@@ -71,10 +78,10 @@ class YahooFinanceService:
             row = data.iloc[-1]
 
             avg_price = (
-                float(row["Open"])
-                + float(row["High"])
-                + float(row["Low"])
-                + float(row["Close"])
+                float(row["open"])
+                + float(row["high"])
+                + float(row["low"])
+                + float(row["close"])
             ) / 4
 
             return avg_price
@@ -92,7 +99,7 @@ class YahooFinanceService:
             if data.empty:
                 return None
 
-            close_price = float(data["Close"].iloc[-1])
+            close_price = float(data["close"].iloc[-1])
             return close_price
 
         except Exception as e:
@@ -111,12 +118,13 @@ class StockDataProcessor:
         self.df = pd.DataFrame()
 
     # ------------------------------------------------------
+    @timed("excel_read", component="StockDataProcessor")
     def load_data(self):
 
         try:
             print("Reading Excel file...")
 
-            self.df = pd.read_excel(self.file_path)
+            self.df = read_excel_cached(self.file_path)
 
             print(f"Rows loaded: {len(self.df)}")
 
@@ -126,15 +134,43 @@ class StockDataProcessor:
 
 
     # ------------------------------------------------------
+    @timed("yahoo_fetch", component="StockDataProcessor")
+    def _prefetch_prices(self):
+
+        tickers = self.df["Sticker"].astype(str).str.strip()
+        trade_dates = pd.to_datetime(self.df["Date"], errors="coerce")
+        expiry_dates = pd.to_datetime(self.df["Expiry Date"], errors="coerce")
+
+        needs_price = self.df["Stock Price"].isna() & trade_dates.notna()
+        needs_end = (
+            self.df["SP_End"].isna()
+            & expiry_dates.notna()
+            & (expiry_dates.dt.date < self.today)
+        )
+
+        dates = pd.concat([trade_dates[needs_price], expiry_dates[needs_end]])
+
+        if dates.empty:
+            return
+
+        YahooFinanceService.prefetch(
+            tickers[needs_price | needs_end].unique().tolist(),
+            dates.min().date(),
+            dates.max().date(),
+        )
+
+    # ------------------------------------------------------
+    @timed("transform", component="StockDataProcessor")
     def fill_missing_values(self):
 
         try:
             print("Starting data processing...")
 
+            self._prefetch_prices()
+
             for i, row in self.df.iterrows():
 
                 ticker = str(row["Sticker"]).strip()
-                print(f"Processing row {i} — {ticker}")
 
                 trade_date = pd.to_datetime(row["Date"]).date()
                 expiry_date = pd.to_datetime(row["Expiry Date"]).date()
@@ -157,7 +193,9 @@ class StockDataProcessor:
                         self.df.at[i, "SP_End"] = close_price
                         print(f"✔ SP_End filled for {ticker}")
 
-            print("Processing finished.")
+            count("rows_processed", len(self.df), component="StockDataProcessor")
+
+            print(f"Processing finished: {len(self.df)} rows.")
 
         except Exception as e:
             logger.error("Error during processing: %s", e)
@@ -176,6 +214,7 @@ class StockDataProcessor:
                     logger.info(f"Filled SP_End for {ticker}")
 
     # ------------------------------------------------------
+    @timed("excel_write", component="StockDataProcessor")
     def save_output(self, output_path: Path):
 
         try:
@@ -204,7 +243,19 @@ class StockDataProcessor:
 # ==========================================================
 # MAIN
 # ==========================================================
-def main():
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(description="Fill missing stock prices in the option entries workbook.")
+    memprofile.add_argument(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+
+    args = parse_args(argv)
+
+    if args.profile_memory:
+        memprofile.enable()
 
     print("===== PROGRAM STARTED =====")
 
@@ -226,16 +277,22 @@ def main():
 
         processor = StockDataProcessor(input_file)
 
+        def frames():
+            return {"workbook": processor.df, "bar_cache": get_provider().cached_bytes()}
+
         print("Loading Excel data...")
-        processor.load_data()
+        with memprofile.memory_stage("load_data", frames):
+            processor.load_data()
         print("Excel loaded successfully.")
 
         print("Filling missing values from Yahoo Finance...")
-        processor.fill_missing_values()
+        with memprofile.memory_stage("fill_missing_values", frames):
+            processor.fill_missing_values()
         print("Data enrichment completed.")
 
         print("Saving output file...")
-        processor.save_output(output_file)
+        with memprofile.memory_stage("save_output", frames):
+            processor.save_output(output_file)
 
         print("===== SUCCESS =====")
         print(f"Output saved to: {output_file}")
@@ -250,6 +307,9 @@ def main():
         print("❌ UNEXPECTED ERROR:", e)
 
     finally:
+        if args.profile_memory:
+            memprofile.finish(args.profile_memory)
+
         print("===== PROGRAM FINISHED =====")
 
 if __name__ == "__main__":
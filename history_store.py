@@ -0,0 +1,419 @@
+"""
+Stocks_History Parquet Mirror
+-----------------------------
+Incrementally mirrors ``dbo.Stocks_History`` into a local Parquet dataset
+laid out as ``<root>/ticker=<T>/year=<Y>/data.parquet``. The query
+helper pushes ticker, date and column filters down to the partition
+reads, so research and backtests never touch the production database.
+
+    python history_store.py export                  # sync the mirror
+    python history_store.py query --tickers AAPL MSFT --start 2024-01-01
+
+Change detection compares per-ticker (min date, max date, row count)
+with the manifest. New days and back-filled months (previous_Data.py)
+are fetched as tail/head ranges. Anything else triggers a full re-export
+of that ticker only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from instrumentation import count, timed
+
+
+logger = logging.getLogger("HistoryStore")
+
+DEFAULT_ROOT = Path(os.environ.get("HISTORY_STORE_DIR", "stocks_history_parquet"))
+
+TABLE = "dbo.Stocks_History"
+VALUE_COLUMNS = ["open_price", "close_price", "high", "low", "volume"]
+
+SCHEMA = pa.schema([
+    ("date", pa.date32()),
+    ("open_price", pa.float64()),
+    ("close_price", pa.float64()),
+    ("high", pa.float64()),
+    ("low", pa.float64()),
+    ("volume", pa.int64()),
+])
+
+# Keeps IN (...) lists under SQL Server's 2100-parameter limit
+TICKER_CHUNK = 500
+
+
+# ================================================================
+# Mirror
+# ================================================================
+class HistoryStore:
+
+    MANIFEST = "_manifest.json"
+
+    def __init__(self, root: str | Path = DEFAULT_ROOT):
+        self.root = Path(root)
+
+    # ------------------------------------------------------------
+    # Layout
+    # ------------------------------------------------------------
+    def _partition_dir(self, ticker: str, year: int) -> Path:
+        return self.root / f"ticker={ticker}" / f"year={year}"
+
+    def _load_manifest(self) -> Dict[str, Dict[str, object]]:
+
+        try:
+            return json.loads((self.root / self.MANIFEST).read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest: Dict[str, Dict[str, object]]) -> None:
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        target = self.root / self.MANIFEST
+        tmp_path = target.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(manifest, indent=1, sort_keys=True))
+        os.replace(tmp_path, target)
+
+    # ------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------
+    @timed("sql_read", component="HistoryStore")
+    def _read_sql(self, engine, where: str, tickers: Sequence[str], params: Dict[str, object]) -> pd.DataFrame:
+
+        from sqlalchemy import text
+
+        frames = []
+
+        for i in range(0, len(tickers), TICKER_CHUNK):
+            chunk = list(tickers[i:i + TICKER_CHUNK])
+            names = [f"t{j}" for j in range(len(chunk))]
+            in_list = ", ".join(f":{name}" for name in names)
+
+            query = (
+                f"SELECT ticker, date, {', '.join(VALUE_COLUMNS)} FROM {TABLE} "
+                f"WHERE ticker IN ({in_list}){where}"
+            )
+
+            frames.append(pd.read_sql(text(query), engine, params={**params, **dict(zip(names, chunk))}))
+
+        if not frames:
+            return pd.DataFrame(columns=["ticker", "date", *VALUE_COLUMNS])
+
+        return pd.concat(frames, ignore_index=True)
+
+    def _summary(self, engine) -> pd.DataFrame:
+
+        from sqlalchemy import text
+
+        summary = pd.read_sql(
+            text(
+                f"SELECT ticker, MIN(date) AS min_date, MAX(date) AS max_date, COUNT(*) AS n "
+                f"FROM {TABLE} GROUP BY ticker"
+            ),
+            engine,
+        )
+        summary["min_date"] = pd.to_datetime(summary["min_date"]).dt.date.astype(str)
+        summary["max_date"] = pd.to_datetime(summary["max_date"]).dt.date.astype(str)
+
+        return summary
+
+    @timed("etl_run", component="HistoryStore")
+    def export(self, engine) -> Dict[str, int]:
+        """Bring the mirror up to date; returns counts of tickers per action."""
+
+        manifest = self._load_manifest()
+        summary = self._summary(engine)
+
+        full: List[str] = []
+        tails: Dict[str, str] = {}
+        heads: Dict[str, str] = {}
+        expected: Dict[str, Dict[str, object]] = {}
+
+        for row in summary.itertuples(index=False):
+            state = {"min_date": row.min_date, "max_date": row.max_date, "n": int(row.n)}
+            expected[row.ticker] = state
+            known = manifest.get(row.ticker)
+
+            if known == state:
+                continue
+
+            if known is None or row.min_date > known["min_date"] or row.max_date < known["max_date"]:
+                full.append(row.ticker)
+                continue
+
+            if row.max_date > known["max_date"]:
+                tails[row.ticker] = known["max_date"]
+            if row.min_date < known["min_date"]:
+                heads[row.ticker] = known["min_date"]
+
+            if row.ticker not in tails and row.ticker not in heads:
+                # Same range, different count: rows changed in the middle
+                full.append(row.ticker)
+
+        new_rows = []
+
+        if tails:
+            since = min(tails.values())
+            df = self._read_sql(engine, " AND date > :since", sorted(tails), {"since": since})
+            df = df[pd.to_datetime(df["date"]).dt.date.astype(str) > df["ticker"].map(tails)]
+            new_rows.append(df)
+
+        if heads:
+            until = max(heads.values())
+            df = self._read_sql(engine, " AND date < :until", sorted(heads), {"until": until})
+            df = df[pd.to_datetime(df["date"]).dt.date.astype(str) < df["ticker"].map(heads)]
+            new_rows.append(df)
+
+        if full:
+            new_rows.append(self._read_sql(engine, "", full, {}))
+
+        if new_rows:
+            self._write(pd.concat(new_rows, ignore_index=True), replace=set(full))
+
+        # Incremental ranges must add up to the server's count; otherwise redo
+        mismatched = [
+            ticker for ticker in set(tails) | set(heads)
+            if self._count_rows(ticker) != expected[ticker]["n"]
+        ]
+        if mismatched:
+            logger.warning("Row counts drifted for %d tickers; re-exporting them", len(mismatched))
+            self._write(self._read_sql(engine, "", mismatched, {}), replace=set(mismatched))
+
+        manifest.update({ticker: expected[ticker] for ticker in expected})
+        for ticker in set(manifest) - set(expected):
+            manifest.pop(ticker)
+            self._drop_ticker(ticker)
+
+        self._save_manifest(manifest)
+
+        stats = {
+            "unchanged": len(expected) - len(full) - len(set(tails) | set(heads)),
+            "incremental": len(set(tails) | set(heads)),
+            "full": len(full),
+        }
+        logger.info("Mirror synced: %s", stats)
+
+        return stats
+
+    # ------------------------------------------------------------
+    @timed("parquet_write", component="HistoryStore")
+    def _write(self, df: pd.DataFrame, replace: Iterable[str] = ()) -> None:
+        """Merge rows into their (ticker, year) partitions; ``replace`` tickers are rewritten."""
+
+        replace = set(replace)
+        for ticker in replace:
+            self._drop_ticker(ticker)
+
+        if df.empty:
+            return
+
+        df = df.copy()
+        df["date"] = pd.to_datetime(df["date"]).dt.date
+        df["volume"] = pd.to_numeric(df["volume"], errors="coerce").astype("Int64")
+        years = pd.to_datetime(df["date"]).dt.year
+
+        written = 0
+
+        for (ticker, year), part in df.groupby([df["ticker"], years], sort=False):
+
+            target = self._partition_dir(ticker, year) / "data.parquet"
+            part = part.drop(columns="ticker")
+
+            if target.exists():
+                existing = pq.read_table(target).to_pandas()
+                part = pd.concat([existing, part], ignore_index=True)
+
+            part = part.drop_duplicates("date", keep="last").sort_values("date")
+
+            table = pa.Table.from_pandas(part[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = target.with_suffix(".tmp")
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, target)
+
+            written += len(part)
+
+        count("rows_written", written, component="HistoryStore", table="parquet_mirror")
+
+    def _drop_ticker(self, ticker: str) -> None:
+
+        ticker_dir = self.root / f"ticker={ticker}"
+        if not ticker_dir.is_dir():
+            return
+
+        for part in ticker_dir.glob("year=*/data.parquet"):
+            part.unlink()
+        for year_dir in ticker_dir.glob("year=*"):
+            year_dir.rmdir()
+        ticker_dir.rmdir()
+
+    def _count_rows(self, ticker: str) -> int:
+        return sum(
+            pq.ParquetFile(part).metadata.num_rows
+            for part in (self.root / f"ticker={ticker}").glob("year=*/data.parquet")
+        )
+
+    # ------------------------------------------------------------
+    # Query
+    # ------------------------------------------------------------
+    def _files(self, tickers: Optional[Sequence[str]], start: Optional[date], end: Optional[date]) -> List[str]:
+        """Partition files to scan; pruned by ticker and year from the paths alone."""
+
+        ticker_dirs = (
+            [self.root / f"ticker={t}" for t in tickers]
+            if tickers is not None
+            else sorted(self.root.glob("ticker=*"))
+        )
+
+        first_year = start.year if start else None
+        last_year = end.year if end else None
+        files = []
+
+        for ticker_dir in ticker_dirs:
+            for year_dir in ticker_dir.glob("year=*"):
+                year = int(year_dir.name.split("=", 1)[1])
+                if first_year is not None and year < first_year:
+                    continue
+                if last_year is not None and year > last_year:
+                    continue
+                part = year_dir / "data.parquet"
+                if part.exists():
+                    files.append(str(part))
+
+        return files
+
+    def tickers(self) -> List[str]:
+        """Tickers present in the mirror."""
+        return sorted(self._load_manifest())
+
+    @timed("parquet_read", component="HistoryStore")
+    def query(
+        self,
+        tickers: Optional[Sequence[str]] = None,
+        start: str | date | None = None,
+        end: str | date | None = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Bars for ``tickers`` with ``start <= date < end``; ``columns``
+        limits the value columns read. Returns ticker, date and the
+        requested columns sorted by ticker and date.
+        """
+
+        start = pd.Timestamp(start).date() if start is not None else None
+        end = pd.Timestamp(end).date() if end is not None else None
+        columns = list(columns) if columns is not None else VALUE_COLUMNS
+
+        unknown = set(columns) - set(VALUE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {sorted(unknown)}")
+
+        files = self._files(tickers, start, end)
+
+        if not files:
+            return pd.DataFrame(columns=["ticker", "date", *columns])
+
+        dataset = ds.dataset(
+            files,
+            schema=SCHEMA.append(pa.field("ticker", pa.string())),
+            format="parquet",
+            partitioning=ds.partitioning(pa.schema([("ticker", pa.string())]), flavor="hive"),
+            partition_base_dir=str(self.root),
+        )
+
+        condition = None
+        if start is not None:
+            condition = ds.field("date") >= pa.scalar(start, pa.date32())
+        if end is not None:
+            upper = ds.field("date") < pa.scalar(end, pa.date32())
+            condition = upper if condition is None else condition & upper
+
+        table = dataset.to_table(columns=["ticker", "date", *columns], filter=condition)
+        df = table.to_pandas(date_as_object=False)
+
+        return df.sort_values(["ticker", "date"], ignore_index=True)
+
+
+def query_history(
+    tickers: Optional[Sequence[str]] = None,
+    start: str | date | None = None,
+    end: str | date | None = None,
+    columns: Optional[Sequence[str]] = None,
+    root: str | Path = DEFAULT_ROOT,
+) -> pd.DataFrame:
+    """Module-level shortcut for ``HistoryStore(root).query(...)``."""
+    return HistoryStore(root).query(tickers, start, end, columns)
+
+
+# ================================================================
+# Entry Point
+# ================================================================
+class Config:
+    SERVER = r".\SQLEXPRESS02"
+    DATABASE = "INVESTMENTS"
+
+
+def create_engine_from_config(config=Config):
+
+    from sqlalchemy import create_engine
+
+    return create_engine(
+        f"mssql+pyodbc://{config.SERVER}/{config.DATABASE}"
+        "?driver=ODBC+Driver+17+for+SQL+Server"
+        "&trusted_connection=yes"
+    )
+
+
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(description="Mirror dbo.Stocks_History to Parquet and query it locally.")
+    parser.add_argument("--root", type=Path, default=DEFAULT_ROOT)
+    sub = parser.add_subparsers(dest="action", required=True)
+
+    sub.add_parser("export", help="Sync the mirror from SQL Server")
+
+    query = sub.add_parser("query", help="Query the mirror")
+    query.add_argument("--tickers", nargs="+", default=None)
+    query.add_argument("--start", default=None)
+    query.add_argument("--end", default=None, help="exclusive")
+    query.add_argument("--columns", nargs="+", default=None, choices=VALUE_COLUMNS)
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+
+    args = parse_args(argv)
+    store = HistoryStore(args.root)
+
+    if args.action == "export":
+        print(store.export(create_engine_from_config()))
+        return
+
+    started = time.perf_counter()
+    df = store.query(args.tickers, args.start, args.end, args.columns)
+    elapsed = time.perf_counter() - started
+
+    print(df)
+    print(f"{len(df)} rows in {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+Technical Indicator Engine
+--------------------------
+Moving averages, realized volatility and ATR for every ticker in
+``dbo.Stocks_History`` in one vectorized pass, written to
+``dbo.Stock_Indicators`` (one row per ticker and date).
+
+Rows are sorted by (ticker, date) and each rolling window is a difference
+of cumulative sums, masked wherever the window would cross into the
+previous ticker. There is no per-ticker loop. Incremental runs read
+only the trailing ``max window`` bars before each ticker's own last
+computed date, plus the new bars (the whole history for tickers not yet
+computed), and write only the new dates.
+
+    python indicators.py                  # nightly: new dates only
+    python indicators.py --full           # recompute and replace everything
+    python indicators.py --from-mirror    # read bars from history_store
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import count, timed
+
+
+logger = logging.getLogger("IndicatorEngine")
+
+SOURCE_TABLE = "Stocks_History"
+TARGET_TABLE = "Stock_Indicators"
+SCHEMA = "dbo"
+
+SMA_WINDOWS = (20, 50, 200)
+VOL_WINDOW = 20
+ATR_WINDOW = 14
+TRADING_DAYS = 252
+
+INDICATOR_COLUMNS = [
+    *(f"sma_{w}" for w in SMA_WINDOWS),
+    f"realized_vol_{VOL_WINDOW}",
+    f"atr_{ATR_WINDOW}",
+]
+
+# Bars needed before the first new date so every window is full
+LOOKBACK = max(*SMA_WINDOWS, VOL_WINDOW + 1, ATR_WINDOW + 1)
+
+# Calendar days covering LOOKBACK trading days with room for holidays
+# (7/5 alone can fall short: 290 days before 2022-09-06 hold only 197 sessions)
+LOOKBACK_DAYS = pd.Timedelta(days=int(LOOKBACK * 1.6))
+
+# Tickers per IN (...) list, below SQL Server's 2100-parameter limit
+TICKER_CHUNK = 500
+
+
+# ================================================================
+# Grouped rolling kernels
+# ================================================================
+def _positions(tickers: np.ndarray) -> np.ndarray:
+    """Index of each row within its ticker run (rows sorted by ticker, date)."""
+
+    starts = np.r_[True, tickers[1:] != tickers[:-1]]
+    run_start = np.maximum.accumulate(np.where(starts, np.arange(len(tickers)), 0))
+    return np.arange(len(tickers)) - run_start
+
+
+def _window_sums(values: np.ndarray, window: int):
+    """Trailing ``window`` sums of values, squares and non-NaN counts."""
+
+    valid = ~np.isnan(values)
+    x = np.where(valid, values, 0.0)
+
+    def trailing(a):
+        cs = np.concatenate(([0.0], np.cumsum(a)))
+        out = np.full(len(a), np.nan)
+        out[window - 1:] = cs[window:] - cs[:-window]
+        return out
+
+    return trailing(x), trailing(x * x), trailing(valid.astype(np.float64))
+
+
+def rolling_mean(values: np.ndarray, pos: np.ndarray, window: int) -> np.ndarray:
+    """Per-ticker trailing mean; NaN until the window is full within the ticker."""
+
+    total, _, n = _window_sums(values, window)
+    out = total / window
+    out[(pos < window - 1) | (n < window)] = np.nan
+    return out
+
+
+def rolling_std(values: np.ndarray, pos: np.ndarray, window: int) -> np.ndarray:
+    """Per-ticker trailing sample standard deviation (ddof=1)."""
+
+    total, squares, n = _window_sums(values, window)
+    var = (squares - total * total / window) / (window - 1)
+    out = np.sqrt(np.clip(var, 0.0, None))
+    out[(pos < window - 1) | (n < window)] = np.nan
+    return out
+
+
+# ================================================================
+# Indicators
+# ================================================================
+@timed("transform", component="IndicatorEngine")
+def compute_indicators(bars: pd.DataFrame) -> pd.DataFrame:
+    """
+    ``bars`` has ticker, date, high, low and close_price for any number of
+    tickers. Returns ticker, date and INDICATOR_COLUMNS sorted by ticker
+    and date.
+
+    ATR is the simple mean of true range over ``ATR_WINDOW`` days rather
+    than Wilder's recursive smoothing. The simple mean keeps any trailing
+    window exact, which incremental refreshes rely on.
+    """
+
+    bars = bars.sort_values(["ticker", "date"], ignore_index=True)
+
+    tickers = bars["ticker"].to_numpy()
+    pos = _positions(tickers)
+
+    close = bars["close_price"].to_numpy(dtype=np.float64)
+    high = bars["high"].to_numpy(dtype=np.float64)
+    low = bars["low"].to_numpy(dtype=np.float64)
+
+    prev_close = np.r_[np.nan, close[:-1]]
+    prev_close[pos == 0] = np.nan
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_returns = np.log(close / prev_close)
+
+    true_range = np.fmax(
+        high - low,
+        np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)),
+    )
+
+    out = pd.DataFrame({"ticker": tickers, "date": bars["date"].to_numpy()})
+
+    for window in SMA_WINDOWS:
+        out[f"sma_{window}"] = rolling_mean(close, pos, window)
+
+    out[f"realized_vol_{VOL_WINDOW}"] = rolling_std(log_returns, pos, VOL_WINDOW) * np.sqrt(TRADING_DAYS)
+    out[f"atr_{ATR_WINDOW}"] = rolling_mean(true_range, pos, ATR_WINDOW)
+
+    return out
+
+
+# ================================================================
+# Refresh
+# ================================================================
+class IndicatorEngine:
+
+    def __init__(self, engine, source=None):
+        """``source`` is an optional history_store.HistoryStore to read bars from."""
+        self.engine = engine
+        self.source = source
+
+    # ------------------------------------------------------------
+    def _last_computed(self) -> Dict[str, pd.Timestamp]:
+
+        from sqlalchemy import inspect, text
+
+        if not inspect(self.engine).has_table(TARGET_TABLE, schema=SCHEMA):
+            return {}
+
+        df = pd.read_sql(
+            text(f"SELECT ticker, MAX(date) AS last_date FROM {SCHEMA}.{TARGET_TABLE} GROUP BY ticker"),
+            self.engine,
+        )
+        return dict(zip(df["ticker"], pd.to_datetime(df["last_date"])))
+
+    def _source_tickers(self) -> List[str]:
+
+        if self.source is not None:
+            return self.source.tickers()
+
+        from sqlalchemy import text
+
+        with self.engine.connect() as conn:
+            return list(conn.execute(text(f"SELECT DISTINCT ticker FROM {SCHEMA}.{SOURCE_TABLE}")).scalars())
+
+    @timed("sql_read", component="IndicatorEngine")
+    def _read_bars(self, since: Optional[pd.Timestamp], tickers: Optional[Sequence[str]] = None) -> pd.DataFrame:
+
+        columns = ["high", "low", "close_price"]
+
+        if self.source is not None:
+            return self.source.query(tickers=tickers, start=since, columns=columns)
+
+        from sqlalchemy import text
+
+        query = f"SELECT ticker, date, {', '.join(columns)} FROM {SCHEMA}.{SOURCE_TABLE}"
+        where, params = [], {}
+
+        if since is not None:
+            where.append("date >= :since")
+            params["since"] = since.date()
+
+        if tickers is None:
+            if where:
+                query += " WHERE " + " AND ".join(where)
+            return pd.read_sql(text(query), self.engine, params=params)
+
+        frames = []
+        for i in range(0, len(tickers), TICKER_CHUNK):
+            chunk = list(tickers[i:i + TICKER_CHUNK])
+            names = [f"t{j}" for j in range(len(chunk))]
+            in_list = ", ".join(f":{name}" for name in names)
+
+            frames.append(pd.read_sql(
+                text(f"{query} WHERE " + " AND ".join([*where, f"ticker IN ({in_list})"])),
+                self.engine,
+                params={**params, **dict(zip(names, chunk))},
+            ))
+
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["ticker", "date", *columns])
+
+    def _windows(self, last: Dict[str, pd.Timestamp]) -> Dict[Optional[pd.Timestamp], List[str]]:
+        """
+        Source tickers grouped by the first date each one needs: LOOKBACK
+        bars before its own last computed date, or its whole history
+        (None) if it has not been computed yet.
+        """
+
+        groups: Dict[Optional[pd.Timestamp], List[str]] = defaultdict(list)
+
+        for ticker in self._source_tickers():
+            watermark = last.get(ticker)
+            groups[None if watermark is None else watermark - LOOKBACK_DAYS].append(ticker)
+
+        return groups
+
+    def _read_incremental(self, last: Dict[str, pd.Timestamp]) -> pd.DataFrame:
+
+        groups = self._windows(last)
+        if not groups:
+            return self._read_bars(None)
+
+        # Usually nearly every ticker shares one watermark: read that window
+        # without a ticker list, and only the stragglers by name
+        common = max(groups, key=lambda since: len(groups[since]))
+        frames = []
+
+        for since, tickers in groups.items():
+            if since == common:
+                bars = self._read_bars(since)
+                frames.append(bars[bars["ticker"].isin(tickers)])
+            else:
+                frames.append(self._read_bars(since, tickers))
+
+        logger.info("Read bars for %d tickers in %d watermark groups", sum(map(len, groups.values())), len(groups))
+
+        bars = pd.concat(frames, ignore_index=True)
+
+        # Every computed ticker needs LOOKBACK - 1 bars up to its watermark for
+        # the first new date; appended rows are never revisited, so a short
+        # window (long gap in the data) is re-read in full rather than written as NaN
+        old = pd.to_datetime(bars["date"]) <= bars["ticker"].map(last)
+        old_bars = bars.loc[old, "ticker"].value_counts()
+        computed = [t for since, tickers in groups.items() if since is not None for t in tickers]
+        short = [t for t in computed if old_bars.get(t, 0) < LOOKBACK - 1]
+
+        if short:
+            logger.info("Re-reading full history for %d tickers with a short lookback window", len(short))
+            bars = pd.concat([bars[~bars["ticker"].isin(short)], self._read_bars(None, short)], ignore_index=True)
+
+        return bars
+
+    @staticmethod
+    def _trim(bars: pd.DataFrame, last: Dict[str, pd.Timestamp]) -> pd.DataFrame:
+        """Per ticker, keep the LOOKBACK bars up to its last computed date and everything after."""
+
+        bars = bars.sort_values(["ticker", "date"], ignore_index=True)
+        cutoff = bars["ticker"].map(last)
+
+        old = bars["date"] <= cutoff
+        # Rank old bars from the newest backwards within each ticker
+        old_rank = old[::-1].groupby(bars["ticker"][::-1]).cumsum()[::-1]
+
+        return bars[~old | (old_rank <= LOOKBACK)]
+
+    # ------------------------------------------------------------
+    @timed("etl_run", component="IndicatorEngine")
+    def refresh(self, full: bool = False) -> int:
+        """Compute and write indicators for dates not yet in the target table."""
+
+        last = {} if full else self._last_computed()
+
+        # Each ticker is read from its own watermark, so one stale ticker does
+        # not widen everyone's read and a new ticker gets its whole history
+        bars = self._read_incremental(last) if last else self._read_bars(None)
+        if bars.empty:
+            logger.info("No bars to process")
+            return 0
+
+        bars["date"] = pd.to_datetime(bars["date"])
+
+        if last:
+            bars = self._trim(bars, last)
+
+        result = compute_indicators(bars)
+
+        if last:
+            cutoff = result["ticker"].map(last)
+            result = result[cutoff.isna() | (result["date"] > cutoff)]
+
+        self._write(result, replace=full)
+
+        logger.info("Wrote %d indicator rows for %d tickers", len(result), result["ticker"].nunique())
+        return len(result)
+
+    @timed("sql_write", component="IndicatorEngine")
+    def _write(self, df: pd.DataFrame, replace: bool) -> None:
+
+        df = df.assign(date=df["date"].dt.date)
+
+        df.to_sql(
+            TARGET_TABLE,
+            self.engine,
+            schema=SCHEMA,
+            if_exists="replace" if replace else "append",
+            index=False,
+            chunksize=10_000,
+        )
+
+        count("rows_written", len(df), component="IndicatorEngine", table=TARGET_TABLE)
+
+
+# ================================================================
+# Entry Point
+# ================================================================
+def parse_args(argv: Optional[Sequence[str]] = None):
+
+    parser = argparse.ArgumentParser(description="Refresh dbo.Stock_Indicators from dbo.Stocks_History.")
+    parser.add_argument("--full", action="store_true", help="Recompute all dates and replace the table")
+    parser.add_argument(
+        "--from-mirror",
+        action="store_true",
+        help="Read bars from the local Parquet mirror (history_store) instead of SQL Server",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+
+    args = parse_args(argv)
+
+    # Imported here so --help and imports stay cheap
+    from history_store import HistoryStore, create_engine_from_config
+
+    engine = IndicatorEngine(
+        create_engine_from_config(),
+        source=HistoryStore() if args.from_mirror else None,
+    )
+
+    started = time.perf_counter()
+    rows = engine.refresh(full=args.full)
+    print(f"{rows} indicator rows in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
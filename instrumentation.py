@@ -0,0 +1,286 @@
+"""
+Lightweight ETL Instrumentation
+-------------------------------
+Timed spans and counters around the named pipeline stages
+(excel_read, yahoo_fetch, transform, sql_write, ...), emitted as JSON lines.
+
+Disabled by default: every call short-circuits on one flag check, so the
+hooks can stay in hot paths. Enable with ETL_METRICS_FILE=<path> or
+``configure(path)``.
+
+    python instrumentation.py metrics.jsonl     # per-stage percentiles
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional
+
+
+Record = Dict[str, object]
+Sink = Callable[[Record], None]
+
+
+# ============================================================
+# Sinks
+# ============================================================
+
+class JsonLinesSink:
+    """Appends one JSON object per record; safe across threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fh = open(path, "a", buffering=1, encoding="utf-8")
+
+    def __call__(self, record: Record) -> None:
+
+        line = json.dumps(record, default=str)
+
+        with self._lock:
+            self._fh.write(line + "\n")
+
+    def close(self) -> None:
+
+        with self._lock:
+            self._fh.close()
+
+
+class StatsSink:
+    """In-memory aggregate of recent span durations and counter totals."""
+
+    def __init__(self, window: int = 10_000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._durations: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+        self._counters: Dict[str, float] = defaultdict(float)
+
+    def __call__(self, record: Record) -> None:
+
+        with self._lock:
+            if record["type"] == "span":
+                self._durations[record["name"]].append(record["duration_ms"])
+            else:
+                self._counters[record["name"]] += record["value"]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+
+        with self._lock:
+            stats = {name: percentiles(values) for name, values in self._durations.items()}
+            for name, total in self._counters.items():
+                stats[name] = {"total": total}
+
+        return stats
+
+
+# ============================================================
+# Spans
+# ============================================================
+
+class _Span:
+
+    __slots__ = ("name", "tags", "start")
+
+    def __init__(self, name: str, tags: Dict[str, object]):
+        self.name = name
+        self.tags = tags
+        self.start = 0.0
+
+    def tag(self, **tags) -> "_Span":
+        self.tags.update(tags)
+        return self
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+
+        duration_ms = (time.perf_counter() - self.start) * 1000.0
+
+        _emit({
+            "ts": time.time(),
+            "type": "span",
+            "name": self.name,
+            "duration_ms": round(duration_ms, 3),
+            "status": "error" if exc_type is not None else "ok",
+            **self.tags,
+        })
+
+        return False
+
+
+class _NullSpan:
+
+    __slots__ = ()
+
+    def tag(self, **tags) -> "_NullSpan":
+        return self
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+# ============================================================
+# Module State
+# ============================================================
+
+class _State:
+    enabled = False
+    sinks: List[Sink] = []
+
+
+def _emit(record: Record) -> None:
+
+    for sink in _State.sinks:
+        try:
+            sink(record)
+        except Exception:
+            # Metrics must never break the pipeline
+            pass
+
+
+def add_sink(sink: Sink) -> None:
+
+    _State.sinks.append(sink)
+    _State.enabled = True
+
+
+def remove_sink(sink: Sink) -> None:
+
+    if sink in _State.sinks:
+        _State.sinks.remove(sink)
+
+    _State.enabled = bool(_State.sinks)
+
+
+def configure(path: Optional[str] = None) -> Optional[JsonLinesSink]:
+    """Enable instrumentation, writing JSON lines to ``path`` if given."""
+
+    sink = JsonLinesSink(path) if path else None
+
+    if sink is not None:
+        add_sink(sink)
+
+    return sink
+
+
+def enabled() -> bool:
+    return _State.enabled
+
+
+# ============================================================
+# Public API
+# ============================================================
+
+def span(name: str, **tags):
+    """Context manager timing one stage; a shared no-op when disabled."""
+
+    if not _State.enabled:
+        return _NULL_SPAN
+
+    return _Span(name, tags)
+
+
+def count(name: str, value: float = 1, **tags) -> None:
+
+    if not _State.enabled:
+        return
+
+    _emit({"ts": time.time(), "type": "counter", "name": name, "value": value, **tags})
+
+
+def timed(name: str, **tags):
+    """Decorator form of ``span``."""
+
+    def decorator(fn):
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _State.enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, dict(tags)):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# ============================================================
+# Reporting
+# ============================================================
+
+def percentiles(values: Iterable[float]) -> Dict[str, float]:
+
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p99_ms": pick(0.99),
+        "max_ms": ordered[-1],
+        "total_ms": sum(ordered),
+    }
+
+
+def summarize_file(path: str) -> Dict[str, Dict[str, float]]:
+    """Per-stage percentiles from a JSON-lines metrics file."""
+
+    stats = StatsSink(window=sys.maxsize)
+
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                record = json.loads(line)
+                key = record["name"]
+                if record.get("component"):
+                    key = f"{record['component']}.{key}"
+                stats({**record, "name": key})
+
+    return stats.summary()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize a JSON-lines metrics file")
+    parser.add_argument("metrics_file", help="file written via ETL_METRICS_FILE")
+    args = parser.parse_args(argv)
+
+    for name, stats in sorted(summarize_file(args.metrics_file).items()):
+        if "total" in stats:
+            print(f"{name:<48} total={stats['total']:g}")
+        else:
+            print(
+                f"{name:<48} n={stats['count']:<7} p50={stats['p50_ms']:.1f}ms "
+                f"p90={stats['p90_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms max={stats['max_ms']:.1f}ms"
+            )
+
+
+# Opt-in from the environment so scheduled jobs need no code changes
+if os.environ.get("ETL_METRICS_FILE"):
+    configure(os.environ["ETL_METRICS_FILE"])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
-import yfinance as yf
-import pyodbc
-import pandas as pd
+import argparse
+
+from instrumentation import count, span
 
 # ==============================
 # CONFIG — CHANGE DATES MANUALLY
@@ -10,22 +10,36 @@ END_DATE   = "2026-02-18"
 
 BATCH_SIZE = 50
 
+# Tickers still failing after retries are recorded here for backfill
+FAILED_FILE = "failed_tickers.txt"
+
 # ==============================
 # SQL CONNECTION
 # ==============================
-conn = pyodbc.connect(
+CONNECTION_STRING = (
     "DRIVER={ODBC Driver 17 for SQL Server};"
     "SERVER=.\\SQLEXPRESS02;"
     "DATABASE=INVESTMENTS;"
     "Trusted_Connection=yes;"
 )
 
-cursor = conn.cursor()
+INSERT_QUERY = """
+    INSERT INTO dbo.Stocks_History
+    (ticker, date, open_price, close_price, high, low, volume)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def get_connection():
+    # Imported here so --help and imports stay cheap
+    import pyodbc
+
+    return pyodbc.connect(CONNECTION_STRING)
 
 # ==============================
 # MANUAL TICKER LIST
 # ==============================
-tickers = [
+TICKERS = [
 "AAPL","MSFT","AMZN","NVDA","GOOGL","GOOG","META","BRK.B","TSLA","UNH",
 "JNJ","JPM","V","XOM","PG","MA","HD","LLY","CVX","MRK","ABBV","PEP","KO",
 "AVGO","COST","BAC","TMO","WMT","CSCO","MCD","ABT","CRM","ACN","DHR","LIN",
@@ -71,68 +85,104 @@ tickers = [
 "SYF","COR","CINF","RVTY","NDSN","EME","ACM","IPG","OMC","WTW","AIG","UBER"
 ]
 
-# Convert Yahoo special symbols
-tickers = [t.replace(".", "-") for t in tickers]
 
-print(f"Total tickers: {len(tickers)}")
+def load_tickers():
+    # Convert Yahoo special symbols
+    return [t.replace(".", "-") for t in TICKERS]
 
 # ==============================
 # PROCESS IN BATCHES
 # ==============================
-for i in range(0, len(tickers), BATCH_SIZE):
-
-    batch = tickers[i:i+BATCH_SIZE]
-    print(f"Processing batch {i//BATCH_SIZE + 1}")
-
-    data = yf.download(
-        batch,
-        start=START_DATE,
-        end=END_DATE,
-        group_by="ticker",
-        auto_adjust=False,
-        threads=True,
-        progress=False
-    )
-
-    for ticker in batch:
-
-        if ticker not in data:
-            continue
-
-        df = data[ticker]
-
-        if df.empty:
-            continue
-
-        df = df.reset_index()
-
-        for _, row in df.iterrows():
-
-            open_p  = None if pd.isna(row["Open"]) else round(float(row["Open"]), 2)
-            close_p = None if pd.isna(row["Close"]) else round(float(row["Close"]), 2)
-            high_p  = None if pd.isna(row["High"]) else round(float(row["High"]), 2)
-            low_p   = None if pd.isna(row["Low"]) else round(float(row["Low"]), 2)
-            volume  = None if pd.isna(row["Volume"]) else int(row["Volume"])
-
-            cursor.execute("""
-                INSERT INTO dbo.Stocks_History
-                (ticker, date, open_price, close_price, high, low, volume)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            ticker,
-            row["Date"].date(),
-            open_p,
-            close_p,
-            high_p,
-            low_p,
-            volume
+def write_rows(cursor, data):
+
+    import pandas as pd
+
+    with span("sql_write", component="latest_Data", rows=len(data)):
+
+        for row in data.itertuples(index=False):
+
+            open_p  = None if pd.isna(row.open) else round(float(row.open), 2)
+            close_p = None if pd.isna(row.close) else round(float(row.close), 2)
+            high_p  = None if pd.isna(row.high) else round(float(row.high), 2)
+            low_p   = None if pd.isna(row.low) else round(float(row.low), 2)
+            volume  = None if pd.isna(row.volume) else int(row.volume)
+
+            cursor.execute(
+                INSERT_QUERY,
+                row.ticker,
+                row.date.date(),
+                open_p,
+                close_p,
+                high_p,
+                low_p,
+                volume
             )
 
+    count("rows_written", len(data), component="latest_Data", table="Stocks_History")
+
+
+def load_range(conn, tickers, start_date, end_date):
+    """Download and insert [start_date, end_date); returns failed tickers."""
+
+    from market_data import IncompleteDataError, get_provider
+
+    provider = get_provider()
+    cursor = conn.cursor()
+    failed_tickers = []
+
+    for i in range(0, len(tickers), BATCH_SIZE):
+
+        batch = tickers[i:i+BATCH_SIZE]
+        print(f"Processing batch {i//BATCH_SIZE + 1}")
+
+        # Rate-limited and retried; keep what arrived, record the rest
+        try:
+            data = provider.daily_bars(batch, start_date, end_date)
+        except IncompleteDataError as e:
+            data = e.partial
+            failed_tickers.extend(e.failed_tickers)
+
+        write_rows(cursor, data)
+
+    conn.commit()
+    cursor.close()
+
+    return failed_tickers
+
 # ==============================
-# SAVE DATA
+# MAIN
 # ==============================
-conn.commit()
-cursor.close()
-conn.close()
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(description="Load recent daily bars into dbo.Stocks_History.")
+    parser.add_argument("--start", default=START_DATE, help=f"First date (default {START_DATE})")
+    parser.add_argument("--end", default=END_DATE, help=f"End date, exclusive (default {END_DATE})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+
+    args = parse_args(argv)
+
+    tickers = load_tickers()
+    print(f"Total tickers: {len(tickers)}")
+
+    conn = get_connection()
+
+    try:
+        failed_tickers = load_range(conn, tickers, args.start, args.end)
+    finally:
+        conn.close()
+
+    if failed_tickers:
+        with open(FAILED_FILE, "a") as f:
+            for ticker in failed_tickers:
+                f.write(f"{args.start},{args.end},{ticker}\n")
+
+        print(f"⚠ {len(failed_tickers)} tickers failed after retries — listed in {FAILED_FILE}")
+
+    print("✅ Latest data loaded into dbo.Stocks_History")
+
 
-print("✅ Latest data loaded into dbo.Stocks_History")
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,22 @@
-import pandas as pd
-import pyodbc
+import argparse
 
-# -----------------------------
-# 1️⃣ Read Excel File
-# -----------------------------
-file_path = r"C:\Users\user\Desktop\option_spreads_data.xlsx"
-df = pd.read_excel(file_path)
+from instrumentation import count, timed
 
 # -----------------------------
-# 2️⃣ Clean / Convert Data Types
+# Configuration
 # -----------------------------
+FILE_PATH = r"C:\Users\user\Desktop\option_spreads_data.xlsx"
+
+CONNECTION_STRING = (
+    'DRIVER={ODBC Driver 17 for SQL Server};'
+    'SERVER=localhost\\SQLEXPRESS02;'
+    'DATABASE=Investments;'
+    'Trusted_Connection=yes;'
+)
 
-# Convert date columns properly
-df['trade_date'] = pd.to_datetime(df['trade_date'], errors='coerce')
-df['expiration_date'] = pd.to_datetime(df['expiration_date'], errors='coerce')
-df['status_change_date'] = pd.to_datetime(df['status_change_date'], errors='coerce')
+DATE_COLUMNS = ['trade_date', 'expiration_date', 'status_change_date']
 
-# Convert numeric columns safely
-numeric_columns = [
+NUMERIC_COLUMNS = [
     'ticker_price', 'option_price', 'strike_price_lower',
     'strike_price_upper', 'option_quantity',
     'contract_amount', 'coll_amount',
@@ -26,26 +25,7 @@ numeric_columns = [
     'cost_of_close'
 ]
 
-for col in numeric_columns:
-    df[col] = pd.to_numeric(df[col], errors='coerce')
-
-# -----------------------------
-# 3️⃣ Connect to SQL Server
-# -----------------------------
-conn = pyodbc.connect(
-    'DRIVER={ODBC Driver 17 for SQL Server};'
-    'SERVER=localhost\\SQLEXPRESS02;'
-    'DATABASE=Investments;'
-    'Trusted_Connection=yes;'
-)
-
-cursor = conn.cursor()
-cursor.fast_executemany = True  # Faster inserts
-
-# -----------------------------
-# 4️⃣ Insert Data Properly
-# -----------------------------
-insert_query = """
+INSERT_QUERY = """
 INSERT INTO dbo.option_spreads (
     id,
     date,
@@ -71,39 +51,128 @@ INSERT INTO dbo.option_spreads (
 VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
 """
 
-data_to_insert = []
-
-for _, row in df.iterrows():
-    data_to_insert.append((
-        str(row['id']) if pd.notna(row['id']) else None,
-        row['trade_date'].date() if pd.notna(row['trade_date']) else None,
-        row['ticker'],
-        row['ticker_price'],
-        row['option_type'],
-        row['tran_type'],
-        row['option_price'],
-        row['strike_price_lower'],
-        row['strike_price_upper'],
-        row['option_quantity'],
-        row['contract_amount'],
-        row['coll_amount'],
-        row['rate_of_return'],
-        row['expiration_date'].date() if pd.notna(row['expiration_date']) else None,
-        int(row['num_of_days']) if pd.notna(row['num_of_days']) else None,
-        row['status'],
-        row['status_change_date'].date() if pd.notna(row['status_change_date']) else None,
-        row['status_change_price'],
-        row['cost_of_contract'],
-        row['cost_of_close']
-    ))
-
-cursor.executemany(insert_query, data_to_insert)
 
 # -----------------------------
-# 5️⃣ Commit & Close
+# 1️⃣ Read Excel File
 # -----------------------------
-conn.commit()
-cursor.close()
-conn.close()
+@timed("excel_read", component="load_to_sql")
+def read_spreads(file_path=FILE_PATH):
+    from workbook_cache import read_excel_cached
+
+    return read_excel_cached(file_path)
+
+
+# -----------------------------
+# 2️⃣ Clean / Convert Data Types
+# -----------------------------
+@timed("transform", component="load_to_sql")
+def clean_data(df):
+
+    import pandas as pd
+
+    # Convert date columns properly
+    for col in DATE_COLUMNS:
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+
+    # Convert numeric columns safely
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    return df
+
+
+# -----------------------------
+# 3️⃣ Build Insert Rows
+# -----------------------------
+def build_rows(df):
+
+    import pandas as pd
+
+    data_to_insert = []
+
+    for _, row in df.iterrows():
+        data_to_insert.append((
+            str(row['id']) if pd.notna(row['id']) else None,
+            row['trade_date'].date() if pd.notna(row['trade_date']) else None,
+            row['ticker'],
+            row['ticker_price'],
+            row['option_type'],
+            row['tran_type'],
+            row['option_price'],
+            row['strike_price_lower'],
+            row['strike_price_upper'],
+            row['option_quantity'],
+            row['contract_amount'],
+            row['coll_amount'],
+            row['rate_of_return'],
+            row['expiration_date'].date() if pd.notna(row['expiration_date']) else None,
+            int(row['num_of_days']) if pd.notna(row['num_of_days']) else None,
+            row['status'],
+            row['status_change_date'].date() if pd.notna(row['status_change_date']) else None,
+            row['status_change_price'],
+            row['cost_of_contract'],
+            row['cost_of_close']
+        ))
+
+    return data_to_insert
+
+
+# -----------------------------
+# 4️⃣ Insert Data Properly
+# -----------------------------
+@timed("sql_write", component="load_to_sql")
+def insert_spreads(conn, df):
+    """
+    Insert cleaned rows in one transaction. Works with any DB-API
+    connection using qmark parameters (pyodbc, sqlite3).
+    """
+
+    cursor = conn.cursor()
+
+    if hasattr(cursor, 'fast_executemany'):
+        cursor.fast_executemany = True  # Faster inserts
+
+    data_to_insert = build_rows(df)
+
+    cursor.executemany(INSERT_QUERY, data_to_insert)
+
+    conn.commit()
+    cursor.close()
+
+    count("rows_written", len(data_to_insert), component="load_to_sql", table="option_spreads")
+
+    return len(data_to_insert)
+
+
+# -----------------------------
+# 5️⃣ Run
+# -----------------------------
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(description="Insert the option spreads workbook into dbo.option_spreads")
+    parser.add_argument("--file", default=FILE_PATH, help="workbook to load")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+
+    args = parse_args(argv)
+
+    df = clean_data(read_spreads(args.file))
+
+    # Imported here so --help and imports stay cheap
+    import pyodbc
+
+    conn = pyodbc.connect(CONNECTION_STRING)
+
+    try:
+        insert_spreads(conn, df)
+    finally:
+        conn.close()
+
+    print("✅ Data inserted successfully into dbo.option_spreads!")
+
 
-print("✅ Data inserted successfully into dbo.option_spreads!")
+if __name__ == "__main__":
+    main()
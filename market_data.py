@@ -0,0 +1,638 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import count, span
+from rate_limiter import MarketDataError, ThrottledError, is_throttle_error, yahoo_caller
+from singleflight import SingleFlight
+
+
+logger = logging.getLogger("MarketData")
+
+
+BAR_COLUMNS = ["ticker", "date", "open", "high", "low", "close", "adj_close", "volume"]
+
+DateLike = Union[str, date, datetime, pd.Timestamp]
+
+
+# ================================================================
+# Exceptions
+# ================================================================
+class IncompleteDataError(MarketDataError):
+    """
+    Some tickers could not be fetched even after retries.
+
+    ``partial`` holds the bars that did arrive so callers can keep them
+    while reporting ``failed_tickers``.
+    """
+
+    def __init__(self, failed_tickers: List[str], partial: pd.DataFrame):
+        self.failed_tickers = sorted(failed_tickers)
+        self.partial = partial
+        super().__init__(f"Market data unavailable for {self.failed_tickers}")
+
+
+# ================================================================
+# Provider Interface
+# ================================================================
+class MarketDataProvider(ABC):
+    """
+    Single entry point for quotes, daily bars and option expirations.
+
+    Public methods batch requests into chunks of ``BATCH_SIZE`` and share
+    one in-process cache; backends only implement the ``_fetch_*`` hooks.
+    Quote and expiration lookups are single-flighted, so concurrent
+    callers asking for the same ticker share one upstream request.
+
+    ``daily_bars`` returns a long frame with ``BAR_COLUMNS``; ``end`` is
+    exclusive, matching ``yf.download``. Tickers that fail after retries
+    raise ``IncompleteDataError`` once every batch has been attempted;
+    tickers with simply no bars in the range are only logged.
+    """
+
+    BATCH_SIZE = 50
+    QUOTE_TTL_SECONDS = 15
+    OPEN_BARS_TTL_SECONDS = 300
+    EXPIRATIONS_TTL_SECONDS = 3600
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bars: Dict[str, List[Tuple[pd.Timestamp, pd.Timestamp, float, pd.DataFrame]]] = {}
+
+        self._quote_flights: SingleFlight[Tuple[str, str], Optional[float]] = SingleFlight(
+            ttl=self.QUOTE_TTL_SECONDS
+        )
+        self._expiration_flights: SingleFlight[Tuple[str, str], List[pd.Timestamp]] = SingleFlight(
+            ttl=self.EXPIRATIONS_TTL_SECONDS, cache_if=bool
+        )
+
+    # ------------------------------------------------------------
+    # Backend hooks
+    # ------------------------------------------------------------
+    @abstractmethod
+    def _fetch_last_prices(self, tickers: List[str]) -> Dict[str, Optional[float]]:
+        ...
+
+    @abstractmethod
+    def _fetch_daily_bars(
+        self, tickers: List[str], start: pd.Timestamp, end: pd.Timestamp
+    ) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def _fetch_expirations(self, ticker: str) -> List[pd.Timestamp]:
+        ...
+
+    # ------------------------------------------------------------
+    # Quotes
+    # ------------------------------------------------------------
+    def last_prices(self, tickers: Iterable[str]) -> Dict[str, Optional[float]]:
+
+        tickers = _unique(tickers)
+        keys = [("last_price", ticker) for ticker in tickers]
+
+        prices = self._quote_flights.do_many(keys, self._load_quotes)
+
+        return {ticker: prices.get(("last_price", ticker)) for ticker in tickers}
+
+    def _load_quotes(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[float]]:
+
+        prices: Dict[Tuple[str, str], Optional[float]] = {}
+
+        for batch in _chunks([ticker for _, ticker in keys], self.BATCH_SIZE):
+            try:
+                with span("yahoo_fetch", component=type(self).__name__, kind="quotes", tickers=len(batch)):
+                    fetched = self._fetch_last_prices(batch)
+            except MarketDataError as exc:
+                logger.error("Quote batch failed for %s: %s", batch, exc)
+                fetched = {}
+            except Exception as exc:
+                logger.exception("Quote batch failed for %s: %s", batch, exc)
+                fetched = {}
+
+            for ticker in batch:
+                prices[("last_price", ticker)] = fetched.get(ticker)
+
+            failures = sum(1 for ticker in batch if fetched.get(ticker) is None)
+            if failures:
+                count("yahoo_fetch_failures", failures, component=type(self).__name__, kind="quotes")
+
+        return prices
+
+    def last_price(self, ticker: str) -> Optional[float]:
+        return self.last_prices([ticker]).get(ticker)
+
+    # ------------------------------------------------------------
+    # Daily bars
+    # ------------------------------------------------------------
+    def daily_bars(self, tickers: Iterable[str], start: DateLike, end: DateLike) -> pd.DataFrame:
+
+        tickers = _unique(tickers)
+        start_ts = _to_day(start)
+        end_ts = _to_day(end)
+
+        frames: List[pd.DataFrame] = []
+        missing: List[str] = []
+        failed: List[str] = []
+
+        for ticker in tickers:
+            cached = self._cached_bars(ticker, start_ts, end_ts)
+            if cached is None:
+                missing.append(ticker)
+            else:
+                frames.append(cached)
+
+        for batch in _chunks(missing, self.BATCH_SIZE):
+            try:
+                with span("yahoo_fetch", component=type(self).__name__, kind="bars", tickers=len(batch)):
+                    fetched = self._fetch_daily_bars(batch, start_ts, end_ts)
+                batch_failed: List[str] = []
+            except IncompleteDataError as exc:
+                fetched = exc.partial
+                batch_failed = exc.failed_tickers
+            except Exception as exc:
+                logger.exception("Bar batch failed for %s: %s", batch, exc)
+                failed.extend(batch)
+                continue
+
+            fetched_ok = [t for t in batch if t not in batch_failed]
+            self._store_bars(fetched_ok, start_ts, end_ts, fetched)
+            frames.append(fetched)
+            failed.extend(batch_failed)
+
+            absent = sorted(set(fetched_ok) - set(fetched["ticker"].unique()))
+            if absent:
+                logger.warning("No bars for %s between %s and %s", absent, start_ts.date(), end_ts.date())
+
+        bars = (
+            pd.concat(frames, ignore_index=True).sort_values(["ticker", "date"], ignore_index=True)
+            if frames
+            else _empty_bars()
+        )
+
+        if failed:
+            count("yahoo_fetch_failures", len(failed), component=type(self).__name__, kind="bars")
+            logger.error("Bars unavailable after retries for %s", sorted(failed))
+            raise IncompleteDataError(failed, bars)
+
+        return bars
+
+    def _cached_bars(
+        self, ticker: str, start: pd.Timestamp, end: pd.Timestamp
+    ) -> Optional[pd.DataFrame]:
+        """Serve any request fully covered by a previously fetched range."""
+
+        now = time.monotonic()
+
+        with self._lock:
+            for cached_start, cached_end, expires_at, frame in self._bars.get(ticker, []):
+                if cached_start <= start and end <= cached_end and now < expires_at:
+                    mask = (frame["date"] >= start) & (frame["date"] < end)
+                    return frame.loc[mask]
+
+        return None
+
+    def _store_bars(
+        self, batch: List[str], start: pd.Timestamp, end: pd.Timestamp, fetched: pd.DataFrame
+    ) -> None:
+
+        # Ranges that reach today can still change; past ranges cannot
+        if end > pd.Timestamp(date.today()):
+            expires_at = time.monotonic() + self.OPEN_BARS_TTL_SECONDS
+        else:
+            expires_at = float("inf")
+
+        grouped = dict(tuple(fetched.groupby("ticker", sort=False)))
+
+        with self._lock:
+            for ticker in batch:
+                frame = grouped.get(ticker, _empty_bars())
+                # Drop entries the new range supersedes
+                entries = [
+                    entry for entry in self._bars.get(ticker, [])
+                    if not (start <= entry[0] and entry[1] <= end)
+                ]
+                entries.append((start, end, expires_at, frame))
+                self._bars[ticker] = entries
+
+    # ------------------------------------------------------------
+    # Option expirations
+    # ------------------------------------------------------------
+    def expirations(self, ticker: str) -> List[pd.Timestamp]:
+
+        expiries = self._expiration_flights.do(
+            ("expirations", ticker),
+            lambda: self._load_expirations(ticker),
+        )
+
+        return list(expiries)
+
+    def _load_expirations(self, ticker: str) -> List[pd.Timestamp]:
+
+        try:
+            with span("yahoo_fetch", component=type(self).__name__, kind="expirations", tickers=1):
+                return self._fetch_expirations(ticker)
+        except MarketDataError as exc:
+            logger.error("Failed to fetch expirations for %s: %s", ticker, exc)
+        except Exception as exc:
+            logger.exception("Failed to fetch expirations for %s: %s", ticker, exc)
+
+        return []
+
+    def cached_bytes(self) -> int:
+        """Deep size of the cached bar frames, for memory profiling."""
+
+        with self._lock:
+            frames = [entry[3] for entries in self._bars.values() for entry in entries]
+
+        return int(sum(frame.memory_usage(deep=True).sum() for frame in frames))
+
+    def clear_cache(self) -> None:
+
+        with self._lock:
+            self._bars.clear()
+
+        self._quote_flights.clear()
+        self._expiration_flights.clear()
+
+
+# ================================================================
+# yfinance Backend
+# ================================================================
+# Serializes yf.download, whose per-ticker errors land in the shared yf.shared._ERRORS
+_YF_DOWNLOAD_LOCK = threading.Lock()
+
+class YFinanceProvider(MarketDataProvider):
+
+    PRICE_FIELDS = {
+        "Open": "open",
+        "High": "high",
+        "Low": "low",
+        "Close": "close",
+        "Adj Close": "adj_close",
+        "Volume": "volume",
+    }
+
+    def __init__(self):
+        super().__init__()
+        import yfinance as yf
+
+        self._yf = yf
+        self._caller = yahoo_caller()
+
+    def _fetch_last_prices(self, tickers: List[str]) -> Dict[str, Optional[float]]:
+
+        # One intraday download per batch instead of one request per ticker
+        # Regular session only, like fast_info.last_price: no pre/post-market prints
+        frames, _failed = self._guarded_download(
+            tickers,
+            period="1d",
+            interval="1m",
+        )
+
+        prices: Dict[str, Optional[float]] = {}
+
+        for ticker in tickers:
+            frame = frames.get(ticker)
+            closes = frame["Close"].dropna() if frame is not None else None
+
+            if closes is not None and not closes.empty:
+                prices[ticker] = float(closes.iloc[-1])
+            else:
+                prices[ticker] = self._fast_info_price(ticker)
+
+        return prices
+
+    def _fast_info_price(self, ticker: str) -> Optional[float]:
+
+        try:
+            price = self._caller.call(
+                lambda: self._yf.Ticker(ticker).fast_info.last_price,
+                description=f"last price for {ticker}",
+            )
+        except MarketDataError as exc:
+            logger.error("%s", exc)
+            return None
+
+        return float(price) if price else None
+
+    def _fetch_daily_bars(
+        self, tickers: List[str], start: pd.Timestamp, end: pd.Timestamp
+    ) -> pd.DataFrame:
+
+        frames, failed = self._guarded_download(
+            tickers,
+            start=start.strftime("%Y-%m-%d"),
+            end=end.strftime("%Y-%m-%d"),
+        )
+
+        bars = [
+            self._normalize_bars(ticker, frame)
+            for ticker, frame in frames.items()
+        ]
+        bars = pd.concat(bars, ignore_index=True) if bars else _empty_bars()
+
+        if failed:
+            raise IncompleteDataError(failed, bars)
+
+        return bars
+
+    def _fetch_expirations(self, ticker: str) -> List[pd.Timestamp]:
+
+        expirations = self._caller.call(
+            lambda: self._yf.Ticker(ticker).options,
+            description=f"expirations for {ticker}",
+        )
+        return list(pd.to_datetime(list(expirations)))
+
+    # ------------------------------------------------------------
+    # Rate-limited download with per-ticker retry
+    # ------------------------------------------------------------
+    def _guarded_download(
+        self, tickers: List[str], **kwargs
+    ) -> Tuple[Dict[str, pd.DataFrame], List[str]]:
+        """
+        ``yf.download`` swallows per-ticker failures and returns empty
+        columns, so its error registry is checked after every call.
+        Throttled or transient failures are retried for just the affected
+        tickers; permanent "no data" results are accepted as empty.
+
+        Returns the per-ticker frames and the tickers still failing.
+        """
+
+        frames: Dict[str, pd.DataFrame] = {}
+        pending = list(tickers)
+
+        def attempt() -> None:
+
+            # The error registry is process-global: concurrent downloads
+            # would clear or read each other's errors, so they take turns
+            with _YF_DOWNLOAD_LOCK:
+                errors = getattr(self._yf.shared, "_ERRORS", None)
+                if isinstance(errors, dict):
+                    errors.clear()
+
+                data = self._yf.download(
+                    pending,
+                    group_by="ticker",
+                    auto_adjust=False,
+                    threads=True,
+                    progress=False,
+                    **kwargs,
+                )
+
+                errors = dict(getattr(self._yf.shared, "_ERRORS", None) or {})
+            retry: List[str] = []
+            throttled = False
+
+            for ticker in pending:
+                message = errors.get(ticker)
+
+                if message is not None and _is_retryable_message(message):
+                    retry.append(ticker)
+                    throttled = throttled or is_throttle_error(Exception(str(message)))
+                    continue
+
+                frame = self._ticker_frame(data, ticker)
+                if frame is not None:
+                    frame = frame.dropna(how="all")
+                    if not frame.empty:
+                        frames[ticker] = frame
+
+            pending[:] = retry
+
+            if retry:
+                summary = f"Yahoo failed {len(retry)} ticker(s): {retry[:5]}"
+                raise ThrottledError(summary) if throttled else ConnectionError(summary)
+
+        try:
+            self._caller.call(
+                attempt,
+                cost=len(pending),
+                description=f"download of {len(pending)} ticker(s)",
+            )
+        except MarketDataError as exc:
+            logger.error("%s", exc)
+            return frames, list(pending)
+
+        return frames, []
+
+    # ------------------------------------------------------------
+    @staticmethod
+    def _ticker_frame(data: pd.DataFrame, ticker: str) -> Optional[pd.DataFrame]:
+
+        if data is None or data.empty:
+            return None
+
+        if isinstance(data.columns, pd.MultiIndex):
+            if ticker not in data.columns.get_level_values(0):
+                return None
+            return data[ticker]
+
+        return data
+
+    @classmethod
+    def _normalize_bars(cls, ticker: str, frame: pd.DataFrame) -> pd.DataFrame:
+
+        frame = frame.rename(columns=cls.PRICE_FIELDS)
+
+        if "adj_close" not in frame.columns:
+            frame["adj_close"] = frame["close"]
+
+        index = pd.to_datetime(frame.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+
+        bars = frame[BAR_COLUMNS[2:]].reset_index(drop=True)
+        bars.insert(0, "date", index.normalize())
+        bars.insert(0, "ticker", ticker)
+
+        return bars
+
+
+# ================================================================
+# Deterministic Offline Backend
+# ================================================================
+class FakeMarketDataProvider(MarketDataProvider):
+    """
+    Offline backend for tests and benchmarks.
+
+    Every ticker follows its own seeded random walk over business days
+    from ``EPOCH``, so the same (ticker, date) always yields the same bar
+    regardless of the requested range.
+    """
+
+    EPOCH = pd.Timestamp("2000-01-03")
+    DAILY_VOLATILITY = 0.015
+
+    def __init__(self, today: DateLike | None = None):
+        super().__init__()
+        self.today = _to_day(today) if today is not None else pd.Timestamp(date.today())
+        self._paths: Dict[str, Tuple[pd.Timestamp, pd.DatetimeIndex, np.ndarray]] = {}
+        self._calendar: Optional[Tuple[pd.Timestamp, pd.DatetimeIndex]] = None
+
+    def _business_days(self, end: pd.Timestamp) -> pd.DatetimeIndex:
+
+        cached = self._calendar
+        if cached is None or cached[0] != end:
+            days = np.arange(self.EPOCH.to_datetime64(), end.to_datetime64(), dtype="datetime64[D]")
+            self._calendar = (end, pd.DatetimeIndex(days[np.is_busday(days)]).as_unit("ns"))
+
+        return self._calendar[1]
+
+    def _path(self, ticker: str, end: pd.Timestamp) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+        """Return business days and OHLCV rows up to ``end`` (exclusive)."""
+
+        cached = self._paths.get(ticker)
+        if cached is not None and cached[0] >= end:
+            return cached[1], cached[2]
+
+        covered_end = max(end, self.today + timedelta(days=1))
+        days = self._business_days(covered_end)
+        n = len(days)
+
+        # One stream per field keeps every prefix stable as the range grows
+        seed = zlib.crc32(ticker.encode("utf-8"))
+        streams = [np.random.default_rng([seed, field]) for field in range(5)]
+
+        base = 20.0 + streams[0].random() * 480.0
+        returns = streams[1].normal(0.0002, self.DAILY_VOLATILITY, n)
+        close = base * np.exp(np.cumsum(returns))
+
+        open_ = close * (1.0 + streams[2].normal(0.0, self.DAILY_VOLATILITY / 3, n))
+        spread = np.abs(streams[3].normal(0.0, self.DAILY_VOLATILITY, n)) * close
+        high = np.maximum(open_, close) + spread
+        low = np.minimum(open_, close) - spread
+        volume = streams[4].integers(100_000, 50_000_000, n).astype(float)
+
+        values = np.column_stack([open_, high, low, close, close, volume])
+        self._paths[ticker] = (covered_end, days, values)
+
+        return days, values
+
+    def _fetch_last_prices(self, tickers: List[str]) -> Dict[str, Optional[float]]:
+
+        prices: Dict[str, Optional[float]] = {}
+
+        for ticker in tickers:
+            days, values = self._path(ticker, self.today + timedelta(days=1))
+            idx = days.searchsorted(self.today, side="right") - 1
+            prices[ticker] = round(float(values[idx, 3]), 4) if idx >= 0 else None
+
+        return prices
+
+    def _fetch_daily_bars(
+        self, tickers: List[str], start: pd.Timestamp, end: pd.Timestamp
+    ) -> pd.DataFrame:
+
+        frames = []
+
+        for ticker in tickers:
+            days, values = self._path(ticker, end)
+
+            lo = days.searchsorted(start, side="left")
+            hi = days.searchsorted(min(end, self.today + timedelta(days=1)), side="left")
+            if hi <= lo:
+                continue
+
+            frame = pd.DataFrame(values[lo:hi], columns=BAR_COLUMNS[2:])
+            frame.insert(0, "date", days[lo:hi])
+            frame.insert(0, "ticker", ticker)
+            frames.append(frame)
+
+        if not frames:
+            return _empty_bars()
+
+        return pd.concat(frames, ignore_index=True)
+
+    def _fetch_expirations(self, ticker: str) -> List[pd.Timestamp]:
+
+        weeklies = pd.date_range(self.today, periods=8, freq="W-FRI")
+        monthlies = pd.date_range(self.today, periods=6, freq="WOM-3FRI")
+
+        return sorted(set(weeklies) | set(monthlies))
+
+
+# ================================================================
+# Process-wide Provider
+# ================================================================
+BACKENDS = {
+    "yfinance": YFinanceProvider,
+    "fake": FakeMarketDataProvider,
+}
+
+_provider: Optional[MarketDataProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> MarketDataProvider:
+    """Shared provider; ``MARKET_DATA_BACKEND=fake`` selects the offline backend."""
+
+    global _provider
+
+    with _provider_lock:
+        if _provider is None:
+            backend = os.environ.get("MARKET_DATA_BACKEND", "yfinance").lower()
+            if backend not in BACKENDS:
+                raise ValueError(f"Unknown market data backend: {backend}")
+            _provider = BACKENDS[backend]()
+
+        return _provider
+
+
+def set_provider(provider: Optional[MarketDataProvider]) -> None:
+
+    global _provider
+
+    with _provider_lock:
+        _provider = provider
+
+
+# ================================================================
+# Helpers
+# ================================================================
+def _is_retryable_message(message: object) -> bool:
+
+    text = str(message).lower()
+
+    if is_throttle_error(Exception(text)):
+        return True
+
+    return any(marker in text for marker in ("timed out", "timeout", "connection", "temporarily"))
+
+
+def _unique(tickers: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(str(t).strip() for t in tickers if t is not None and str(t).strip()))
+
+
+def _chunks(items: List[str], size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _to_day(value) -> pd.Timestamp:
+
+    ts = pd.Timestamp(value)
+    if ts.tz is not None:
+        ts = ts.tz_localize(None)
+
+    return ts.normalize()
+
+
+def _empty_bars() -> pd.DataFrame:
+
+    frame = pd.DataFrame({col: pd.Series(dtype="float64") for col in BAR_COLUMNS})
+    frame["ticker"] = frame["ticker"].astype(object)
+    frame["date"] = frame["date"].astype("datetime64[ns]")
+
+    return frame
@@ -0,0 +1,315 @@
+"""
+Memory Profiling Mode
+---------------------
+Per-stage peak memory (tracemalloc), the allocation sites that grew most
+during each stage, and the DataFrame sizes alive after it. Scripts enable
+it with ``--profile-memory [REPORT]``; stages are no-ops otherwise.
+
+    python extraction.py --profile-memory mem_extraction.json
+    python memprofile.py mem_before.json mem_after.json   # compare peaks
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Mapping, Optional
+
+
+# DataFrame / Series / byte count / None per label
+FrameSizes = Mapping[str, object]
+
+DEFAULT_REPORT = "memory_profile.json"
+
+# Allocations inside these modules are profiler overhead, not pipeline cost
+_IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<unknown>")
+
+
+def _mb(size: float) -> float:
+    return round(size / (1024 * 1024), 3)
+
+
+def frame_bytes(obj) -> int:
+    """Deep in-memory size of a DataFrame/Series (object columns included)."""
+
+    import pandas as pd
+
+    if obj is None:
+        return 0
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True))
+    return int(obj)
+
+
+# ============================================================
+# Profiler
+# ============================================================
+
+class MemoryProfiler:
+    """
+    Records one entry per stage. Nested stages are supported: a child's
+    peak is folded into its parent before the tracemalloc peak is reset.
+    """
+
+    def __init__(self, top_n: int = 10, frames: int = 1):
+        self.top_n = top_n
+        self.frames = frames
+        self.stages: List[Dict[str, object]] = []
+        self._stack: List[Dict[str, object]] = []
+        self._started_here = False
+
+    # --------------------------------------------------------
+    def start(self) -> "MemoryProfiler":
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_here = True
+
+        return self
+
+    def stop(self) -> None:
+
+        if self._started_here:
+            tracemalloc.stop()
+            self._started_here = False
+
+    # --------------------------------------------------------
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, pattern) for pattern in _IGNORED_FILES]
+        )
+
+    @contextmanager
+    def stage(self, name: str, frames: Optional[Callable[[], FrameSizes]] = None):
+        """
+        Profile one stage. ``frames`` is called after the stage and should
+        return the DataFrames (or byte counts) that are alive at that point.
+        """
+
+        if self._stack:
+            parent = self._stack[-1]
+            parent["peak"] = max(parent["peak"], tracemalloc.get_traced_memory()[1])
+
+        # Snapshot first so its own size is part of the baseline
+        before = self._snapshot()
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+
+        entry: Dict[str, object] = {
+            "name": name,
+            "start": current,
+            "peak": current,
+            "before": before,
+            "clock": time.perf_counter(),
+        }
+        self._stack.append(entry)
+
+        try:
+            yield self
+        finally:
+            self._stack.pop()
+            self._finish(entry, frames)
+
+    def _finish(self, entry: Dict[str, object], frames: Optional[Callable[[], FrameSizes]]) -> None:
+
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(entry["peak"], peak)
+
+        if self._stack:
+            parent = self._stack[-1]
+            parent["peak"] = max(parent["peak"], peak)
+
+        growth = self._snapshot().compare_to(entry["before"], "lineno")
+        top_sites = [
+            {
+                "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_diff_mb": _mb(stat.size_diff),
+                "size_mb": _mb(stat.size),
+                "count_diff": stat.count_diff,
+            }
+            for stat in growth
+            if stat.size_diff > 0
+        ][: self.top_n]
+
+        frame_sizes: Dict[str, float] = {}
+        if frames is not None:
+            try:
+                frame_sizes = {key: _mb(frame_bytes(value)) for key, value in frames().items()}
+            except Exception as exc:
+                frame_sizes = {"error": str(exc)}
+
+        self.stages.append({
+            "stage": entry["name"],
+            "depth": len(self._stack),
+            "seconds": round(time.perf_counter() - entry["clock"], 3),
+            "start_mb": _mb(entry["start"]),
+            "end_mb": _mb(current),
+            "peak_mb": _mb(peak),
+            "peak_over_start_mb": _mb(peak - entry["start"]),
+            "dataframes_mb": frame_sizes,
+            "top_allocations": top_sites,
+        })
+
+    # --------------------------------------------------------
+    def report(self) -> Dict[str, object]:
+
+        peaks = [stage["peak_mb"] for stage in self.stages]
+
+        return {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "script": os.path.basename(sys.argv[0]),
+            "overall_peak_mb": max(peaks) if peaks else 0.0,
+            "stages": self.stages,
+        }
+
+    def write_report(self, path: str) -> Dict[str, object]:
+
+        report = self.report()
+
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+
+        print(format_report(report))
+        print(f"Memory profile written to {path}")
+
+        return report
+
+
+# ============================================================
+# Module-level Switch
+# ============================================================
+
+_active: Optional[MemoryProfiler] = None
+
+
+def enable(top_n: int = 10) -> MemoryProfiler:
+
+    global _active
+
+    if _active is None:
+        _active = MemoryProfiler(top_n=top_n).start()
+
+    return _active
+
+
+def active() -> Optional[MemoryProfiler]:
+    return _active
+
+
+@contextmanager
+def memory_stage(name: str, frames: Optional[Callable[[], FrameSizes]] = None):
+    """Profile a stage when memory profiling is enabled, otherwise do nothing."""
+
+    if _active is None:
+        yield None
+        return
+
+    with _active.stage(name, frames) as profiler:
+        yield profiler
+
+
+def finish(path: str = DEFAULT_REPORT) -> Optional[Dict[str, object]]:
+    """Write the report (if profiling was enabled) and stop tracing."""
+
+    global _active
+
+    if _active is None:
+        return None
+
+    profiler, _active = _active, None
+
+    try:
+        return profiler.write_report(path)
+    finally:
+        profiler.stop()
+
+
+def add_argument(parser) -> None:
+    """Add the shared ``--profile-memory [REPORT]`` flag to an argparse parser."""
+
+    parser.add_argument(
+        "--profile-memory",
+        nargs="?",
+        const=DEFAULT_REPORT,
+        default=None,
+        metavar="REPORT",
+        help=f"Record per-stage peak memory and write a JSON report (default {DEFAULT_REPORT})",
+    )
+
+
+# ============================================================
+# Reporting
+# ============================================================
+
+def format_report(report: Dict[str, object]) -> str:
+
+    lines = [f"{'stage':<36} {'peak MB':>9} {'+peak MB':>9} {'end MB':>9} {'frames MB':>10}"]
+
+    for stage in report["stages"]:
+        frames = stage["dataframes_mb"]
+        frames_total = sum(v for v in frames.values() if isinstance(v, (int, float)))
+        name = "  " * stage["depth"] + stage["stage"]
+        lines.append(
+            f"{name:<36} {stage['peak_mb']:>9.1f} {stage['peak_over_start_mb']:>9.1f} "
+            f"{stage['end_mb']:>9.1f} {frames_total:>10.1f}"
+        )
+
+    lines.append(f"overall peak: {report['overall_peak_mb']:.1f} MB")
+
+    worst = max(report["stages"], key=lambda s: s["peak_over_start_mb"], default=None)
+    if worst is not None and worst["top_allocations"]:
+        lines.append(f"top allocation sites in {worst['stage']}:")
+        for site in worst["top_allocations"][:5]:
+            lines.append(f"  {site['size_diff_mb']:>8.1f} MB  {site['site']}")
+
+    return "\n".join(lines)
+
+
+def compare_reports(before: Dict[str, object], after: Dict[str, object]) -> str:
+
+    old = {stage["stage"]: stage for stage in before["stages"]}
+    lines = [f"{'stage':<36} {'before MB':>10} {'after MB':>10} {'change':>8}"]
+
+    for stage in after["stages"]:
+        previous = old.get(stage["stage"])
+        if previous is None:
+            continue
+        base = previous["peak_over_start_mb"]
+        now = stage["peak_over_start_mb"]
+        change = f"{(now - base) / base:+.0%}" if base else "n/a"
+        lines.append(f"{stage['stage']:<36} {base:>10.1f} {now:>10.1f} {change:>8}")
+
+    lines.append(
+        f"overall peak: {before['overall_peak_mb']:.1f} MB -> {after['overall_peak_mb']:.1f} MB"
+    )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show a --profile-memory report, or compare two")
+    parser.add_argument("report", help="report JSON")
+    parser.add_argument("new_report", nargs="?", help="later report to compare against the first")
+    args = parser.parse_args(argv)
+
+    reports = []
+    for path in filter(None, (args.report, args.new_report)):
+        with open(path, encoding="utf-8") as fh:
+            reports.append(json.load(fh))
+
+    if len(reports) == 1:
+        print(format_report(reports[0]))
+    else:
+        print(compare_reports(*reports))
+
+
+if __name__ == "__main__":
+    main()
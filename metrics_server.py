@@ -0,0 +1,387 @@
+"""
+Prometheus Metrics Endpoint
+---------------------------
+Embedded, dependency-free ``/metrics`` endpoint for the long-running
+collectors. Spans and counters from ``instrumentation`` are mirrored into
+histograms and counters; collectors add their own gauges (scheduler lag,
+pending rows, cycle interval) through the module-level ``REGISTRY``.
+
+    python spread_price_collector.py --metrics-port 9108
+    curl -s localhost:9108/metrics
+
+Alert on a cycle about to overrun its interval with e.g.
+``collector_last_cycle_duration_seconds / collector_cycle_interval_seconds > 0.8``.
+"""
+
+from __future__ import annotations
+
+import bisect
+import functools
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import instrumentation
+
+
+logger = logging.getLogger("MetricsServer")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 900.0,
+)
+
+# For histograms of item counts (e.g. tickers per batch) rather than seconds
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+
+    return repr(float(value))
+
+
+# ============================================================
+# Metric Types
+# ============================================================
+
+class _Metric:
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, value: float = 1.0, **labels) -> None:
+
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def inc(self, value: float = 1.0, **labels) -> None:
+
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def dec(self, value: float = 1.0, **labels) -> None:
+        self.inc(-value, **labels)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            state[index] += 1
+            state[-1] += value
+
+    def _samples(self) -> List[str]:
+
+        lines = []
+        bounds = [_format_value(b) for b in self.buckets] + ["+Inf"]
+
+        for key, state in self._values.items():
+            cumulative = 0.0
+            for bound, hits in zip(bounds, state[:-1]):
+                cumulative += hits
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {_format_value(cumulative)}")
+
+        return lines
+
+
+# ============================================================
+# Registry
+# ============================================================
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _get(self, cls, name: str, help_text: str, **kwargs):
+
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def render(self) -> str:
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+# ============================================================
+# Instrumentation Bridge
+# ============================================================
+
+class PrometheusSink:
+    """
+    Instrumentation sink mirroring spans into
+    ``etl_stage_duration_seconds{component,stage}`` and counters into
+    ``etl_<name>_total``. Span tags other than ``component`` are dropped
+    to keep label cardinality bounded.
+    """
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY):
+        self.registry = registry
+        self.durations = registry.histogram(
+            "etl_stage_duration_seconds", "Duration of instrumented pipeline stages."
+        )
+        self.errors = registry.counter(
+            "etl_stage_errors_total", "Pipeline stages that ended with an exception."
+        )
+
+    def __call__(self, record: instrumentation.Record) -> None:
+
+        component = str(record.get("component", ""))
+
+        if record["type"] == "span":
+            self.durations.observe(record["duration_ms"] / 1000.0, component=component, stage=record["name"])
+            if record.get("status") == "error":
+                self.errors.inc(component=component, stage=record["name"])
+            return
+
+        labels = {
+            key: value for key, value in record.items()
+            if key not in ("ts", "type", "name", "value") and isinstance(value, str)
+        }
+        self.registry.counter(
+            f"etl_{record['name']}_total", f"Total {record['name'].replace('_', ' ')}."
+        ).inc(record["value"], **labels)
+
+
+# ============================================================
+# Scheduler Lag
+# ============================================================
+
+def track_schedule_lag(job, name: str, registry: MetricsRegistry = REGISTRY):
+    """
+    Wrap a ``schedule`` job so each run records how late it fired
+    relative to its planned ``next_run``.
+
+    A run more than one interval late means the loop was not polling
+    (e.g. the collector sleeps outside the market window), not that the
+    scheduler lagged, so it is left out rather than recorded as hours of lag.
+    """
+
+    lag_histogram = registry.histogram("scheduler_lag_seconds", "How late scheduled jobs fired.")
+    lag_gauge = registry.gauge("scheduler_last_lag_seconds", "Lag of the most recent run of each job.")
+    interval_gauge = registry.gauge("collector_cycle_interval_seconds", "Configured interval of each job.")
+
+    interval = timedelta(**{job.unit: job.interval}).total_seconds()
+    interval_gauge.set(interval, job=name)
+
+    inner = job.job_func
+
+    @functools.wraps(inner)
+    def run_with_lag(*args, **kwargs):
+
+        if job.next_run is not None:
+            lag = max(0.0, (datetime.now() - job.next_run).total_seconds())
+            if lag <= interval:
+                lag_histogram.observe(lag, job=name)
+                lag_gauge.set(lag, job=name)
+
+        return inner(*args, **kwargs)
+
+    job.job_func = run_with_lag
+    return job
+
+
+# ============================================================
+# Cycle Tracking
+# ============================================================
+
+class CycleTracker:
+    """Context manager recording in-progress and last-cycle gauges per job."""
+
+    def __init__(self, job: str, registry: MetricsRegistry = REGISTRY):
+        self.job = job
+        self.running = registry.gauge("collector_cycle_running", "1 while a cycle is in progress.")
+        self.started = registry.gauge(
+            "collector_cycle_start_timestamp_seconds", "Unix time the current or last cycle started."
+        )
+        self.last_duration = registry.gauge(
+            "collector_last_cycle_duration_seconds", "Duration of the most recently finished cycle."
+        )
+        self._start = 0.0
+
+    def __enter__(self) -> "CycleTracker":
+        self._start = time.perf_counter()
+        self.started.set(time.time(), job=self.job)
+        self.running.set(1, job=self.job)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.last_duration.set(time.perf_counter() - self._start, job=self.job)
+        self.running.set(0, job=self.job)
+        return False
+
+
+# ============================================================
+# HTTP Server
+# ============================================================
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self) -> None:
+
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = self.registry.render().encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+_sinks: Dict[int, PrometheusSink] = {}
+
+
+def start_server(
+    port: int,
+    host: str = "127.0.0.1",
+    registry: MetricsRegistry = REGISTRY,
+) -> ThreadingHTTPServer:
+    """
+    Serve ``registry`` on ``http://host:port/metrics`` from a daemon thread
+    and start mirroring instrumentation into it. Port 0 picks a free port.
+    """
+
+    if id(registry) not in _sinks:
+        _sinks[id(registry)] = PrometheusSink(registry)
+        instrumentation.add_sink(_sinks[id(registry)])
+
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+
+    logger.info("Metrics endpoint listening on http://%s:%d/metrics", host, server.server_address[1])
+    return server
+
+
+def start_from_env(default_port: Optional[int] = None) -> Optional[ThreadingHTTPServer]:
+    """Start the endpoint if METRICS_PORT (or ``default_port``) is set."""
+
+    port = os.environ.get("METRICS_PORT") or default_port
+    if port in (None, ""):
+        return None
+
+    return start_server(int(port), host=os.environ.get("METRICS_HOST", "127.0.0.1"))
@@ -0,0 +1,348 @@
+"""
+Memory-mapped OHLCV Array Store
+-------------------------------
+Daily bars as dense (date × ticker) float64 arrays, one memory-mapped
+file per field, with a ticker index and a trading-date index:
+
+    <root>/meta.json            tickers, dates, capacities
+    <root>/<field>.f8           date-major rows of ``ticker_capacity`` values
+
+Date-major means appending new days only extends the files. Ticker
+capacity is reserved up front, so new symbols usually fit in place too.
+Reads open the files lazily in read-only mode; frames handed to pandas
+are zero-copy views of the mapping, so loading the full universe costs
+almost no resident memory until values are touched.
+
+    python ohlcv_store.py build --from-mirror        # from history_store
+    python ohlcv_store.py append --start 2026-02-12  # new bars via the provider
+    python ohlcv_store.py info
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import shutil
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import count, timed
+
+
+logger = logging.getLogger("OHLCVStore")
+
+DEFAULT_ROOT = Path(os.environ.get("OHLCV_STORE_DIR", "ohlcv_store"))
+
+FIELDS = ["open", "high", "low", "close", "adj_close", "volume"]
+
+# Stocks_History / history_store column names → store fields
+HISTORY_COLUMNS = {
+    "open_price": "open",
+    "high": "high",
+    "low": "low",
+    "close_price": "close",
+    "volume": "volume",
+}
+
+DATE_CHUNK = 256
+MIN_TICKER_CAPACITY = 64
+
+
+def _grow(needed: int, minimum: int) -> int:
+    capacity = max(minimum, 1)
+    while capacity < needed:
+        capacity *= 2
+    return capacity
+
+
+# ================================================================
+# Store
+# ================================================================
+class OHLCVStore:
+    """Single writer, any number of readers (readers re-open after appends)."""
+
+    META = "meta.json"
+
+    def __init__(self, root: str | Path = DEFAULT_ROOT):
+        self.root = Path(root)
+        self._maps: Dict[str, np.memmap] = {}
+        self._load_meta()
+
+    # ------------------------------------------------------------
+    # Metadata and indexes
+    # ------------------------------------------------------------
+    def _load_meta(self) -> None:
+
+        try:
+            meta = json.loads((self.root / self.META).read_text())
+        except (OSError, ValueError):
+            meta = {"tickers": [], "dates": [], "ticker_capacity": 0, "date_capacity": 0}
+
+        self.tickers: List[str] = meta["tickers"]
+        self.dates = pd.DatetimeIndex(pd.to_datetime(meta["dates"]), name="date")
+        self.ticker_capacity: int = meta["ticker_capacity"]
+        self.date_capacity: int = meta["date_capacity"]
+
+        self._ticker_pos = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self._date_pos = {day: i for i, day in enumerate(self.dates)}
+        self._maps.clear()
+
+    def _save_meta(self) -> None:
+
+        target = self.root / self.META
+        tmp_path = target.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({
+            "fields": FIELDS,
+            "tickers": self.tickers,
+            "dates": [day.strftime("%Y-%m-%d") for day in self.dates],
+            "ticker_capacity": self.ticker_capacity,
+            "date_capacity": self.date_capacity,
+        }))
+        os.replace(tmp_path, target)
+
+    def _path(self, field: str, root: Optional[Path] = None) -> Path:
+        return (root or self.root) / f"{field}.f8"
+
+    def _map(self, field: str) -> np.ndarray:
+        """Read-only (date_capacity × ticker_capacity) mapping of one field."""
+
+        if field not in FIELDS:
+            raise KeyError(f"Unknown field: {field}")
+
+        if field not in self._maps:
+            self._maps[field] = np.memmap(
+                self._path(field),
+                dtype=np.float64,
+                mode="r",
+                shape=(self.date_capacity, self.ticker_capacity),
+            )
+
+        return self._maps[field]
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    # ------------------------------------------------------------
+    # Reads (views, no copies)
+    # ------------------------------------------------------------
+    def field(self, name: str) -> np.ndarray:
+        """(dates × tickers) view of one field."""
+
+        if not self.tickers:
+            return np.empty((0, 0))
+
+        return self._map(name)[: len(self.dates), : len(self.tickers)]
+
+    def frame(self, name: str) -> pd.DataFrame:
+        """Zero-copy DataFrame of one field: dates as index, tickers as columns."""
+        return pd.DataFrame(self.field(name), index=self.dates, columns=self.tickers, copy=False)
+
+    def ticker(self, symbol: str, fields: Sequence[str] = FIELDS) -> pd.DataFrame:
+        """All dates for one ticker; each column is a strided view."""
+
+        column = self._ticker_pos[symbol]
+        return pd.DataFrame(
+            {name: self.field(name)[:, column] for name in fields},
+            index=self.dates,
+            copy=False,
+        )
+
+    def on(self, day: str | date, fields: Sequence[str] = FIELDS) -> pd.DataFrame:
+        """All tickers for one trading date; each column is a contiguous view."""
+
+        row = self._date_pos[pd.Timestamp(day)]
+        return pd.DataFrame(
+            {name: self.field(name)[row] for name in fields},
+            index=pd.Index(self.tickers, name="ticker"),
+            copy=False,
+        )
+
+    def window(self, name: str, start: str | date | None = None, end: str | date | None = None) -> pd.DataFrame:
+        """Date slice ``start <= date < end`` of one field, still a view."""
+
+        lo = self.dates.searchsorted(pd.Timestamp(start)) if start is not None else 0
+        hi = self.dates.searchsorted(pd.Timestamp(end)) if end is not None else len(self.dates)
+
+        return pd.DataFrame(
+            self.field(name)[lo:hi], index=self.dates[lo:hi], columns=self.tickers, copy=False
+        )
+
+    # ------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------
+    @timed("array_append", component="OHLCVStore")
+    def append(self, bars: pd.DataFrame) -> int:
+        """
+        Upsert long-format bars (``ticker``, ``date`` and any of FIELDS).
+        New trailing dates and tickers that fit the reserved capacity are
+        written in place; anything else rebuilds the files once.
+        """
+
+        if bars.empty:
+            return 0
+
+        bars = bars.copy()
+        bars["date"] = pd.to_datetime(bars["date"]).dt.normalize()
+
+        new_tickers = [t for t in pd.unique(bars["ticker"]) if t not in self._ticker_pos]
+        new_dates = pd.DatetimeIndex(sorted(set(bars["date"]) - set(self._date_pos)))
+
+        tickers = self.tickers + new_tickers
+        in_place = (
+            len(tickers) <= self.ticker_capacity
+            and (len(self.dates) == 0 or len(new_dates) == 0 or new_dates[0] > self.dates[-1])
+        )
+
+        if in_place:
+            self._extend(tickers, self.dates.append(new_dates))
+        else:
+            self._rebuild(tickers, self.dates.union(new_dates))
+
+        rows = bars["date"].map(self._date_pos).to_numpy()
+        cols = bars["ticker"].map(self._ticker_pos).to_numpy()
+
+        for name in FIELDS:
+            if name not in bars:
+                continue
+            target = np.memmap(self._path(name), dtype=np.float64, mode="r+",
+                               shape=(self.date_capacity, self.ticker_capacity))
+            target[rows, cols] = pd.to_numeric(bars[name], errors="coerce").to_numpy(dtype=np.float64)
+            target.flush()
+            del target
+
+        self._maps.clear()
+        count("rows_written", len(bars), component="OHLCVStore", table="arrays")
+
+        return len(bars)
+
+    def _extend(self, tickers: List[str], dates: pd.DatetimeIndex) -> None:
+        """Grow the date axis at the end of each file; existing bytes stay put."""
+
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        date_capacity = max(self.date_capacity, _grow(len(dates), DATE_CHUNK))
+        ticker_capacity = self.ticker_capacity or _grow(int(len(tickers) * 1.25), MIN_TICKER_CAPACITY)
+
+        for name in FIELDS:
+            path = self._path(name)
+            old_size = path.stat().st_size if path.exists() else 0
+            new_size = date_capacity * ticker_capacity * 8
+
+            if new_size > old_size:
+                with open(path, "ab") as fh:
+                    # Fill the new rows with NaN rather than zeros
+                    fh.write(np.full((new_size - old_size) // 8, np.nan).tobytes())
+
+        self.tickers, self.dates = tickers, dates
+        self.date_capacity, self.ticker_capacity = date_capacity, ticker_capacity
+        self._save_meta()
+        self._load_meta()
+
+    def _rebuild(self, tickers: List[str], dates: pd.DatetimeIndex) -> None:
+        """Copy into new files with room for ``tickers``/``dates`` and swap them in."""
+
+        ticker_capacity = _grow(int(len(tickers) * 1.25), max(self.ticker_capacity, MIN_TICKER_CAPACITY))
+        date_capacity = _grow(len(dates), DATE_CHUNK)
+
+        logger.info("Rebuilding store for %d tickers × %d dates", len(tickers), len(dates))
+
+        staging = self.root.with_name(self.root.name + ".rebuild")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+
+        old_rows = dates.get_indexer(self.dates)
+
+        for name in FIELDS:
+            target = np.memmap(self._path(name, staging), dtype=np.float64, mode="w+",
+                               shape=(date_capacity, ticker_capacity))
+            target[:] = np.nan
+
+            if len(self.dates) and self.tickers:
+                target[old_rows, : len(self.tickers)] = self.field(name)
+
+            target.flush()
+            del target
+
+        self._maps.clear()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        for name in FIELDS:
+            os.replace(self._path(name, staging), self._path(name))
+        shutil.rmtree(staging, ignore_errors=True)
+
+        self.tickers, self.dates = tickers, dates
+        self.date_capacity, self.ticker_capacity = date_capacity, ticker_capacity
+        self._save_meta()
+        self._load_meta()
+
+
+# ================================================================
+# Loaders
+# ================================================================
+def from_history(frame: pd.DataFrame) -> pd.DataFrame:
+    """Stocks_History / history_store rows → store columns."""
+    return frame.rename(columns=HISTORY_COLUMNS)[["ticker", "date", *HISTORY_COLUMNS.values()]]
+
+
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(description="Maintain the memory-mapped OHLCV array store.")
+    parser.add_argument("--root", type=Path, default=DEFAULT_ROOT)
+    sub = parser.add_subparsers(dest="action", required=True)
+
+    build = sub.add_parser("build", help="Load bars from the Parquet mirror")
+    build.add_argument("--from-mirror", action="store_true", required=True)
+    build.add_argument("--start", default=None)
+
+    append = sub.add_parser("append", help="Append bars for the S&P list via the market-data provider")
+    append.add_argument("--start", required=True)
+    append.add_argument("--end", default=None, help="exclusive (default: tomorrow)")
+
+    sub.add_parser("info", help="Show dimensions")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+
+    args = parse_args(argv)
+    store = OHLCVStore(args.root)
+
+    if args.action == "build":
+        from history_store import query_history
+
+        store.append(from_history(query_history(start=args.start)))
+
+    elif args.action == "append":
+        from latest_Data import load_tickers
+        from market_data import IncompleteDataError, get_provider
+
+        end = args.end or (pd.Timestamp.today().normalize() + pd.Timedelta(days=1))
+
+        try:
+            bars = get_provider().daily_bars(load_tickers(), args.start, end)
+        except IncompleteDataError as e:
+            logger.warning("Appending partial data; failed: %s", e.failed_tickers)
+            bars = e.partial
+
+        store.append(bars)
+
+    print(
+        f"{len(store.tickers)} tickers × {len(store.dates)} dates "
+        f"(capacity {store.ticker_capacity} × {store.date_capacity}) in {store.root}"
+    )
+
+
+if __name__ == "__main__":
+    main()
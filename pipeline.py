@@ -0,0 +1,472 @@
+"""
+Stage-DAG Pipeline Runner
+-------------------------
+Runs the enrichment → load scripts as one DAG. Stages declare their
+inputs explicitly and hand frames to each other in memory. Each stage's
+output is cached as Parquet, keyed by a fingerprint of:
+
+- the stage's code and parameters;
+- its ``version``;
+- the fingerprints of its inputs (source workbooks are hashed by content).
+
+A re-run therefore redoes only the stages whose inputs actually changed,
+and independent stages run in parallel.
+
+    python pipeline.py --dry-run                 # show what would run
+    python pipeline.py                           # nightly run
+    python pipeline.py --targets enriched_trades --export C:\\Users\\user\\Downloads
+
+Bump a stage's ``version`` when code it calls (not its own body) changes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+
+from instrumentation import span
+
+
+logger = logging.getLogger("PipelineRunner")
+
+
+# ================================================================
+# Stage Definitions
+# ================================================================
+@dataclass
+class Stage:
+    """
+    A named step. ``fn`` receives one keyword argument per input and
+    returns a DataFrame, or for a ``sink`` any JSON-serialisable summary.
+    """
+
+    name: str
+    fn: Callable[..., object]
+    inputs: List[str] = field(default_factory=list)
+    sink: bool = False
+    version: str = "1"
+    params: Dict[str, object] = field(default_factory=dict)
+
+    def code_hash(self) -> str:
+
+        try:
+            code = inspect.getsource(self.fn)
+        except (OSError, TypeError):
+            code = getattr(getattr(self.fn, "__code__", None), "co_code", repr(self.fn))
+
+        if isinstance(code, str):
+            code = code.encode("utf-8")
+
+        return hashlib.sha1(code).hexdigest()[:12]
+
+
+@dataclass
+class WorkbookSource:
+    """An Excel workbook read through the sidecar cache; never cached itself."""
+
+    name: str
+    path: Path
+    read_kwargs: Dict[str, object] = field(default_factory=dict)
+
+    def fingerprint(self) -> str:
+
+        from workbook_cache import workbook_fingerprint
+
+        options = json.dumps(self.read_kwargs, sort_keys=True, default=repr)
+        return f"{workbook_fingerprint(self.path)}:{options}"
+
+    def read(self) -> pd.DataFrame:
+
+        from workbook_cache import read_excel_cached
+
+        return read_excel_cached(self.path, **self.read_kwargs)
+
+
+# ================================================================
+# Output Cache
+# ================================================================
+class StageCache:
+    """
+    ``<stage>-<fingerprint>.parquet`` for frames and ``.json`` markers for
+    sinks. Older fingerprints of a stage are removed when a new one lands.
+    """
+
+    def __init__(self, cache_dir: str | Path):
+        self.cache_dir = Path(cache_dir)
+
+    def _path(self, stage: Stage, fingerprint: str) -> Path:
+        suffix = ".json" if stage.sink else ".parquet"
+        return self.cache_dir / f"{stage.name}-{fingerprint}{suffix}"
+
+    def has(self, stage: Stage, fingerprint: str) -> bool:
+        return self._path(stage, fingerprint).exists()
+
+    def load(self, stage: Stage, fingerprint: str) -> object:
+
+        path = self._path(stage, fingerprint)
+
+        if stage.sink:
+            return json.loads(path.read_text())["result"]
+
+        return pd.read_parquet(path)
+
+    def store(self, stage: Stage, fingerprint: str, result: object) -> None:
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(stage, fingerprint)
+        tmp_path = path.with_suffix(".tmp")
+
+        try:
+            if stage.sink:
+                tmp_path.write_text(json.dumps({
+                    "completed": datetime.now().isoformat(timespec="seconds"),
+                    "result": result,
+                }, default=str))
+            else:
+                result.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except Exception as exc:
+            # Mixed-type object columns etc.; the run itself still succeeds
+            logger.warning("Could not cache %s: %s", stage.name, exc)
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        for stale in self.cache_dir.glob(f"{stage.name}-*{path.suffix}"):
+            if stale != path and stale.stem.rsplit("-", 1)[0] == stage.name:
+                stale.unlink(missing_ok=True)
+
+
+# ================================================================
+# Runner
+# ================================================================
+class Pipeline:
+
+    def __init__(self, cache_dir: str | Path = ".pipeline_cache", max_workers: int = 4):
+        self.cache = StageCache(cache_dir)
+        self.max_workers = max_workers
+        self.nodes: Dict[str, object] = {}
+
+    # ------------------------------------------------------------
+    # Definition
+    # ------------------------------------------------------------
+    def source(self, name: str, path: str | Path, **read_kwargs) -> None:
+        self._add(WorkbookSource(name, Path(path), read_kwargs))
+
+    def stage(
+        self,
+        name: str,
+        inputs: Iterable[str] = (),
+        sink: bool = False,
+        version: str = "1",
+        **params,
+    ):
+        """Decorator registering ``fn`` as a stage."""
+
+        def decorator(fn):
+            self._add(Stage(name, fn, list(inputs), sink, version, params))
+            return fn
+
+        return decorator
+
+    def _add(self, node) -> None:
+
+        if node.name in self.nodes:
+            raise ValueError(f"Duplicate stage: {node.name}")
+
+        for dep in getattr(node, "inputs", []):
+            if dep not in self.nodes:
+                raise ValueError(f"{node.name} depends on unknown stage {dep}")
+
+        self.nodes[node.name] = node
+
+    # ------------------------------------------------------------
+    # Planning
+    # ------------------------------------------------------------
+    def _closure(self, targets: Iterable[str]) -> List[str]:
+        """Targets plus their upstream nodes, in definition (= topological) order."""
+
+        wanted: Set[str] = set()
+        stack = list(targets)
+
+        while stack:
+            name = stack.pop()
+            if name not in self.nodes:
+                raise ValueError(f"Unknown stage: {name}")
+            if name not in wanted:
+                wanted.add(name)
+                stack.extend(getattr(self.nodes[name], "inputs", []))
+
+        return [name for name in self.nodes if name in wanted]
+
+    def fingerprints(self, names: List[str]) -> Dict[str, str]:
+
+        prints: Dict[str, str] = {}
+
+        for name in names:
+            node = self.nodes[name]
+
+            if isinstance(node, WorkbookSource):
+                prints[name] = node.fingerprint()
+                continue
+
+            payload = json.dumps({
+                "code": node.code_hash(),
+                "version": node.version,
+                "params": node.params,
+                "inputs": {dep: prints[dep] for dep in node.inputs},
+            }, sort_keys=True, default=repr)
+
+            prints[name] = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+        return prints
+
+    def plan(self, targets: Optional[Iterable[str]] = None, force: Iterable[str] = ()) -> Dict[str, str]:
+        """
+        Map each node needed for ``targets`` to an action:
+        ``run`` (stale), ``load`` (cached, needed downstream), ``read``
+        (source feeding a run) or ``skip`` (cached, not needed).
+        """
+        return self._plan(targets, force)[0]
+
+    def _plan(self, targets, force):
+
+        names = self._closure(targets or [n for n in self.nodes])
+        prints = self.fingerprints(names)
+        force = set(force)
+
+        stale = {
+            name for name in names
+            if isinstance(self.nodes[name], Stage)
+            and (name in force or not self.cache.has(self.nodes[name], prints[name]))
+        }
+
+        actions = {name: "skip" for name in names}
+
+        for name in reversed(names):
+            if name in stale:
+                actions[name] = "run"
+            if actions[name] == "run":
+                for dep in self.nodes[name].inputs:
+                    if actions[dep] != "run":
+                        actions[dep] = "read" if isinstance(self.nodes[dep], WorkbookSource) else "load"
+
+        return actions, prints
+
+    # ------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------
+    def run(self, targets: Optional[Iterable[str]] = None, force: Iterable[str] = ()) -> Dict[str, object]:
+        """Execute the plan; returns results of the stages that ran."""
+
+        actions, prints = self._plan(targets, force)
+
+        todo = [name for name, action in actions.items() if action != "skip"]
+        outputs: Dict[str, object] = {}
+        results: Dict[str, object] = {}
+        lock = threading.Lock()
+
+        def execute(name: str) -> object:
+
+            node = self.nodes[name]
+            action = actions[name]
+
+            with span("pipeline_stage", component="Pipeline", stage=name, action=action):
+                started = time.perf_counter()
+
+                if action == "read":
+                    value = node.read()
+                elif action == "load":
+                    value = self.cache.load(node, prints[name])
+                else:
+                    kwargs = {dep: outputs[dep] for dep in node.inputs}
+                    value = node.fn(**kwargs)
+                    self.cache.store(node, prints[name], value)
+
+            logger.info("%-24s %-4s %.2fs", name, action, time.perf_counter() - started)
+
+            with lock:
+                outputs[name] = value
+
+            return value
+
+        remaining = list(todo)
+        running: Dict[Future, str] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as pool:
+
+            while remaining or running:
+
+                for name in list(remaining):
+                    deps = getattr(self.nodes[name], "inputs", [])
+                    if all(dep in outputs for dep in deps):
+                        remaining.remove(name)
+                        running[pool.submit(execute, name)] = name
+
+                if not running:
+                    raise RuntimeError(f"Unschedulable stages: {remaining}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    name = running.pop(future)
+                    value = future.result()   # propagate the first failure
+                    if actions[name] == "run":
+                        results[name] = value
+
+        return results
+
+
+# ================================================================
+# The Nightly Pipeline
+# ================================================================
+class Config:
+    OPTION_ENTRIES = r"C:\Users\user\Downloads\OptionEntries.xlsx"
+    OPTION_SPREADS = r"C:\Users\user\Desktop\option_spreads_data.xlsx"
+    SP500 = r"C:\Users\user\Downloads\SP500_Data 4.xlsx"
+
+    SERVER = r".\SQLEXPRESS02"
+    DATABASE = "INVESTMENTS"
+
+
+def build_pipeline(
+    config=Config,
+    export_dir: Optional[str | Path] = None,
+    cache_dir: str | Path = ".pipeline_cache",
+    max_workers: int = 4,
+) -> Pipeline:
+    """extraction + filled_data on the entries workbook, load_to_sql and
+    excel_to_sqlserver on theirs; optional xlsx exports of the results."""
+
+    pipe = Pipeline(cache_dir, max_workers)
+
+    pipe.source("option_entries", config.OPTION_ENTRIES)
+    pipe.source("option_spreads", config.OPTION_SPREADS)
+    pipe.source("sp500", config.SP500)
+
+    # extraction and filled_data each read the raw entries workbook, as the
+    # standalone scripts do: they fill different columns and neither uses the
+    # other's output, so they are siblings rather than a chain.
+    #
+    # Expirations come from the currently listed chain and prices from live
+    # quotes, so the result depends on today
+    @pipe.stage("enriched_trades", inputs=["option_entries"], today=date.today().isoformat())
+    def enriched_trades(option_entries):
+        from extraction import OptionTradeProcessor
+
+        processor = OptionTradeProcessor(config.OPTION_ENTRIES)
+        processor.load_frame(option_entries)
+        processor.enrich_data()
+        return processor.get_result()
+
+    # SP_End is only filled once expiry has passed, so the result depends on today
+    @pipe.stage("filled_entries", inputs=["option_entries"], today=date.today().isoformat())
+    def filled_entries(option_entries):
+        from filled_data import StockDataProcessor
+
+        processor = StockDataProcessor(Path(config.OPTION_ENTRIES))
+        processor.df = option_entries.copy()
+        processor.fill_missing_values()
+
+        df = processor.df
+        df["Stock Price"] = df["Stock Price"].round(2)
+        df["SP_End"] = df["SP_End"].round(2)
+        return df
+
+    @pipe.stage("clean_spreads", inputs=["option_spreads"])
+    def clean_spreads(option_spreads):
+        import load_to_sql
+
+        return load_to_sql.clean_data(option_spreads.copy())
+
+    @pipe.stage("load_spreads", inputs=["clean_spreads"], sink=True)
+    def load_spreads(clean_spreads):
+        import pyodbc
+        import load_to_sql
+
+        conn = pyodbc.connect(load_to_sql.CONNECTION_STRING)
+        try:
+            return {"rows": load_to_sql.insert_spreads(conn, clean_spreads)}
+        finally:
+            conn.close()
+
+    @pipe.stage("load_ticker_master", inputs=["sp500"], sink=True)
+    def load_ticker_master(sp500):
+        from excel_to_sqlserver import DBConfig, SQLServerLoader
+
+        loader = SQLServerLoader(DBConfig(
+            server=config.SERVER,
+            database=config.DATABASE,
+            table="TickerMaster",
+            schema="dbo",
+        ))
+        loader.load_dataframe(sp500)
+        return {"rows": len(sp500)}
+
+    if export_dir is not None:
+        export_dir = Path(export_dir)
+
+        @pipe.stage("export_enriched", inputs=["enriched_trades"], sink=True, directory=str(export_dir))
+        def export_enriched(enriched_trades):
+            path = export_dir / f"processed_option_data_{datetime.now():%Y%m%d_%H%M%S}.xlsx"
+            enriched_trades.to_excel(path, index=False)
+            return {"path": str(path)}
+
+        @pipe.stage("export_filled", inputs=["filled_entries"], sink=True, directory=str(export_dir))
+        def export_filled(filled_entries):
+            path = export_dir / f"{datetime.now():%Y%m%d_%H%M%S}.xlsx"
+            filled_entries.to_excel(path, index=False)
+            return {"path": str(path)}
+
+    return pipe
+
+
+# ================================================================
+# Entry Point
+# ================================================================
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(description="Run the enrichment → load pipeline as a cached DAG.")
+    parser.add_argument("--targets", nargs="+", default=None, help="stages to bring up to date (default: all)")
+    parser.add_argument("--force", nargs="+", default=[], help="stages to re-run even if cached")
+    parser.add_argument("--export", default=None, metavar="DIR", help="also write the enriched workbooks to DIR")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--cache-dir", default=".pipeline_cache")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan without running it")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+
+    args = parse_args(argv)
+    pipe = build_pipeline(export_dir=args.export, cache_dir=args.cache_dir, max_workers=args.workers)
+
+    if args.dry_run:
+        for name, action in pipe.plan(args.targets, args.force).items():
+            print(f"{name:<24} {action}")
+        return
+
+    results = pipe.run(args.targets, args.force)
+
+    print(f"Ran {len(results)} stage(s): {', '.join(results) or 'nothing changed'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
-import yfinance as yf
-import pyodbc
-import pandas as pd
+import argparse
 from datetime import datetime, timedelta
 import os
 
+import memprofile
+from instrumentation import count, span
+
 # ============================================================
 # CONFIG
 # ============================================================
@@ -11,25 +12,39 @@ BATCH_SIZE = 50
 EARLIEST_DATE = datetime(2020, 1, 1)
 CHECKPOINT_FILE = "last_loaded.txt"
 
+# Tickers still failing after retries are recorded here for backfill
+FAILED_FILE = "failed_tickers.txt"
+
 # Starting reference date (latest historical point)
 INITIAL_START_DATE = datetime(2026, 2, 6)
 
 # ============================================================
 # SQL CONNECTION
 # ============================================================
-conn = pyodbc.connect(
+CONNECTION_STRING = (
     "DRIVER={ODBC Driver 17 for SQL Server};"
     "SERVER=.\\SQLEXPRESS02;"
     "DATABASE=INVESTMENTS;"
     "Trusted_Connection=yes;"
 )
 
-cursor = conn.cursor()
+
+def get_connection():
+    # Imported here so --help and imports stay cheap
+    import pyodbc
+
+    return pyodbc.connect(CONNECTION_STRING)
+
+INSERT_QUERY = """
+    INSERT INTO dbo.Stocks_History
+    (ticker, date, open_price, close_price, high, low, volume)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
 
 # ============================================================
 # MANUAL TICKER LIST
 # ============================================================
-tickers = [
+TICKERS = [
 "AAPL","MSFT","AMZN","NVDA","GOOGL","GOOG","META","BRK.B","TSLA","UNH",
 "JNJ","JPM","V","XOM","PG","MA","HD","LLY","CVX","MRK","ABBV","PEP","KO",
 "AVGO","COST","BAC","TMO","WMT","CSCO","MCD","ABT","CRM","ACN","DHR","LIN",
@@ -41,99 +56,169 @@ tickers = [
 "WM","CDNS","CL","EOG","APD","MCO","TGT","FDX","SHW","HUM","PXD","USB"
 ]
 
-# Convert Yahoo special symbols (BRK.B → BRK-B)
-tickers = [t.replace(".", "-") for t in tickers]
 
-print(f"Total tickers: {len(tickers)}")
+def load_tickers():
+    # Convert Yahoo special symbols (BRK.B → BRK-B)
+    return [t.replace(".", "-") for t in TICKERS]
+
 
 # ============================================================
 # DETERMINE MONTH TO LOAD
 # ============================================================
-if os.path.exists(CHECKPOINT_FILE):
-    with open(CHECKPOINT_FILE, "r") as f:
-        start_date = datetime.strptime(f.read().strip(), "%Y-%m-%d")
-else:
-    # First run → start from INITIAL_START_DATE month
-    start_date = datetime(INITIAL_START_DATE.year, INITIAL_START_DATE.month, 1)
+def month_to_load(checkpoint_file=CHECKPOINT_FILE):
+
+    if os.path.exists(checkpoint_file):
+        with open(checkpoint_file, "r") as f:
+            start_date = datetime.strptime(f.read().strip(), "%Y-%m-%d")
+    else:
+        # First run → start from INITIAL_START_DATE month
+        start_date = datetime(INITIAL_START_DATE.year, INITIAL_START_DATE.month, 1)
+
+    # Calculate end of that month
+    next_month = (start_date.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+    return start_date, next_month
+
+
+def save_checkpoint(start_date, checkpoint_file=CHECKPOINT_FILE):
+
+    prev_month = start_date - timedelta(days=1)
+    prev_month = datetime(prev_month.year, prev_month.month, 1)
+
+    with open(checkpoint_file, "w") as f:
+        f.write(prev_month.strftime("%Y-%m-%d"))
 
-# Calculate end of that month
-next_month = (start_date.replace(day=28) + timedelta(days=4)).replace(day=1)
-end_date = next_month
 
-# Stop condition
-if start_date < EARLIEST_DATE:
-    print("✅ Historical load complete")
-    conn.close()
-    exit()
+def record_failures(failed_tickers, start_date, end_date):
+
+    if not failed_tickers:
+        return
+
+    with open(FAILED_FILE, "a") as f:
+        for ticker in failed_tickers:
+            f.write(f"{start_date.date()},{end_date.date()},{ticker}\n")
+
+    print(f"⚠ {len(failed_tickers)} tickers failed after retries — listed in {FAILED_FILE}")
 
-print(f"Loading data: {start_date.date()} → {end_date.date()}")
 
 # ============================================================
 # BATCH PROCESS
 # ============================================================
-for i in range(0, len(tickers), BATCH_SIZE):
-
-    batch = tickers[i:i+BATCH_SIZE]
-    print(f"Processing batch {i//BATCH_SIZE + 1}")
-
-    data = yf.download(
-        batch,
-        start=start_date.strftime("%Y-%m-%d"),
-        end=end_date.strftime("%Y-%m-%d"),
-        group_by="ticker",
-        auto_adjust=False,
-        threads=True,
-        progress=False
-    )
-
-    for ticker in batch:
-
-        if ticker not in data:
-            continue
-
-        df = data[ticker]
-
-        if df.empty:
-            continue
-
-        df = df.reset_index()
-
-        for _, row in df.iterrows():
-
-            open_p  = None if pd.isna(row["Open"]) else round(float(row["Open"]), 2)
-            close_p = None if pd.isna(row["Close"]) else round(float(row["Close"]), 2)
-            high_p  = None if pd.isna(row["High"]) else round(float(row["High"]), 2)
-            low_p   = None if pd.isna(row["Low"]) else round(float(row["Low"]), 2)
-            volume  = None if pd.isna(row["Volume"]) else int(row["Volume"])
-
-            cursor.execute("""
-                INSERT INTO dbo.Stocks_History
-                (ticker, date, open_price, close_price, high, low, volume)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            ticker,
-            row["Date"].date(),
-            open_p,
-            close_p,
-            high_p,
-            low_p,
-            volume
+def download_batch(provider, batch, start_date, end_date):
+    """Rate-limited and retried; returns (bars, tickers that still failed)."""
+
+    from market_data import IncompleteDataError
+
+    try:
+        return provider.daily_bars(batch, start_date, end_date), []
+    except IncompleteDataError as e:
+        return e.partial, list(e.failed_tickers)
+
+
+def write_rows(cursor, data):
+
+    import pandas as pd
+
+    with span("sql_write", component="previous_Data", rows=len(data)):
+
+        for row in data.itertuples(index=False):
+
+            open_p  = None if pd.isna(row.open) else round(float(row.open), 2)
+            close_p = None if pd.isna(row.close) else round(float(row.close), 2)
+            high_p  = None if pd.isna(row.high) else round(float(row.high), 2)
+            low_p   = None if pd.isna(row.low) else round(float(row.low), 2)
+            volume  = None if pd.isna(row.volume) else int(row.volume)
+
+            cursor.execute(
+                INSERT_QUERY,
+                row.ticker,
+                row.date.date(),
+                open_p,
+                close_p,
+                high_p,
+                low_p,
+                volume
             )
 
-# ============================================================
-# COMMIT DATA
-# ============================================================
-conn.commit()
+    count("rows_written", len(data), component="previous_Data", table="Stocks_History")
+
+
+def load_month(conn, tickers, start_date, end_date):
+    """Download and insert one month for every ticker; returns failed tickers."""
+
+    from market_data import get_provider
+
+    provider = get_provider()
+    cursor = conn.cursor()
+    failed_tickers = []
+
+    for i in range(0, len(tickers), BATCH_SIZE):
+
+        batch = tickers[i:i+BATCH_SIZE]
+        batch_no = i // BATCH_SIZE + 1
+        print(f"Processing batch {batch_no}")
+
+        data = None
+
+        with memprofile.memory_stage(
+            f"download_batch_{batch_no}",
+            lambda: {"bars": data, "bar_cache": provider.cached_bytes()},
+        ):
+            data, failed = download_batch(provider, batch, start_date, end_date)
+            failed_tickers.extend(failed)
+
+        with memprofile.memory_stage(f"sql_write_batch_{batch_no}", lambda: {"bars": data}):
+            write_rows(cursor, data)
+
+    conn.commit()
+
+    return failed_tickers
+
 
 # ============================================================
-# SAVE NEXT MONTH CHECKPOINT
+# MAIN
 # ============================================================
-prev_month = start_date - timedelta(days=1)
-prev_month = datetime(prev_month.year, prev_month.month, 1)
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(description="Load one month of history into dbo.Stocks_History.")
+    memprofile.add_argument(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+
+    args = parse_args(argv)
+
+    if args.profile_memory:
+        memprofile.enable()
+
+    tickers = load_tickers()
+    print(f"Total tickers: {len(tickers)}")
+
+    start_date, end_date = month_to_load()
+
+    # Stop condition
+    if start_date < EARLIEST_DATE:
+        print("✅ Historical load complete")
+        return
+
+    print(f"Loading data: {start_date.date()} → {end_date.date()}")
+
+    conn = get_connection()
+
+    try:
+        failed_tickers = load_month(conn, tickers, start_date, end_date)
+    finally:
+        conn.close()
+
+        if args.profile_memory:
+            memprofile.finish(args.profile_memory)
+
+    save_checkpoint(start_date)
+    record_failures(failed_tickers, start_date, end_date)
 
-with open(CHECKPOINT_FILE, "w") as f:
-    f.write(prev_month.strftime("%Y-%m-%d"))
+    print("✅ One month historical data loaded into dbo.Stocks_History")
 
-conn.close()
 
-print("✅ One month historical data loaded into dbo.Stocks_History")
+if __name__ == "__main__":
+    main()
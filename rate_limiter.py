@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+
+logger = logging.getLogger("RateLimiter")
+
+T = TypeVar("T")
+
+
+# ================================================================
+# Exceptions
+# ================================================================
+class MarketDataError(Exception):
+    """Raised when a provider call still fails after all retries."""
+
+
+class ThrottledError(MarketDataError):
+    """The provider signalled rate limiting (HTTP 429 or equivalent)."""
+
+
+# ================================================================
+# Error Classification
+# ================================================================
+THROTTLE_MARKERS = ("too many requests", "rate limit", "429")
+
+TRANSIENT_ERROR_NAMES = {
+    "ConnectionError",
+    "ConnectTimeout",
+    "ReadTimeout",
+    "Timeout",
+    "ChunkedEncodingError",
+    "SSLError",
+    "YFRateLimitError",
+}
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+
+    if isinstance(exc, ThrottledError):
+        return True
+
+    text = f"{type(exc).__name__} {exc}".lower()
+    return any(marker in text for marker in THROTTLE_MARKERS)
+
+
+def is_transient_error(exc: BaseException) -> bool:
+
+    if is_throttle_error(exc):
+        return True
+
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(exc).__mro__)
+
+
+# ================================================================
+# Token Bucket (AIMD-adjusted)
+# ================================================================
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    The refill rate backs off multiplicatively on throttling and recovers
+    additively on success, so it settles just under the provider's real
+    limit instead of a hand-tuned constant.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        min_rate: float = 0.2,
+        recovery_step: float = 0.05,
+    ):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.recovery_step = recovery_step
+
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until ``tokens`` are available; return seconds waited."""
+
+        waited = 0.0
+        remaining = tokens
+
+        while remaining > 0:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                take = min(remaining, self._tokens, self.capacity)
+                if take >= min(remaining, 1.0):
+                    self._tokens -= take
+                    remaining -= take
+                    continue
+
+                delay = (min(remaining, 1.0) - self._tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+        return waited
+
+    def on_throttle(self) -> None:
+
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+
+        logger.warning("Throttled by provider; request rate lowered to %.2f/s", self.rate)
+
+    def on_success(self) -> None:
+
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.recovery_step)
+
+
+# ================================================================
+# Circuit Breaker
+# ================================================================
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive throttling errors.
+
+    While open, callers are paused rather than failed; after the cooldown
+    one trial call is let through (half-open). Each re-open doubles the
+    cooldown up to ``max_cooldown``.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        max_cooldown: float = 600.0,
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self.state = self.CLOSED
+        self._failures = 0
+        self._cooldown = cooldown
+        self._opened_until = 0.0
+        self._trial_in_flight = False
+        self._cond = threading.Condition()
+
+    def before_call(self) -> None:
+
+        with self._cond:
+            while True:
+                now = time.monotonic()
+
+                if self.state == self.CLOSED:
+                    return
+
+                if self.state == self.OPEN and now >= self._opened_until:
+                    self.state = self.HALF_OPEN
+
+                if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                    self._trial_in_flight = True
+                    return
+
+                timeout = max(self._opened_until - now, 0.5)
+                self._cond.wait(timeout)
+
+    def record_success(self) -> None:
+
+        with self._cond:
+            if self.state != self.CLOSED:
+                logger.info("Circuit closed; provider calls resumed")
+
+            self.state = self.CLOSED
+            self._failures = 0
+            self._cooldown = self.base_cooldown
+            self._trial_in_flight = False
+            self._cond.notify_all()
+
+    def record_failure(self, throttled: bool) -> None:
+
+        with self._cond:
+            self._trial_in_flight = False
+
+            if not throttled:
+                self._cond.notify_all()
+                return
+
+            self._failures += 1
+
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state == self.HALF_OPEN:
+                    self._cooldown = min(self.max_cooldown, self._cooldown * 2)
+
+                self.state = self.OPEN
+                self._opened_until = time.monotonic() + self._cooldown
+
+                logger.error(
+                    "Circuit opened after %d throttled calls; pausing for %.1fs",
+                    self._failures,
+                    self._cooldown,
+                )
+
+            self._cond.notify_all()
+
+
+# ================================================================
+# Guarded Caller
+# ================================================================
+class ResilientCaller:
+    """
+    Runs provider calls through the token bucket, circuit breaker and
+    jittered exponential backoff. Non-transient errors propagate
+    immediately; transient ones are retried and finally surface as
+    ``MarketDataError``.
+    """
+
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        breaker: CircuitBreaker,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        self.bucket = bucket
+        self.breaker = breaker
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for a zero-based attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(
+        self,
+        fn: Callable[[], T],
+        cost: float = 1.0,
+        description: str = "provider call",
+    ) -> T:
+
+        last_exc: Optional[BaseException] = None
+
+        for attempt in range(self.max_attempts):
+
+            self.breaker.before_call()
+            self.bucket.acquire(cost)
+
+            try:
+                result = fn()
+
+            except Exception as exc:
+                if not is_transient_error(exc):
+                    self.breaker.record_failure(throttled=False)
+                    raise
+
+                throttled = is_throttle_error(exc)
+                self.breaker.record_failure(throttled=throttled)
+                if throttled:
+                    self.bucket.on_throttle()
+
+                last_exc = exc
+                delay = self.backoff_delay(attempt)
+
+                logger.warning(
+                    "%s failed (attempt %d/%d): %s; retrying in %.1fs",
+                    description,
+                    attempt + 1,
+                    self.max_attempts,
+                    exc,
+                    delay,
+                )
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            self.bucket.on_success()
+            return result
+
+        raise MarketDataError(
+            f"{description} failed after {self.max_attempts} attempts: {last_exc}"
+        ) from last_exc
+
+
+# ================================================================
+# Process-wide Instance
+# ================================================================
+_yahoo_caller: Optional[ResilientCaller] = None
+_yahoo_lock = threading.Lock()
+
+
+def yahoo_caller() -> ResilientCaller:
+    """
+    Shared guard for every Yahoo request in the process.
+
+    Tunable with YAHOO_RATE_PER_SEC and YAHOO_BURST.
+    """
+
+    global _yahoo_caller
+
+    with _yahoo_lock:
+        if _yahoo_caller is None:
+            rate = float(os.environ.get("YAHOO_RATE_PER_SEC", "4"))
+            burst = float(os.environ.get("YAHOO_BURST", "20"))
+
+            _yahoo_caller = ResilientCaller(
+                TokenBucket(rate=rate, capacity=burst),
+                CircuitBreaker(),
+            )
+
+        return _yahoo_caller
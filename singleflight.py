@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, Generic, Hashable, Iterable, List, Optional, Tuple, TypeVar
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+# ================================================================
+# In-flight Call
+# ================================================================
+class _Call(Generic[V]):
+
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Optional[V] = None
+        self.error: Optional[BaseException] = None
+
+
+# ================================================================
+# Single-flight Group
+# ================================================================
+class SingleFlight(Generic[K, V]):
+    """
+    Coalesces concurrent requests for the same key into one upstream call.
+
+    Callers that arrive while a key is in flight wait for that call and
+    share its result (or exception). With ``ttl`` > 0 results are also
+    reused for that many seconds; ``cache_if`` decides which values are
+    worth keeping (e.g. skip ``None`` from failed lookups).
+    """
+
+    def __init__(
+        self,
+        ttl: float = 0.0,
+        cache_if: Callable[[V], bool] = lambda value: value is not None,
+    ):
+        self.ttl = ttl
+        self.cache_if = cache_if
+
+        self._lock = threading.Lock()
+        self._calls: Dict[K, _Call[V]] = {}
+        self._results: Dict[K, Tuple[float, V]] = {}
+
+        self.stats = {"upstream": 0, "shared": 0, "cached": 0}
+
+    # ------------------------------------------------------------
+    def do(self, key: K, fn: Callable[[], V]) -> V:
+        return self.do_many([key], lambda keys: {keys[0]: fn()})[key]
+
+    # ------------------------------------------------------------
+    def do_many(
+        self,
+        keys: Iterable[K],
+        fetch_many: Callable[[List[K]], Dict[K, V]],
+    ) -> Dict[K, V]:
+        """
+        Resolve ``keys`` with at most one ``fetch_many`` call for the keys
+        nobody else is already fetching. Keys missing from its result map
+        to ``None``.
+        """
+
+        keys = list(dict.fromkeys(keys))
+        results: Dict[K, V] = {}
+        owned: Dict[K, _Call[V]] = {}
+        waiting: Dict[K, _Call[V]] = {}
+
+        with self._lock:
+            now = time.monotonic()
+
+            for key in keys:
+                cached = self._results.get(key)
+                if cached is not None and cached[0] > now:
+                    results[key] = cached[1]
+                    self.stats["cached"] += 1
+                    continue
+
+                call = self._calls.get(key)
+                if call is not None:
+                    waiting[key] = call
+                    self.stats["shared"] += 1
+                else:
+                    call = _Call()
+                    self._calls[key] = call
+                    owned[key] = call
+
+            if owned:
+                self.stats["upstream"] += 1
+
+        if owned:
+            self._run(owned, fetch_many)
+
+        for key, call in {**owned, **waiting}.items():
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            results[key] = call.value
+
+        return {key: results.get(key) for key in keys}
+
+    def _run(self, owned: Dict[K, _Call[V]], fetch_many: Callable[[List[K]], Dict[K, V]]) -> None:
+
+        error: Optional[BaseException] = None
+        fetched: Dict[K, V] = {}
+
+        try:
+            fetched = fetch_many(list(owned))
+        except BaseException as exc:
+            error = exc
+
+        with self._lock:
+            expires_at = time.monotonic() + self.ttl
+
+            for key, call in owned.items():
+                call.value = fetched.get(key)
+                call.error = error
+
+                if error is None and self.ttl > 0 and self.cache_if(call.value):
+                    self._results[key] = (expires_at, call.value)
+
+                del self._calls[key]
+                call.event.set()
+
+    # ------------------------------------------------------------
+    def forget(self, key: K) -> None:
+
+        with self._lock:
+            self._results.pop(key, None)
+
+    def clear(self) -> None:
+
+        with self._lock:
+            self._results.clear()
@@ -0,0 +1,228 @@
+"""
+Spread Mark-to-Market
+---------------------
+Values every open vertical spread in ``dbo.option_spreads`` against the
+latest underlying price from ``dbo.Spread_Latest`` in one vectorized pass:
+intrinsic value, distance to each strike, max profit/loss, breakeven,
+current P&L and return on capital at risk.
+
+Positions are held as NumPy arrays; the whole book is a handful of
+elementwise operations, so it is cheap enough to run every collector
+cycle with the prices that were just fetched.
+
+    python spread_pnl.py                  # mark the book at the latest prices
+    python spread_pnl.py --by-ticker      # aggregate P&L per underlying
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+from typing import Dict, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+
+
+logger = logging.getLogger("SpreadPnL")
+
+CONTRACT_MULTIPLIER = 100
+
+SPREAD_COLUMNS = [
+    "id", "ticker", "option_type", "tran_type", "option_price",
+    "strike_price_lower", "strike_price_upper", "option_quantity",
+    "contract_amount", "coll_amount", "expiration_date",
+]
+
+OPEN_SPREADS_QUERY = f"""
+    SELECT {', '.join(SPREAD_COLUMNS)}
+    FROM dbo.option_spreads
+    WHERE UPPER(status) = 'OPEN'
+"""
+
+# Maintained in place by spread_price_collector; one row per ticker
+LATEST_PRICES_QUERY = """
+    SELECT Ticker, Price, Date_Time
+    FROM dbo.Spread_Latest
+"""
+
+
+# ================================================================
+# Loading
+# ================================================================
+@timed("sql_read", component="SpreadPnL")
+def load_open_spreads(conn) -> pd.DataFrame:
+
+    cursor = conn.cursor()
+    cursor.execute(OPEN_SPREADS_QUERY)
+    rows = cursor.fetchall()
+
+    df = pd.DataFrame([tuple(row) for row in rows], columns=SPREAD_COLUMNS)
+    df["expiration_date"] = pd.to_datetime(df["expiration_date"], errors="coerce")
+
+    return df
+
+
+@timed("sql_read", component="SpreadPnL")
+def load_latest_prices(conn) -> Dict[str, float]:
+
+    cursor = conn.cursor()
+    cursor.execute(LATEST_PRICES_QUERY)
+
+    return {row[0]: float(row[1]) for row in cursor.fetchall() if row[1] is not None}
+
+
+# ================================================================
+# Valuation
+# ================================================================
+def position_arrays(spreads: pd.DataFrame):
+    """(lower, upper, premium, shares, is_call, is_credit) arrays of SPREAD_COLUMNS rows."""
+
+    def numbers(name):
+        return pd.to_numeric(spreads[name], errors="coerce").to_numpy(dtype=np.float64)
+
+    return (
+        numbers("strike_price_lower"),
+        numbers("strike_price_upper"),
+        numbers("option_price"),
+        numbers("option_quantity") * CONTRACT_MULTIPLIER,
+        spreads["option_type"].astype(str).str.upper().eq("CALL").to_numpy(),
+        spreads["tran_type"].astype(str).str.upper().eq("CREDIT").to_numpy(),
+    )
+
+
+def intrinsic_per_share(underlying, lower, upper, is_call):
+    """Spread value per share at ``underlying``; broadcasts like any ufunc."""
+    return np.clip(np.where(is_call, underlying - lower, upper - underlying), 0.0, upper - lower)
+
+
+def pnl_per_share(intrinsic, premium, is_credit):
+    # Credit: keep the premium, owe the intrinsic value. Debit: the reverse.
+    return np.where(is_credit, premium - intrinsic, intrinsic - premium)
+
+
+@timed("transform", component="SpreadPnL")
+def mark_to_market(
+    spreads: pd.DataFrame,
+    prices: Mapping[str, Optional[float]],
+    as_of: Optional[pd.Timestamp] = None,
+) -> pd.DataFrame:
+    """
+    ``spreads`` has SPREAD_COLUMNS; ``prices`` maps ticker → underlying
+    price. Returns the spreads with valuation columns added. Positions
+    without a price get NaN valuations.
+
+    Per share, a CALL spread is worth ``clip(S - lower, 0, width)`` and a
+    PUT spread ``clip(upper - S, 0, width)``. Credit spreads are short
+    that value and debit spreads are long it.
+    """
+
+    as_of = pd.Timestamp.today().normalize() if as_of is None else pd.Timestamp(as_of)
+
+    lower, upper, premium, shares, is_call, is_credit = position_arrays(spreads)
+    underlying = spreads["ticker"].map(prices).to_numpy(dtype=np.float64, na_value=np.nan)
+
+    width = upper - lower
+
+    intrinsic = intrinsic_per_share(underlying, lower, upper, is_call)
+    per_share = pnl_per_share(intrinsic, premium, is_credit)
+    max_profit = np.where(is_credit, premium, width - premium) * shares
+    max_loss = np.where(is_credit, width - premium, premium) * shares
+
+    breakeven = np.where(is_call, lower + premium, upper - premium)
+
+    # Breached: a credit spread's short strike is in the money, or a debit
+    # spread's long strike is out of it. Either way it is the lower strike
+    # for calls and the upper one for puts.
+    breach_strike = np.where(is_call, lower, upper)
+    breached = np.where(is_credit, intrinsic > 0, intrinsic <= 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pnl = per_share * shares
+        out = spreads.assign(
+            underlying_price=underlying,
+            intrinsic_value=intrinsic * shares,
+            lower_distance_pct=(underlying - lower) / underlying,
+            upper_distance_pct=(upper - underlying) / underlying,
+            breach_strike=breach_strike,
+            breakeven=breakeven,
+            breached=breached & ~np.isnan(underlying),
+            max_profit=max_profit,
+            max_loss=max_loss,
+            rate_of_return=max_profit / max_loss,
+            pnl=pnl,
+            pnl_pct_of_risk=pnl / max_loss,
+            days_to_expiry=(spreads["expiration_date"] - as_of).dt.days.to_numpy(),
+        )
+
+    return out
+
+
+def book_summary(marked: pd.DataFrame) -> pd.DataFrame:
+    """Per-ticker totals of a ``mark_to_market`` result."""
+
+    return (
+        marked.groupby("ticker")
+        .agg(
+            positions=("id", "size"),
+            underlying_price=("underlying_price", "first"),
+            breached=("breached", "sum"),
+            max_profit=("max_profit", "sum"),
+            max_loss=("max_loss", "sum"),
+            pnl=("pnl", "sum"),
+        )
+        .sort_values("pnl")
+    )
+
+
+def revalue(conn, prices: Optional[Mapping[str, Optional[float]]] = None) -> pd.DataFrame:
+    """Mark all open spreads; ``prices`` defaults to the latest stored ones."""
+
+    spreads = load_open_spreads(conn)
+
+    if prices is None:
+        prices = load_latest_prices(conn)
+
+    return mark_to_market(spreads, prices)
+
+
+# ================================================================
+# Entry Point
+# ================================================================
+def parse_args(argv: Optional[Sequence[str]] = None):
+
+    parser = argparse.ArgumentParser(description="Mark open option spreads to market.")
+    parser.add_argument("--by-ticker", action="store_true", help="Aggregate per underlying")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+
+    args = parse_args(argv)
+
+    # Imported here so --help and imports stay cheap
+    from spread_price_collector import DatabaseManager
+
+    with DatabaseManager().get_connection() as conn:
+        marked = revalue(conn)
+
+    if args.by_ticker:
+        print(book_summary(marked).to_string())
+    else:
+        print(marked.drop(columns=["contract_amount", "coll_amount"]).to_string(index=False))
+
+    print(
+        f"{len(marked)} open spreads | P&L {np.nansum(marked['pnl']):,.2f} | "
+        f"breached {int(marked['breached'].sum())} | unpriced {int(marked['underlying_price'].isna().sum())}"
+    )
+
+
+if __name__ == "__main__":
+    main()
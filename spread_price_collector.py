@@ -1,14 +1,15 @@
 from __future__ import annotations
 
+import argparse
 import logging
 import time
 from datetime import datetime, time as dt_time
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
-import pyodbc
 import pytz
-import schedule
-import yfinance as yf
+
+from instrumentation import count, timed
+from metrics_server import REGISTRY, SIZE_BUCKETS, CycleTracker, start_from_env, start_server, track_schedule_lag
 
 
 # ============================================================
@@ -23,6 +24,33 @@ class Config:
 
     SPREADS_TABLE = "dbo.option_spreads"
     TARGET_TABLE = "dbo.Spread_Prices"
+    LATEST_TABLE = "dbo.Spread_Latest"
+
+
+# One row per ticker, updated in place by every cycle
+SPREAD_LATEST_DDL = f"""
+IF OBJECT_ID('{Config.LATEST_TABLE}') IS NULL
+CREATE TABLE {Config.LATEST_TABLE} (
+    Ticker VARCHAR(16) NOT NULL PRIMARY KEY,
+    Price DECIMAL(18, 4) NOT NULL,
+    Date_Time DATETIME NOT NULL,
+    Open_Spreads INT NOT NULL DEFAULT 0,
+    Breached_Spreads INT NOT NULL DEFAULT 0,
+    Is_Breached BIT NOT NULL DEFAULT 0
+)
+"""
+
+# Set-based rebuild: newest Spread_Prices row per ticker in one pass
+REBUILD_LATEST_QUERY = f"""
+INSERT INTO {Config.LATEST_TABLE} (Ticker, Price, Date_Time)
+SELECT Ticker, Price, Date_Time
+FROM (
+    SELECT Ticker, Price, Date_Time,
+           ROW_NUMBER() OVER (PARTITION BY Ticker ORDER BY Date_Time DESC) AS rn
+    FROM {Config.TARGET_TABLE}
+) latest
+WHERE rn = 1
+"""
 
 
 # ============================================================
@@ -37,6 +65,27 @@ logging.basicConfig(
 logger = logging.getLogger("SpreadPriceCollector")
 
 
+# ============================================================
+# Metrics
+# ============================================================
+
+PRICE_BATCH_SECONDS = REGISTRY.histogram(
+    "collector_price_batch_seconds", "Time to fetch one batch of last prices."
+)
+PRICE_BATCH_SIZE = REGISTRY.histogram(
+    "collector_price_batch_size", "Tickers per last-price batch.", buckets=SIZE_BUCKETS
+)
+PENDING_ROWS = REGISTRY.gauge(
+    "collector_pending_rows", "Fetched prices not yet written to the database."
+)
+BOOK_PNL = REGISTRY.gauge(
+    "spread_book_pnl", "Mark-to-market P&L of all open spreads at the latest prices."
+)
+BREACHED_SPREADS = REGISTRY.gauge(
+    "spread_breached_positions", "Open spreads whose breach strike has been crossed."
+)
+
+
 # ============================================================
 # Database Manager
 # ============================================================
@@ -52,10 +101,14 @@ class DatabaseManager:
         )
 
     def get_connection(self):
+        # Imported here so --help and imports stay cheap
+        import pyodbc
+
         return pyodbc.connect(self.connection_string)
 
     # --------------------------------------------------------
 
+    @timed("sql_read", component="SpreadPriceCollector")
     def get_active_tickers(self) -> List[str]:
         query = f"""
             SELECT DISTINCT Ticker
@@ -75,26 +128,104 @@ class DatabaseManager:
 
     # --------------------------------------------------------
 
-    def insert_price(self, ticker: str, price: float):
-
-        query = f"""
-            INSERT INTO {Config.TARGET_TABLE}
-            (Ticker, Date_Time, Price)
-            VALUES (?, ?, ?)
+    @timed("sql_write", component="SpreadPriceCollector")
+    def write_prices(
+        self,
+        prices: Dict[str, float],
+        flags: Optional[Dict[str, Tuple[int, int]]],
+    ) -> int:
         """
+        Append one cycle's prices to the history table and upsert the same
+        rows into Spread_Latest, in one transaction. ``flags`` maps ticker
+        to (open spreads, breached spreads); tickers missing from it have
+        no open spreads. With ``flags=None`` the breach columns keep their
+        previous values.
+        """
+
+        now = datetime.now()
+        rows = [(ticker, now, round(price, 4)) for ticker, price in prices.items()]
 
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
-            cursor.execute(
-                query,
-                ticker,
-                datetime.now(),
-                round(price, 4),
+            if hasattr(cursor, "fast_executemany"):
+                cursor.fast_executemany = True
+
+            cursor.executemany(
+                f"INSERT INTO {Config.TARGET_TABLE} (Ticker, Date_Time, Price) VALUES (?, ?, ?)",
+                rows,
             )
 
+            for ticker, date_time, price in rows:
+                if flags is None:
+                    breach = (None, None, None)
+                else:
+                    open_spreads, breached = flags.get(ticker, (0, 0))
+                    breach = (open_spreads, breached, int(breached > 0))
+
+                cursor.execute(
+                    f"""
+                    UPDATE {Config.LATEST_TABLE}
+                    SET Price = ?, Date_Time = ?,
+                        Open_Spreads = COALESCE(?, Open_Spreads),
+                        Breached_Spreads = COALESCE(?, Breached_Spreads),
+                        Is_Breached = COALESCE(?, Is_Breached)
+                    WHERE Ticker = ?
+                    """,
+                    price, date_time, *breach, ticker,
+                )
+
+                if cursor.rowcount == 0:
+                    cursor.execute(
+                        f"""
+                        INSERT INTO {Config.LATEST_TABLE}
+                        (Ticker, Price, Date_Time, Open_Spreads, Breached_Spreads, Is_Breached)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        """,
+                        ticker, price, date_time, *(value or 0 for value in breach),
+                    )
+
             conn.commit()
 
+        return len(rows)
+
+    # --------------------------------------------------------
+
+    def update_flags(self, conn, flags: Dict[str, Tuple[int, int]]) -> None:
+
+        cursor = conn.cursor()
+        cursor.executemany(
+            f"""
+            UPDATE {Config.LATEST_TABLE}
+            SET Open_Spreads = ?, Breached_Spreads = ?, Is_Breached = ?
+            WHERE Ticker = ?
+            """,
+            [(n, breached, int(breached > 0), ticker) for ticker, (n, breached) in flags.items()],
+        )
+
+    @timed("sql_write", component="SpreadPriceCollector")
+    def rebuild_latest(self) -> int:
+        """Repopulate Spread_Latest from the full price history."""
+
+        from spread_pnl import revalue
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"DELETE FROM {Config.LATEST_TABLE}")
+            cursor.execute(REBUILD_LATEST_QUERY)
+            self.update_flags(conn, breach_flags(revalue(conn)))
+            conn.commit()
+
+            cursor.execute(f"SELECT COUNT(*) FROM {Config.LATEST_TABLE}")
+            return cursor.fetchone()[0]
+
+
+def breach_flags(marked) -> Dict[str, Tuple[int, int]]:
+    """(open spreads, breached spreads) per ticker from a spread_pnl result."""
+
+    grouped = marked.groupby("ticker")["breached"].agg(["size", "sum"])
+    return {ticker: (int(n), int(breached)) for ticker, n, breached in grouped.itertuples()}
+
 
 # ============================================================
 # Market Schedule (EST)
@@ -127,16 +258,25 @@ class PriceFetcher:
 
     @staticmethod
     def get_price(ticker: str) -> float | None:
+        return PriceFetcher.get_prices([ticker]).get(ticker)
 
-        try:
-            data = yf.Ticker(ticker)
-            price = data.fast_info.last_price
+    @staticmethod
+    def get_prices(tickers: List[str]) -> Dict[str, float | None]:
 
-            return float(price) if price else None
+        from market_data import get_provider
 
-        except Exception:
-            logger.warning("Price fetch failed for %s", ticker)
-            return None
+        start = time.perf_counter()
+        prices = get_provider().last_prices(tickers)
+
+        # One batched round trip: one observation, not one per ticker
+        PRICE_BATCH_SECONDS.observe(time.perf_counter() - start)
+        PRICE_BATCH_SIZE.observe(len(tickers))
+
+        for ticker, price in prices.items():
+            if price is None:
+                logger.warning("Price fetch failed for %s", ticker)
+
+        return prices
 
 
 # ============================================================
@@ -148,8 +288,14 @@ class SpreadPriceCollector:
     def __init__(self):
         self.db = DatabaseManager()
 
+    @timed("collector_cycle", component="SpreadPriceCollector")
     def run(self):
 
+        with CycleTracker("spread_prices"):
+            self._collect()
+
+    def _collect(self):
+
         logger.info("Running price collection cycle")
 
         tickers = self.db.get_active_tickers()
@@ -158,28 +304,92 @@ class SpreadPriceCollector:
             logger.warning("No active tickers found")
             return
 
-        for ticker in tickers:
-
-            price = PriceFetcher.get_price(ticker)
+        prices = PriceFetcher.get_prices(tickers)
 
+        for ticker, price in prices.items():
             if price is None:
-                continue
+                count("fetch_failures", component="SpreadPriceCollector", ticker=ticker)
+
+        fetched = {ticker: price for ticker, price in prices.items() if price is not None}
+
+        flags = self._mark_book(fetched)
+
+        PENDING_ROWS.set(len(fetched))
+
+        written = self.db.write_prices(fetched, flags)
+        count("rows_written", written, component="SpreadPriceCollector", table="Spread_Prices")
+
+        PENDING_ROWS.set(0)
 
-            self.db.insert_price(ticker, price)
+        logger.info("Inserted %d prices", written)
 
-            logger.info("Inserted %s → %.4f", ticker, price)
+    def _mark_book(self, prices: Dict[str, float]) -> Optional[Dict[str, Tuple[int, int]]]:
+        """Revalue the open book with the prices just fetched; returns breach flags."""
+
+        from spread_pnl import revalue
+
+        try:
+            with self.db.get_connection() as conn:
+                marked = revalue(conn, prices)
+        except Exception:
+            logger.exception("Mark-to-market failed")
+            return None
+
+        pnl = float(marked["pnl"].sum())
+        breached = int(marked["breached"].sum())
+
+        BOOK_PNL.set(pnl)
+        BREACHED_SPREADS.set(breached)
+
+        logger.info("Book P&L %.2f across %d spreads, %d breached", pnl, len(marked), breached)
+
+        return breach_flags(marked)
 
 
 # ============================================================
 # Scheduler
 # ============================================================
 
-def main():
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(description="Collect spread ticker prices during market hours.")
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve Prometheus metrics on localhost:PORT/metrics (or set METRICS_PORT)",
+    )
+    parser.add_argument(
+        "--rebuild-latest",
+        action="store_true",
+        help=f"Rebuild {Config.LATEST_TABLE} from the price history and exit",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+
+    args = parse_args(argv)
 
     collector = SpreadPriceCollector()
 
+    with collector.db.get_connection() as conn:
+        conn.cursor().execute(SPREAD_LATEST_DDL)
+        conn.commit()
+
+    if args.rebuild_latest:
+        logger.info("Rebuilt %s: %d tickers", Config.LATEST_TABLE, collector.db.rebuild_latest())
+        return
+
+    import schedule
+
+    if args.metrics_port is not None:
+        start_server(args.metrics_port)
+    else:
+        start_from_env()
+
     # Run every 15 minutes
-    schedule.every(15).minutes.do(collector.run)
+    track_schedule_lag(schedule.every(15).minutes.do(collector.run), "spread_prices")
 
     logger.info("Scheduler started — EST Market Window Mode")
 
@@ -1,19 +1,23 @@
+import argparse
 import logging
-import pandas as pd
-import yfinance as yf
-from sqlalchemy import create_engine
+
+from instrumentation import count, timed
+
+# pandas, SQLAlchemy and market_data are imported where used, so
+# ``--help`` and imports stay cheap
 
 
 # ======================================================
 # Logging
 # ======================================================
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s"
-)
-
 logger = logging.getLogger("StocksHistoryLoader")
 
+SERVER = r".\SQLEXPRESS02"
+DATABASE = "Investments"
+
+START_DATE = "2026-02-09"
+END_DATE = "2026-02-13"
+
 
 # ======================================================
 # ETL Class
@@ -26,6 +30,8 @@ class StocksHistoryETL:
         self.engine = self._create_engine()
 
     def _create_engine(self):
+        from sqlalchemy import create_engine
+
         conn_str = (
             f"mssql+pyodbc://{self.server}/{self.database}"
             "?driver=ODBC+Driver+17+for+SQL+Server"
@@ -35,7 +41,10 @@ class StocksHistoryETL:
     # --------------------------------------------------
     # Get tickers
     # --------------------------------------------------
+    @timed("sql_read", component="StocksHistoryETL")
     def get_tickers(self):
+        import pandas as pd
+
         query = "SELECT tickerSymbol FROM dbo.TickerMaster"
         df = pd.read_sql(query, self.engine)
 
@@ -44,41 +53,48 @@ class StocksHistoryETL:
         logger.info(f"Fetched {len(tickers)} tickers")
         return tickers
 
+    # --------------------------------------------------
+    # Batch-download all tickers through the shared provider
+    # --------------------------------------------------
+    @timed("yahoo_fetch", component="StocksHistoryETL")
+    def prefetch_history(self, tickers, start_date, end_date):
+
+        from market_data import IncompleteDataError, get_provider
+
+        try:
+            get_provider().daily_bars(tickers, start_date, end_date)
+            return []
+
+        except IncompleteDataError as e:
+            logger.error(f"Tickers failed after retries: {e.failed_tickers}")
+            return e.failed_tickers
+
     # --------------------------------------------------
     # Download history (FIXED)
     # --------------------------------------------------
+    @timed("transform", component="StocksHistoryETL")
     def download_history(self, ticker, start_date, end_date):
 
+        import pandas as pd
+        from market_data import get_provider
+
         try:
             logger.info(f"Downloading data for {ticker}")
 
-            data = yf.download(
-                ticker,
-                start=start_date,
-                end=end_date,
-                progress=False,
-                auto_adjust=False,
-                group_by="column"
-            )
+            data = get_provider().daily_bars([ticker], start_date, end_date)
 
             if data.empty:
                 logger.warning(f"No data for {ticker}")
                 return None
 
-            # 🔥 Flatten columns if MultiIndex
-            if isinstance(data.columns, pd.MultiIndex):
-                data.columns = data.columns.get_level_values(0)
-
-            data = data.reset_index()
-
             df = pd.DataFrame({
                 "ticker": ticker,
-                "date": pd.to_datetime(data["Date"]).dt.date,
-                "open_price": data["Open"].round(2),
-                "close_price": data["Close"].round(2),
-                "high": data["High"].round(2),
-                "low": data["Low"].round(2),
-                "volume": data["Volume"]
+                "date": data["date"].dt.date,
+                "open_price": data["open"].round(2),
+                "close_price": data["close"].round(2),
+                "high": data["high"].round(2),
+                "low": data["low"].round(2),
+                "volume": data["volume"]
             })
 
             return df
@@ -90,6 +106,7 @@ class StocksHistoryETL:
     # --------------------------------------------------
     # Load to SQL Server
     # --------------------------------------------------
+    @timed("sql_write", component="StocksHistoryETL")
     def load_to_sql(self, df):
 
         df.to_sql(
@@ -100,18 +117,26 @@ class StocksHistoryETL:
             index=False
         )
 
+        count("rows_written", len(df), component="StocksHistoryETL", table="Stocks_History")
+
         logger.info(f"Inserted {len(df)} rows")
 
     # --------------------------------------------------
     # Run ETL
     # --------------------------------------------------
+    @timed("etl_run", component="StocksHistoryETL")
     def run(self, start_date, end_date):
 
         tickers = self.get_tickers()
         total_rows = 0
 
+        failed = set(self.prefetch_history(tickers, start_date, end_date))
+
         for ticker in tickers:
 
+            if ticker in failed:
+                continue
+
             df = self.download_history(ticker, start_date, end_date)
 
             if df is not None:
@@ -120,19 +145,36 @@ class StocksHistoryETL:
 
         logger.info(f"ETL completed. Total rows inserted: {total_rows}")
 
+        if failed:
+            logger.error(f"{len(failed)} tickers not loaded: {sorted(failed)}")
+
 
 # ======================================================
 # MAIN
 # ======================================================
-if __name__ == "__main__":
+def parse_args(argv=None):
 
-    SERVER = r".\SQLEXPRESS02"   
-    DATABASE = "Investments"
-    TABLE = "Stocks_History"
-    SCHEMA = "dbo"
+    parser = argparse.ArgumentParser(description="Load daily bars for every TickerMaster symbol into Stocks_History")
+    parser.add_argument("--start", default=START_DATE, help=f"first date, YYYY-MM-DD (default {START_DATE})")
+    parser.add_argument("--end", default=END_DATE, help=f"last date, YYYY-MM-DD (default {END_DATE})")
+    parser.add_argument("--server", default=SERVER)
+    parser.add_argument("--database", default=DATABASE)
 
-    START_DATE = "2026-02-09"
-    END_DATE = "2026-02-13"
+    return parser.parse_args(argv)
 
-    etl = StocksHistoryETL(SERVER, DATABASE)
-    etl.run(START_DATE, END_DATE)
+
+def main(argv=None):
+
+    args = parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(message)s"
+    )
+
+    etl = StocksHistoryETL(args.server, args.database)
+    etl.run(args.start, args.end)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,92 @@
+import argparse
+import functools
+import json
 import os
-import yfinance as yf
-import schedule
+import threading
 import time
 from datetime import datetime
-from pytz import timezone
+from typing import List
 
-from crewai import Agent, Task, Crew
-from crewai.tools import tool
+from instrumentation import count, timed
+from metrics_server import REGISTRY, SIZE_BUCKETS, CycleTracker, start_from_env, track_schedule_lag
+
+
+PRICE_FETCH_SECONDS = REGISTRY.histogram(
+    "agent_price_fetch_seconds", "Time to fetch last prices for the agent and its gate."
+)
+PRICE_FETCH_SIZE = REGISTRY.histogram(
+    "agent_price_fetch_size", "Tickers per agent last-price fetch.", buckets=SIZE_BUCKETS
+)
+
+
+def _timed_last_prices(tickers):
+
+    from market_data import get_provider
+
+    start = time.perf_counter()
+    prices = get_provider().last_prices(tickers)
+
+    PRICE_FETCH_SECONDS.observe(time.perf_counter() - start)
+    PRICE_FETCH_SIZE.observe(len(tickers))
+
+    return prices
 
 
 # =========================================================
 # 1. DEFINE TOOL (Agent Action)
 # =========================================================
 
-@tool
 def fetch_stock_price(ticker: str) -> str:
     """
     Fetches the latest mid-market price for a given ticker.
     """
-    stock = yf.Ticker(ticker)
-    price = stock.fast_info.get("last_price", "Unavailable")
+    price = _timed_last_prices([ticker]).get(ticker)
+    if price is None:
+        price = "Unavailable"
     return f"The latest price of {ticker} is {price}"
 
 
+def fetch_prices(tickers: List[str]) -> str:
+    """
+    Fetches latest prices for several tickers in one call. Returns a JSON
+    list of {ticker, price, previous_close, change_pct}; price is null
+    when unavailable.
+    """
+    import pandas as pd
+
+    from market_data import IncompleteDataError, get_provider
+
+    provider = get_provider()
+    tickers = [t.strip().upper() for t in tickers if t and t.strip()]
+
+    # Quotes and bars come from the provider's caches when recently fetched
+    prices = _timed_last_prices(tickers)
+
+    today = pd.Timestamp.today().normalize()
+    try:
+        bars = provider.daily_bars(tickers, today - pd.Timedelta(days=7), today)
+    except IncompleteDataError as e:
+        bars = e.partial
+
+    previous = (
+        bars.sort_values("date").groupby("ticker")["close"].last()
+        if not bars.empty else pd.Series(dtype="float64")
+    )
+
+    rows = []
+    for ticker in tickers:
+        price = prices.get(ticker)
+        prev = previous.get(ticker)
+        rows.append({
+            "ticker": ticker,
+            "price": price,
+            "previous_close": None if prev is None else round(float(prev), 4),
+            "change_pct": None if price is None or not prev else round((price / prev - 1) * 100, 2),
+        })
+
+    return json.dumps(rows)
+
+
 # =========================================================
 # 2. SET API KEY (Replace with your real key)
 # =========================================================
@@ -34,51 +98,184 @@ os.environ["OPENAI_API_KEY"] = "DO8RSCHGR8JNZURO"
 # 3. DEFINE AGENT
 # =========================================================
 
-stock_agent = Agent(
-    role="Portfolio Manager",
-    goal="Monitor stocks and provide updates if price shifts significantly.",
-    backstory="You are a high-frequency trading assistant focused on accuracy.",
-    tools=[fetch_stock_price],   # ✅ NOW VALID TOOL
-    verbose=True
-)
+@functools.lru_cache(maxsize=None)
+def get_agent():
+    # crewai takes seconds to import; only pay for it when a task runs
+    from crewai import Agent
+    from crewai.tools import tool
+
+    return Agent(
+        role="Portfolio Manager",
+        goal="Monitor stocks and provide updates if price shifts significantly.",
+        backstory="You are a high-frequency trading assistant focused on accuracy.",
+        tools=[tool(fetch_prices), tool(fetch_stock_price)],
+        verbose=True
+    )
 
 
 # =========================================================
-# 4. FUNCTION TO RUN DURING MARKET HOURS
+# 4. LLM BACKENDS
 # =========================================================
 
-def run_agentic_update():
-
-    est = timezone("US/Eastern")
-    now_est = datetime.now(est)
+class CrewAIBackend:
+    """
+    Warm agent runtime: the agent, task and crew are built once and reused
+    for every update; each run only interpolates a new prompt.
+    """
 
-    # Weekdays only (Mon–Fri)
-    if now_est.weekday() <= 4:
+    def __init__(self):
+        self._crew = None
+        self._lock = threading.Lock()
 
-        start_time = now_est.replace(hour=8, minute=30, second=0, microsecond=0)
-        end_time = now_est.replace(hour=16, minute=1, second=0, microsecond=0)
+    def warm(self):
 
-        if start_time <= now_est <= end_time:
+        if self._crew is None:
+            from crewai import Crew, Task
 
-            print(f"[{now_est}] Market is open. Running agentic update...")
+            stock_agent = get_agent()
 
             task = Task(
-                description=(
-                    "Fetch the current price of AAPL using the tool "
-                    "and summarize the market status."
-                ),
-                expected_output="A brief update on the stock price and trend.",
+                description="{prompt}",
+                expected_output="A brief update per ticker on the price, trend and spread risk.",
                 agent=stock_agent
             )
 
-            crew = Crew(
+            self._crew = Crew(
                 agents=[stock_agent],
                 tasks=[task],
                 verbose=True
             )
 
-            result = crew.kickoff()
-            print(f"\n✅ Agent Output:\n{result}\n")
+        return self
+
+    def run(self, prompt: str):
+
+        # A crew is not safe to kick off concurrently
+        with self._lock:
+            return self.warm()._crew.kickoff(inputs={"prompt": prompt})
+
+
+class StubBackend:
+    """Offline stand-in for the LLM: records prompts and echoes the flagged tickers."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def warm(self):
+        return self
+
+    def run(self, prompt: str) -> str:
+
+        self.prompts.append(prompt)
+        flagged = [line[2:] for line in prompt.splitlines() if line.startswith("- ")]
+
+        return f"[stub] {len(flagged)} ticker(s) need attention:\n" + "\n".join(flagged)
+
+
+BACKENDS = {
+    "crewai": CrewAIBackend,
+    "stub": StubBackend,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_backend(name=None):
+    """``AGENT_LLM_BACKEND=stub`` runs the gate without a model or API key."""
+    return BACKENDS[name or os.environ.get("AGENT_LLM_BACKEND", "crewai")]()
+
+
+# =========================================================
+# 5. GATED UPDATE
+# =========================================================
+
+def _open_strikes():
+    """Strikes of open spreads, or None if the database is unreachable."""
+
+    import breach_gate
+
+    try:
+        from spread_price_collector import DatabaseManager
+
+        with DatabaseManager().get_connection() as conn:
+            return breach_gate.load_strikes(conn)
+    except Exception as exc:
+        print(f"⚠️ Open spreads unavailable, gating on price moves only: {exc}")
+        return None
+
+
+def gated_update(backend=None):
+    """
+    Check the watchlist against the breach gate and invoke the agent once
+    for all triggered tickers. Returns the agent output, or None if
+    nothing crossed a threshold.
+    """
+
+    import breach_gate
+
+    strikes = _open_strikes()
+    tickers = breach_gate.watchlist(strikes)
+
+    prices = _timed_last_prices(tickers)
+
+    references = breach_gate.load_state()
+    gate = breach_gate.evaluate(prices, references, strikes, was_near=breach_gate.load_near())
+
+    triggered = gate[gate["triggered"]]
+    quiet = gate[~gate["triggered"]]
+
+    # First sighting of a ticker sets its reference; existing references stay
+    # put until the ticker triggers, so slow drift still adds up to a move.
+    # Band flags of quiet tickers are current; triggered ones wait for the agent
+    seeded = {t: p for t, p in prices.items() if p is not None and t not in references}
+    breach_gate.save_state(seeded, near=quiet["near_strike"].to_dict())
+
+    if triggered.empty:
+        count("agent_skipped", component="StockAgent")
+        print(f"No thresholds crossed across {len(gate)} tickers; agent not invoked.")
+        return None
+
+    count("agent_invocations", component="StockAgent", tickers=len(triggered))
+
+    result = (backend or get_backend()).run(breach_gate.build_prompt(triggered))
+    print(f"\n✅ Agent Output:\n{result}\n")
+
+    # Only after the agent has seen them; a failed run retries next check
+    breach_gate.save_state(
+        {ticker: prices[ticker] for ticker in triggered.index},
+        near=triggered["near_strike"].to_dict(),
+    )
+
+    return result
+
+
+# =========================================================
+# 6. FUNCTION TO RUN DURING MARKET HOURS
+# =========================================================
+
+@timed("collector_cycle", component="StockAgent")
+def run_agentic_update():
+
+    with CycleTracker("agentic_update"):
+        _agentic_update()
+
+
+def _agentic_update():
+
+    from pytz import timezone
+
+    est = timezone("US/Eastern")
+    now_est = datetime.now(est)
+
+    # Weekdays only (Mon–Fri)
+    if now_est.weekday() <= 4:
+
+        start_time = now_est.replace(hour=8, minute=30, second=0, microsecond=0)
+        end_time = now_est.replace(hour=16, minute=1, second=0, microsecond=0)
+
+        if start_time <= now_est <= end_time:
+
+            print(f"[{now_est}] Market is open. Checking watchlist...")
+            gated_update()
 
         else:
             print(f"[{now_est}] Outside market hours (8:30am–4:01pm EST).")
@@ -88,13 +285,49 @@ def run_agentic_update():
 
 
 # =========================================================
-# 5. SCHEDULE TASK
+# 7. SCHEDULE TASK
 # =========================================================
 
-schedule.every(15).minutes.do(run_agentic_update)
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(description="Run the gated portfolio agent every 15 minutes.")
+    parser.add_argument("--once", action="store_true", help="Run one gated check now, ignoring market hours")
+    parser.add_argument(
+        "--backend",
+        choices=sorted(BACKENDS),
+        default=None,
+        help="LLM backend (default: AGENT_LLM_BACKEND or crewai)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+
+    args = parse_args(argv)
+
+    if args.backend:
+        os.environ["AGENT_LLM_BACKEND"] = args.backend
+
+    if args.once:
+        gated_update()
+        return
+
+    import schedule
+
+    # Optional Prometheus endpoint: METRICS_PORT=9109
+    start_from_env()
+
+    track_schedule_lag(schedule.every(15).minutes.do(run_agentic_update), "agentic_update")
+
+    # Pay for the crewai import and crew construction before the first window
+    get_backend().warm()
+
+    print("🚀 Stock Manager Agent is active. Waiting for scheduled window...")
+
+    while True:
+        schedule.run_pending()
+        time.sleep(60)
 
-print("🚀 Stock Manager Agent is active. Waiting for scheduled window...")
 
-while True:
-    schedule.run_pending()
-    time.sleep(60)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,103 @@
+
+import pandas as pd
 import streamlit as st
-import pyodbc
 from datetime import date
 
+from contracts_db import (
+    CONTRACT_COLUMNS,
+    CONTRACT_TYPES,
+    OPTION_TYPES,
+    ContractFilters,
+    create_pooled_engine,
+    fetch_page,
+    insert_contracts,
+    read_contracts,
+    validate_contracts,
+)
+from payoff import book_payoff, payoff_summary, spread_payoff
+from ticker_index import TickerIndex
+
+PAGE_SIZE = 50
+
 # ===============================
 # SQL Server Connection
 # ===============================
-conn = pyodbc.connect(
-    "DRIVER={ODBC Driver 17 for SQL Server};"
-    "SERVER=.\\SQLEXPRESS02;"
-    "DATABASE=INVESTMENTS;"
-    "Trusted_Connection=yes;"
-)
+@st.cache_resource
+def get_engine():
+    # One pool per server process, shared by every session and rerun
+    return create_pooled_engine()
+
+
+@st.cache_resource
+def get_ticker_index():
+    # Built once from TickerMaster; refreshed below when its checksum changes
+    return TickerIndex.load(get_engine())
+
+
+def current_ticker_index():
+
+    try:
+        index = get_ticker_index()
+    except Exception:
+        # Failures are not cached, so the next rerun tries the load again
+        return None
+
+    try:
+        index.refresh(get_engine())
+    except Exception:
+        pass
+
+    return index
+
+
+def pick_ticker(symbol):
+    st.session_state.form_ticker = symbol
+
+
+# Widgets rerun the whole script on every edit; the browse query is cached per
+# (filters, cursor) so the live preview does not hit SQL each time
+@st.cache_data(ttl=30)
+def load_page(filters, before_id):
+    return fetch_page(get_engine(), filters, before_id=before_id, page_size=PAGE_SIZE)
+
+
+@st.cache_data(ttl=60)
+def load_book():
+    # Open spreads and Spread_Latest prices for the portfolio curve
+    from spread_pnl import load_latest_prices, load_open_spreads
 
-cursor = conn.cursor()
+    conn = get_engine().raw_connection()
+    try:
+        return load_open_spreads(conn), load_latest_prices(conn)
+    finally:
+        conn.close()
+
+
+FORM_DEFAULTS = {
+    "form_ticker": "",
+    "form_contract_type": CONTRACT_TYPES[0],
+    "form_option_type": OPTION_TYPES[0],
+    "form_contract_price": 0.0,
+    "form_upper_limit": 0.0,
+    "form_lower_limit": 0.0,
+}
+
+
+def clear_form():
+    st.session_state.update(FORM_DEFAULTS)
 
 # ===============================
 # Title
 # ===============================
 st.title("Options Contract Entry")
 
+ticker_index = current_ticker_index()
+
 # ===============================
 # Form
 # ===============================
-with st.form("contract_form"):
+# Plain widgets rather than st.form, so the payoff preview follows every edit
+with st.container(border=True):
 
     # ---- Row 1 ----
     col1, col2, col3 = st.columns(3)
@@ -32,12 +107,21 @@ with st.form("contract_form"):
         value=date.today()
     )
 
-    ticker = col2.text_input("Ticker")
+    ticker = col2.text_input("Ticker", key="form_ticker")
+
+    if ticker_index is not None and ticker.strip() and ticker_index.resolve(ticker) is None:
+        suggestions = ticker_index.suggest(ticker, limit=6)
+
+        if suggestions:
+            for slot, symbol in zip(col2.columns(len(suggestions)), suggestions):
+                slot.button(symbol, key=f"suggest_{symbol}", on_click=pick_ticker, args=(symbol,))
+        else:
+            col2.caption("Not in TickerMaster")
 
     contract_type = col3.selectbox(
         "Contract Type",
-        ["Credit", "Debit"],
-        index=0
+        CONTRACT_TYPES,
+        key="form_contract_type"
     )
 
     st.divider()
@@ -47,67 +131,113 @@ with st.form("contract_form"):
 
     option_type = col4.selectbox(
         "Option Type",
-        ["PUT", "CALL"],
-        index=0
+        OPTION_TYPES,
+        key="form_option_type"
     )
 
     contract_price = col5.number_input(
         "Contract Price",
         min_value=0.0,
-        format="%.2f"
+        format="%.2f",
+        key="form_contract_price"
     )
 
     # Upper + Lower stacked
     upper_limit = col6.number_input(
         "Upper Limit",
         min_value=0.0,
-        format="%.2f"
+        format="%.2f",
+        key="form_upper_limit"
     )
 
     lower_limit = col6.number_input(
         "Lower Limit",
         min_value=0.0,
-        format="%.2f"
+        format="%.2f",
+        key="form_lower_limit"
     )
 
     st.divider()
 
     col_submit, col_cancel = st.columns(2)
 
-    submit = col_submit.form_submit_button("Submit")
-    cancel = col_cancel.form_submit_button("Cancel")
+    submit = col_submit.button("Submit")
+    cancel = col_cancel.button("Cancel", on_click=clear_form)
+
+# ===============================
+# Payoff Preview
+# ===============================
+if upper_limit > lower_limit:
+
+    curve = spread_payoff(contract_type, option_type, contract_price, lower_limit, upper_limit)
+    summary = payoff_summary(curve)
+
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Max profit / contract", f"{summary['max_profit']:,.2f}")
+    m2.metric("Max loss / contract", f"{summary['max_loss']:,.2f}")
+    m3.metric("Breakeven", ", ".join(f"{b:,.2f}" for b in summary["breakevens"]) or "—")
+
+    st.line_chart(curve)
+
+else:
+    st.caption("Enter an upper limit above the lower limit to preview the payoff at expiry.")
+
+with st.expander("Open book payoff at expiry"):
+
+    try:
+        spreads, prices = load_book()
+    except Exception as e:
+        st.error(f"Open book unavailable: {e}")
+    else:
+        book = book_payoff(spreads, prices)
+
+        symbol = ticker.strip().upper()
+        if upper_limit > lower_limit and prices.get(symbol):
+            # The contract being entered, as one more position in the book
+            draft = pd.DataFrame([{
+                "ticker": symbol,
+                "option_type": option_type,
+                "tran_type": contract_type,
+                "option_price": contract_price,
+                "strike_price_lower": lower_limit,
+                "strike_price_upper": upper_limit,
+                "option_quantity": 1,
+            }])
+            book["With this contract"] = book["P&L"] + book_payoff(draft, prices)["P&L"]
+
+        st.line_chart(book)
+        st.caption(f"{len(spreads)} open spreads; every underlying moved by the same percentage.")
 
 # ===============================
 # Submit Logic
 # ===============================
 if submit:
 
+    symbol = ticker.strip().upper()
+
+    if ticker_index is not None and symbol:
+        symbol = ticker_index.resolve(symbol) or ""
+
     if ticker.strip() == "":
         st.error("Ticker cannot be empty")
 
+    elif symbol == "":
+        st.error(f"Unknown ticker {ticker.strip().upper()}; pick one from TickerMaster")
+
     else:
-        cursor.execute("""
-            INSERT INTO contracts (
-                contract_date,
-                ticker,
-                contract_type,
-                option_type,
-                contract_price,
-                upper_limit,
-                lower_limit
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-        contract_date,
-        ticker.upper(),
-        contract_type,
-        option_type,
-        contract_price,
-        upper_limit,
-        lower_limit
-        )
-
-        conn.commit()
+        insert_contracts(get_engine(), [{
+            "contract_date": contract_date,
+            "ticker": symbol,
+            "contract_type": contract_type,
+            "option_type": option_type,
+            "contract_price": contract_price,
+            "upper_limit": upper_limit,
+            "lower_limit": lower_limit,
+        }])
+
+        # Show the new contract on the first page
+        st.session_state.page_stack = []
+        load_page.clear()
 
         st.success("Contract saved successfully!")
 
@@ -118,15 +248,99 @@ if cancel:
     st.warning("Form cleared")
 
 # ===============================
-# Display Saved Data
+# Bulk Import
+# ===============================
+with st.expander("Bulk import"):
+
+    st.caption(
+        "Upload a CSV/XLSX or paste comma/tab-separated rows. Columns: "
+        + ", ".join(CONTRACT_COLUMNS)
+        + " (header optional when pasting; date defaults to today when absent)."
+    )
+
+    tab_upload, tab_paste = st.tabs(["Upload", "Paste"])
+
+    # Bumped after an import so the uploader and text area come back empty
+    import_round = st.session_state.setdefault("import_round", 0)
+    imported_batches = st.session_state.setdefault("imported_batches", set())
+
+    uploaded = tab_upload.file_uploader("Contracts file", type=["csv", "xlsx"], key=f"bulk_file_{import_round}")
+    pasted = tab_paste.text_area("Rows", height=150, key=f"bulk_rows_{import_round}")
+
+    if uploaded is not None or pasted.strip():
+
+        try:
+            source = read_contracts(uploaded, uploaded.name) if uploaded is not None else read_contracts(pasted)
+            valid, rejected = validate_contracts(
+                source,
+                known_tickers=ticker_index.symbols if ticker_index is not None else None,
+            )
+
+        except Exception as e:
+            st.error(f"Could not read rows: {e}")
+
+        else:
+            st.write(f"{len(valid)} valid, {len(rejected)} with errors")
+
+            if len(rejected):
+                st.dataframe(rejected, hide_index=True)
+
+            if len(valid):
+                st.dataframe(valid, hide_index=True)
+
+                batch = int(pd.util.hash_pandas_object(valid, index=False).sum())
+
+                if batch in imported_batches:
+                    st.info("These rows were already imported in this session")
+
+                elif st.button(f"Import {len(valid)} contracts"):
+                    inserted = insert_contracts(get_engine(), valid.to_dict("records"))
+                    imported_batches.add(batch)
+                    st.session_state.import_round += 1
+                    st.session_state.page_stack = []
+                    load_page.clear()
+                    st.success(f"Imported {inserted} contracts in one transaction")
+
+# ===============================
+# Browse Saved Data
 # ===============================
 st.subheader("Saved Contracts")
 
-cursor.execute("SELECT TOP 50 * FROM contracts ORDER BY id DESC")
-rows = cursor.fetchall()
+fcol1, fcol2, fcol3 = st.columns(3)
 
-if rows:
-    data = [list(row) for row in rows]
-    st.dataframe(data)
+filter_ticker = fcol1.text_input("Ticker starts with", key="filter_ticker")
+filter_dates = fcol2.date_input("Contract dates", value=(), key="filter_dates")
+filter_option = fcol3.selectbox("Option type", ["All", *OPTION_TYPES], key="filter_option")
+
+filters = ContractFilters(
+    ticker=filter_ticker or None,
+    start=filter_dates[0] if len(filter_dates) > 0 else None,
+    end=filter_dates[1] if len(filter_dates) > 1 else None,
+    option_type=None if filter_option == "All" else filter_option,
+)
+
+# Keyset cursors of the pages above the current one; reset when filters change
+if st.session_state.get("page_filters") != filters:
+    st.session_state.page_filters = filters
+    st.session_state.page_stack = []
+
+page_stack = st.session_state.setdefault("page_stack", [])
+
+page = load_page(filters, page_stack[-1] if page_stack else None)
+
+if page.table.num_rows:
+    st.dataframe(page.table, hide_index=True)
 else:
-    st.info("No records found")
\ No newline at end of file
+    st.info("No records found")
+
+pcol1, pcol2, pcol3 = st.columns([1, 1, 4])
+
+if pcol1.button("← Newer", disabled=not page_stack):
+    page_stack.pop()
+    st.rerun()
+
+if pcol2.button("Older →", disabled=not page.has_more):
+    page_stack.append(page.last_id)
+    st.rerun()
+
+pcol3.caption(f"Page {len(page_stack) + 1}")
@@ -0,0 +1,123 @@
+"""gated_update against the offline market-data backend and the stub LLM."""
+
+import pandas as pd
+import pytest
+
+import breach_gate
+import stocks_history_ai
+from market_data import FakeMarketDataProvider, get_provider, set_provider
+
+
+DAY = pd.Timestamp("2026-03-02")
+
+
+class FailingBackend:
+
+    def run(self, prompt):
+        raise RuntimeError("backend down")
+
+
+@pytest.fixture
+def gate(tmp_path, monkeypatch):
+    """Watchlist of AAPL, a private state file and strikes set per test."""
+
+    monkeypatch.setenv("AGENT_GATE_STATE", str(tmp_path / "gate.json"))
+    monkeypatch.setenv("AGENT_WATCHLIST", "AAPL")
+    monkeypatch.setenv("AGENT_MOVE_PCT", "2.0")
+    monkeypatch.setenv("AGENT_PROXIMITY_PCT", "1.0")
+
+    strikes = {"levels": None}
+    monkeypatch.setattr(stocks_history_ai, "_open_strikes", lambda: strikes["levels"])
+
+    def at(day, strike_offset=None):
+        """Quote AAPL as of ``day``; optionally place a strike ``strike_offset`` away (fraction)."""
+
+        set_provider(FakeMarketDataProvider(today=day))
+        price = get_provider().last_price("AAPL")
+        strikes["levels"] = (
+            None if strike_offset is None
+            else pd.DataFrame({"ticker": ["AAPL"], "strike": [price * (1 + strike_offset)]})
+        )
+        return price
+
+    yield at
+    set_provider(None)
+
+
+def run(backend):
+    before = len(backend.prompts)
+    stocks_history_ai.gated_update(backend)
+    return len(backend.prompts) - before
+
+
+def test_first_sighting_only_seeds_the_reference(gate):
+
+    backend = stocks_history_ai.StubBackend()
+    price = gate(DAY)
+
+    assert run(backend) == 0
+    assert breach_gate.load_state() == {"AAPL": price}
+
+
+def test_proximity_triggers_on_entering_the_band_only(gate):
+
+    backend = stocks_history_ai.StubBackend()
+
+    gate(DAY, strike_offset=0.05)
+    assert run(backend) == 0          # seeded, far from the strike
+
+    gate(DAY, strike_offset=0.005)
+    assert run(backend) == 1          # entered the band
+    assert "AAPL" in backend.prompts[-1]
+
+    assert run(backend) == 0          # still inside: no new kickoff
+    assert run(backend) == 0
+
+    gate(DAY, strike_offset=0.05)
+    assert run(backend) == 0          # left the band
+
+    gate(DAY, strike_offset=-0.005)
+    assert run(backend) == 1          # entered again
+
+
+def test_move_triggers_against_the_reference_price(gate):
+
+    backend = stocks_history_ai.StubBackend()
+    first = gate(DAY)
+    assert run(backend) == 0
+
+    # Walk forward until the fake path has moved past the threshold
+    day = DAY
+    for _ in range(60):
+        day += pd.offsets.BDay()
+        price = gate(day)
+        moved = abs(price / first - 1) * 100 >= 2.0
+
+        assert run(backend) == int(moved)
+        if moved:
+            assert breach_gate.load_state()["AAPL"] == price
+            break
+    else:
+        pytest.fail("fake price never moved 2% in 60 days")
+
+
+def test_env_overrides_after_import_apply(gate, monkeypatch):
+
+    backend = stocks_history_ai.StubBackend()
+    gate(DAY, strike_offset=0.05)
+    assert run(backend) == 0
+
+    monkeypatch.setenv("AGENT_PROXIMITY_PCT", "10")
+    assert run(backend) == 1
+
+
+def test_failed_run_keeps_the_breach_for_the_next_check(gate):
+
+    gate(DAY, strike_offset=0.05)
+    assert run(stocks_history_ai.StubBackend()) == 0
+
+    gate(DAY, strike_offset=0.005)
+    with pytest.raises(RuntimeError):
+        stocks_history_ai.gated_update(FailingBackend())
+
+    assert run(stocks_history_ai.StubBackend()) == 1
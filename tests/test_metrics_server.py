@@ -0,0 +1,83 @@
+"""The /metrics endpoint served on localhost, and scheduler lag tracking."""
+
+from datetime import datetime, timedelta
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+import schedule
+
+from metrics_server import MetricsRegistry, start_server, track_schedule_lag
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+@pytest.fixture
+def server(registry):
+
+    server = start_server(0, registry=registry)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def scrape(server, path="/metrics"):
+
+    host, port = server.server_address[:2]
+    with urlopen(f"http://{host}:{port}{path}", timeout=5) as response:
+        assert response.headers["Content-Type"].startswith("text/plain")
+        return response.read().decode("utf-8").splitlines()
+
+
+def test_metrics_endpoint_renders_all_metric_types(registry, server):
+
+    registry.counter("rows_total", "Rows written.").inc(3, table="prices")
+    registry.gauge("cycle_running", "1 while running.").set(1, job="spread_prices")
+    latency = registry.histogram("fetch_seconds", "Fetch latency.", buckets=(0.1, 1.0))
+    latency.observe(0.05, source="yahoo")
+    latency.observe(0.5, source="yahoo")
+
+    lines = scrape(server)
+
+    assert "# TYPE rows_total counter" in lines
+    assert 'rows_total{table="prices"} 3.0' in lines
+
+    assert "# TYPE cycle_running gauge" in lines
+    assert 'cycle_running{job="spread_prices"} 1.0' in lines
+
+    assert "# TYPE fetch_seconds histogram" in lines
+    assert 'fetch_seconds_bucket{source="yahoo",le="0.1"} 1.0' in lines
+    assert 'fetch_seconds_bucket{source="yahoo",le="1.0"} 2.0' in lines
+    assert 'fetch_seconds_bucket{source="yahoo",le="+Inf"} 2.0' in lines
+    assert 'fetch_seconds_sum{source="yahoo"} 0.55' in lines
+    assert 'fetch_seconds_count{source="yahoo"} 2.0' in lines
+
+
+def test_metrics_endpoint_rejects_other_paths(server):
+
+    with pytest.raises(HTTPError) as error:
+        scrape(server, "/")
+
+    assert error.value.code == 404
+
+
+def test_schedule_lag_skips_overnight_gap(registry):
+
+    runs = []
+    job = track_schedule_lag(schedule.Scheduler().every(15).minutes.do(runs.append, 1), "collector", registry)
+
+    # First run of the morning: next_run was planned the previous afternoon
+    job.next_run = datetime.now() - timedelta(hours=16)
+    job.job_func()
+
+    assert runs == [1]
+    assert not [l for l in registry.render().splitlines() if l.startswith("scheduler_lag_seconds_count")]
+
+    job.next_run = datetime.now() - timedelta(seconds=30)
+    job.job_func()
+
+    (count,) = [l for l in registry.render().splitlines() if l.startswith("scheduler_lag_seconds_count")]
+    assert count == 'scheduler_lag_seconds_count{job="collector"} 1.0'
@@ -0,0 +1,159 @@
+"""
+Ticker Prefix Index
+-------------------
+In-memory index of ``dbo.TickerMaster`` symbols for autocomplete and
+validation. Symbols are kept in a sorted list, so a prefix lookup is one
+``bisect`` plus a short scan, a few microseconds for thousands of symbols.
+
+    index = TickerIndex.load(engine)
+    index.suggest("BR")          # ['BR', 'BRK-B', 'BRO', ...]
+    index.resolve("brk.b")       # 'BRK-B' (dot and dash forms both accepted)
+    index.refresh(engine)        # cheap checksum; reloads only on change
+
+The list is replaced, never mutated, so readers on other threads always
+see a complete snapshot without locking.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Iterable, List, Optional
+
+from instrumentation import timed
+
+
+logger = logging.getLogger("TickerIndex")
+
+SYMBOLS_QUERY = "SELECT tickerSymbol FROM dbo.TickerMaster"
+
+# Changes when any symbol is added, removed or renamed
+SIGNATURE_QUERY = "SELECT COUNT(*), CHECKSUM_AGG(CHECKSUM(tickerSymbol)) FROM dbo.TickerMaster"
+
+REFRESH_SECONDS = 300
+
+# Above this many changed symbols, re-sorting beats inserting one by one
+INCREMENTAL_LIMIT = 64
+
+
+def normalize(symbol: str) -> str:
+    """Upper case, Yahoo form (``BRK.B`` → ``BRK-B``), as the loaders use."""
+    return str(symbol).strip().upper().replace(".", "-")
+
+
+class TickerIndex:
+
+    def __init__(self, symbols: Iterable[str] = ()):
+        self._symbols: List[str] = sorted({normalize(s) for s in symbols if s and str(s).strip()})
+        self._signature = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return self.resolve(symbol) is not None
+
+    @property
+    def symbols(self) -> List[str]:
+        """Sorted snapshot of all symbols."""
+        return self._symbols
+
+    def resolve(self, symbol: str) -> Optional[str]:
+        """Canonical symbol, or None if unknown."""
+
+        symbols = self._symbols
+        key = normalize(symbol)
+        i = bisect_left(symbols, key)
+
+        return key if i < len(symbols) and symbols[i] == key else None
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """Up to ``limit`` symbols starting with ``prefix``, in order."""
+
+        symbols = self._symbols
+        key = normalize(prefix)
+
+        if not key:
+            return []
+
+        out = []
+        i = bisect_left(symbols, key)
+
+        while i < len(symbols) and len(out) < limit and symbols[i].startswith(key):
+            out.append(symbols[i])
+            i += 1
+
+        return out
+
+    # ------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------
+    def update(self, symbols: Iterable[str]) -> int:
+        """Replace the contents with ``symbols``; returns the number of changes."""
+
+        new = {normalize(s) for s in symbols if s and str(s).strip()}
+
+        with self._lock:
+            current = self._symbols
+            old = set(current)
+
+            added, removed = new - old, old - new
+            changes = len(added) + len(removed)
+
+            if not changes:
+                return 0
+
+            if changes > INCREMENTAL_LIMIT:
+                updated = sorted(new)
+            else:
+                updated = [s for s in current if s not in removed] if removed else list(current)
+                for symbol in added:
+                    insort(updated, symbol)
+
+            self._symbols = updated
+
+        logger.info("Ticker index: +%d / -%d symbols, %d total", len(added), len(removed), len(updated))
+        return changes
+
+    @classmethod
+    def load(cls, engine) -> "TickerIndex":
+
+        index = cls()
+        index.refresh(engine, force=True)
+        return index
+
+    def refresh(self, engine, force: bool = False) -> bool:
+        """
+        Reload from TickerMaster if its checksum changed. Without
+        ``force``, the database is checked at most every REFRESH_SECONDS.
+        """
+
+        now = time.monotonic()
+        if not force and now - self._checked < REFRESH_SECONDS:
+            return False
+
+        self._checked = now
+        return self._reload(engine, force)
+
+    @timed("sql_read", component="TickerIndex")
+    def _reload(self, engine, force: bool) -> bool:
+
+        from sqlalchemy import text
+
+        with engine.connect() as conn:
+            signature = tuple(conn.execute(text(SIGNATURE_QUERY)).one())
+
+            if not force and signature == self._signature:
+                return False
+
+            symbols = conn.execute(text(SYMBOLS_QUERY)).scalars().all()
+
+        self._signature = signature
+        return self.update(symbols) > 0
@@ -2,20 +2,27 @@
 Enterprise Voice-to-Text System
 --------------------------------
 Real-time speech transcription using Whisper
-Saves text line-by-line into Excel
+Capture runs continuously; a voice-activity detector drops silence and
+cuts speech into segments at pauses, transcribed while capture goes on
+Appends each line to a JSONL transcript log; the Excel workbook is
+exported from it periodically and at shutdown
 Audio is NOT stored permanently
 """
 
-import whisper
-import sounddevice as sd
 import numpy as np
-import pandas as pd
-import scipy.io.wavfile as wav
 from datetime import datetime
 from pathlib import Path
+import argparse
+import json
 import logging
+import queue
 import tempfile
+import threading
 import os
+from collections import deque
+
+# whisper, sounddevice, scipy and pandas are imported where used, so
+# --help and imports stay cheap
 
 
 # ============================================================
@@ -28,43 +35,304 @@ CHANNELS = 1
 RECORD_SECONDS = 5
 OUTPUT_FILE = r"C:\Users\user\voice_transcription_log.xlsx"
 
+# Transcripts go to OUTPUT_FILE with a .jsonl suffix; the workbook is exported from it
+COMPACT_SECONDS = 300
+
+# Captured audio held for the transcriber; older audio is dropped if it falls further behind
+BUFFER_SECONDS = 60
+# Recognized lines waiting for the log writer
+TEXT_QUEUE_SIZE = 100
+
+# Voice activity detection: transcribe speech segments cut at pauses instead of
+# fixed RECORD_SECONDS windows (RECORD_SECONDS applies only with VAD_ENABLED = False)
+VAD_ENABLED = True
+VAD_FRAME_MS = 30
+VAD_BLOCK_FRAMES = 10               # frames read from the ring buffer at a time
+VAD_PAUSE_MS = 600                  # silence that ends a segment
+VAD_PADDING_MS = 200                # silence kept before and after each segment
+VAD_MIN_SPEECH_MS = 250             # shorter bursts (clicks, coughs) are dropped
+VAD_MAX_SEGMENT_SECONDS = 25        # below Whisper's 30 s window
+VAD_THRESHOLD_RATIO = 3.0           # speech RMS relative to the noise floor
+VAD_MIN_RMS = 300                   # int16 units; nothing quieter counts as speech
+
 
 # ============================================================
 # Logging Setup
 # ============================================================
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s",
-)
-
 logger = logging.getLogger("EnterpriseVoiceSystem")
 
 
+# ============================================================
+# Ring Buffer
+# ============================================================
+
+class RingBuffer:
+    """
+    Fixed-size sample buffer between the capture callback and the
+    transcription worker. Writes never block: if the reader falls more than
+    ``capacity`` frames behind, the oldest unread audio is dropped.
+    """
+
+    def __init__(self, capacity, channels, dtype="int16"):
+        self.capacity = capacity
+        self._buf = np.zeros((capacity, channels), dtype=dtype)
+        self._written = 0
+        self._read = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def write(self, frames):
+
+        frames = frames[-self.capacity:]
+        n = len(frames)
+
+        with self._cond:
+            start = self._written % self.capacity
+            first = min(n, self.capacity - start)
+            self._buf[start:start + first] = frames[:first]
+            self._buf[:n - first] = frames[first:]
+
+            self._written += n
+
+            overflow = self._written - self._read - self.capacity
+            if overflow > 0:
+                self._read += overflow
+                self.dropped += overflow
+
+            self._cond.notify()
+
+    def read(self, n):
+        """
+        Next ``n`` frames, blocking until they are available. After close,
+        returns what is left (possibly shorter), then None.
+        """
+
+        with self._cond:
+            self._cond.wait_for(lambda: self._written - self._read >= n or self._closed)
+
+            n = min(n, self._written - self._read)
+            if n == 0:
+                return None
+
+            idx = (self._read + np.arange(n)) % self.capacity
+            self._read += n
+
+            return self._buf[idx]
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
 # ============================================================
 # Audio Recorder Class
 # ============================================================
 
 class AudioRecorder:
+    """
+    Captures continuously from an InputStream into a RingBuffer, so audio
+    keeps arriving while earlier chunks are transcribed.
+    """
 
-    def __init__(self, sample_rate, channels, duration):
+    def __init__(self, sample_rate, channels, duration, buffer_seconds=BUFFER_SECONDS):
         self.sample_rate = sample_rate
         self.channels = channels
         self.duration = duration
 
-    def record(self):
-        logger.info("Recording audio...")
+        self.ring = RingBuffer(int(buffer_seconds * sample_rate), channels)
+        self._stream = None
+
+    def _callback(self, indata, frames, time_info, status):
+        # Runs on the audio thread: copy into the ring and return
+        if status:
+            logger.warning(f"Audio input: {status}")
+        self.ring.write(indata)
+
+    def start(self):
 
-        audio = sd.rec(
-            int(self.duration * self.sample_rate),
+        import sounddevice as sd
+
+        self._stream = sd.InputStream(
             samplerate=self.sample_rate,
             channels=self.channels,
             dtype="int16",
+            callback=self._callback,
         )
+        self._stream.start()
+
+        logger.info("Recording audio...")
+
+    def stop(self):
+
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+        self.ring.close()
+
+    def read(self, frames):
+        """Next ``frames`` captured frames; None once stopped and drained."""
+
+        dropped = self.ring.dropped
+        audio = self.ring.read(frames)
+
+        if self.ring.dropped > dropped:
+            logger.warning(f"Transcription fell behind; dropped {(self.ring.dropped - dropped) / self.sample_rate:.1f}s of audio")
 
-        sd.wait()
         return audio
 
+    def record(self):
+        """Next ``duration`` seconds of captured audio; None once stopped and drained."""
+        return self.read(int(self.duration * self.sample_rate))
+
+    def chunks(self):
+        """Fixed ``duration`` windows until capture stops and the buffer is drained."""
+
+        while True:
+            audio = self.record()
+            if audio is None:
+                return
+            yield audio
+
+
+# ============================================================
+# Voice Activity Detector Class
+# ============================================================
+
+class VoiceActivityDetector:
+    """
+    Energy-based segmenter between AudioRecorder and SpeechTranscriber.
+    A frame is speech when its RMS exceeds an adaptive noise floor by
+    ``threshold_ratio``. A segment ends after ``pause_ms`` of silence, so
+    cuts fall between words, and segments with less than
+    ``min_speech_ms`` of speech are discarded. Segments that run past
+    ``max_segment_seconds`` are cut at the quietest frame of their last
+    second.
+    """
+
+    def __init__(
+        self,
+        recorder,
+        frame_ms=VAD_FRAME_MS,
+        pause_ms=VAD_PAUSE_MS,
+        min_speech_ms=VAD_MIN_SPEECH_MS,
+        max_segment_seconds=VAD_MAX_SEGMENT_SECONDS,
+        threshold_ratio=VAD_THRESHOLD_RATIO,
+        min_rms=VAD_MIN_RMS,
+    ):
+        self.recorder = recorder
+        self.frame = int(recorder.sample_rate * frame_ms / 1000)
+
+        self.pause_frames = max(1, pause_ms // frame_ms)
+        self.padding_frames = max(1, VAD_PADDING_MS // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_frames = int(max_segment_seconds * 1000 // frame_ms)
+        self.cut_window = max(1, 1000 // frame_ms)
+
+        self.threshold_ratio = threshold_ratio
+        self.min_rms = min_rms
+        self.noise_floor = min_rms / threshold_ratio
+
+        self.captured_frames = 0
+        self.passed_frames = 0
+
+    def _is_speech(self, rms):
+
+        speech = rms > max(self.min_rms, self.noise_floor * self.threshold_ratio)
+
+        # Floor follows quiet frames quickly and loud ones very slowly, so
+        # a steady noise source is learned even if it starts out "speech"
+        if rms < self.noise_floor:
+            self.noise_floor = 0.5 * (self.noise_floor + rms)
+        else:
+            self.noise_floor += (0.002 if speech else 0.05) * (rms - self.noise_floor)
+
+        return speech
+
+    def _emit(self, frames, flags):
+
+        if sum(flags) < self.min_speech_frames:
+            return None
+
+        self.passed_frames += len(frames)
+        return np.concatenate(frames)
+
+    def segments(self):
+        """Yield speech segments (int16, like AudioRecorder output) until capture stops."""
+
+        frames, flags = [], []
+        padding = deque(maxlen=self.padding_frames)
+        silent = 0
+
+        while True:
+            block = self.recorder.read(self.frame * VAD_BLOCK_FRAMES)
+            if block is None:
+                break
+
+            usable = len(block) - len(block) % self.frame
+            if usable == 0:
+                continue
+
+            framed = block[:usable].reshape(-1, self.frame, block.shape[1])
+            samples = framed.astype(np.float32)
+            energies = np.sqrt((samples * samples).mean(axis=(1, 2)))
+
+            for frame, rms in zip(framed, energies):
+                self.captured_frames += 1
+                speech = self._is_speech(rms)
+
+                if not frames:
+                    if speech:
+                        # Start with a little lead-in so the first syllable is not clipped
+                        frames, flags = [*padding, frame], [False] * len(padding) + [True]
+                        padding.clear()
+                        silent = 0
+                    else:
+                        padding.append(frame)
+                    continue
+
+                frames.append(frame)
+                flags.append(speech)
+                silent = 0 if speech else silent + 1
+
+                if silent >= self.pause_frames:
+                    end = len(frames) - silent + self.padding_frames
+                    segment = self._emit(frames[:end], flags[:end])
+                    if segment is not None:
+                        yield segment
+
+                    padding.extend(frames[end:])
+                    frames, flags = [], []
+
+                elif len(frames) >= self.max_frames:
+                    # No pause long enough: cut at the quietest recent frame
+                    start = len(frames) - self.cut_window
+                    recent = np.sqrt([np.mean(f.astype(np.float32) ** 2) for f in frames[start:]])
+                    cut = start + int(np.argmin(recent)) + 1
+
+                    segment = self._emit(frames[:cut], flags[:cut])
+                    if segment is not None:
+                        yield segment
+
+                    frames, flags = frames[cut:], flags[cut:]
+                    silent = 0
+
+        if frames:
+            segment = self._emit(frames, flags)
+            if segment is not None:
+                yield segment
+
+    def summary(self):
+
+        captured = self.captured_frames * self.frame / self.recorder.sample_rate
+        passed = self.passed_frames * self.frame / self.recorder.sample_rate
+
+        return f"VAD sent {passed:.1f}s of {captured:.1f}s captured audio to Whisper"
+
 
 # ============================================================
 # Speech Transcriber Class
@@ -74,11 +342,34 @@ class SpeechTranscriber:
 
     def __init__(self, model_size):
         logger.info("Loading Whisper model...")
+        import whisper
+
         self.model = whisper.load_model(model_size)
         logger.info("Model loaded successfully")
 
     def transcribe(self, audio_data, sample_rate):
 
+        from whisper.audio import SAMPLE_RATE as WHISPER_RATE
+
+        # Whisper resamples only when decoding files; other rates go that way
+        if sample_rate != WHISPER_RATE:
+            return self.transcribe_file(audio_data, sample_rate)
+
+        # int16 -> float32 in [-1, 1): one allocation, scaled in place
+        if audio_data.ndim > 1 and audio_data.shape[1] > 1:
+            audio = audio_data.mean(axis=1, dtype=np.float32)
+        else:
+            audio = audio_data.reshape(-1).astype(np.float32)
+        audio *= 1 / 32768.0
+
+        result = self.model.transcribe(audio, fp16=self.model.device.type == "cuda")
+        return result["text"].strip()
+
+    def transcribe_file(self, audio_data, sample_rate):
+        """Round-trip through a temporary WAV decoded by ffmpeg (the original path)."""
+
+        import scipy.io.wavfile as wav
+
         # Use temporary file (not permanently saved)
         with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_audio:
             wav.write(temp_audio.name, sample_rate, audio_data)
@@ -92,35 +383,140 @@ class SpeechTranscriber:
         return text
 
 
+# ============================================================
+# Transcript Log (append-only)
+# ============================================================
+
+class TranscriptLog:
+    """
+    One JSON object per line. Appending costs the same however long the
+    session is, and a crash loses at most the line being written.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = Path(file_path)
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def append(self, record):
+
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+
+        with self._lock, open(self.file_path, "a", encoding="utf-8") as fh:
+            fh.write(line)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def read(self):
+
+        if not self.file_path.exists():
+            return []
+
+        with open(self.file_path, encoding="utf-8") as fh:
+            # A torn final line (crash mid-write) is skipped, not fatal
+            records = []
+            for line in fh:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    logger.warning("Skipping unreadable transcript line")
+            return records
+
+
 # ============================================================
 # Excel Logger Class
 # ============================================================
 
 class ExcelLogger:
+    """
+    Logs to the append-only transcript log; the Excel workbook is
+    re-exported from it in the background every ``compact_seconds`` (if
+    anything changed) and once more on close.
+    """
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, log_path=None, compact_seconds=COMPACT_SECONDS):
         self.file_path = Path(file_path)
+        self.transcript = TranscriptLog(log_path or self.file_path.with_suffix(".jsonl"))
+        self.compact_seconds = compact_seconds
+
+        self._exported = None
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._seed_from_workbook()
+
+    def _seed_from_workbook(self):
+        # First run after switching to the log: carry the old workbook over
+        if self.transcript.file_path.exists() or not self.file_path.exists():
+            return
+
+        import pandas as pd
+
+        existing = pd.read_excel(self.file_path)
+        for row in existing.itertuples(index=False):
+            self.transcript.append({"Timestamp": str(row.Timestamp), "Text": str(row.Text)})
+
+        logger.info(f"Seeded transcript log with {len(existing)} rows from {self.file_path}")
 
     def log(self, text):
 
         if not text:
             return
 
-        row = {
+        self.transcript.append({
             "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "Text": text,
-        }
+        })
 
-        df_new = pd.DataFrame([row])
+        logger.info(f"Logged text: {text}")
 
-        if self.file_path.exists():
-            df_existing = pd.read_excel(self.file_path)
-            df_updated = pd.concat([df_existing, df_new], ignore_index=True)
-        else:
-            df_updated = df_new
+    # --------------------------------------------------------
+
+    def export(self):
+        """Rewrite the workbook from the log if it grew since the last export."""
+
+        records = self.transcript.read()
+
+        if not records or len(records) == self._exported:
+            return False
+
+        tmp_path = self.file_path.with_name(self.file_path.stem + ".tmp.xlsx")
+        import pandas as pd
+
+        pd.DataFrame(records, columns=["Timestamp", "Text"]).to_excel(tmp_path, index=False)
+        os.replace(tmp_path, self.file_path)
+
+        self._exported = len(records)
+        logger.info(f"Exported {len(records)} lines to {self.file_path}")
+
+        return True
+
+    def _compact_loop(self):
+
+        while not self._stop.wait(self.compact_seconds):
+            try:
+                self.export()
+            except Exception as e:
+                # Excel may hold the file open; retry next period
+                logger.error(f"Export failed: {e}")
+
+    def start(self):
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._compact_loop, name="transcript-export", daemon=True)
+            self._thread.start()
 
-        df_updated.to_excel(self.file_path, index=False)
-        logger.info(f"Saved text to Excel: {text}")
+        return self
+
+    def close(self):
+
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self.export()
 
 
 # ============================================================
@@ -129,38 +525,111 @@ class ExcelLogger:
 
 class VoiceToTextSystem:
 
-    def __init__(self):
+    def __init__(self, model_size=MODEL_SIZE, output_file=OUTPUT_FILE, vad=VAD_ENABLED):
         self.recorder = AudioRecorder(SAMPLE_RATE, CHANNELS, RECORD_SECONDS)
-        self.transcriber = SpeechTranscriber(MODEL_SIZE)
-        self.logger = ExcelLogger(OUTPUT_FILE)
+        self.vad = VoiceActivityDetector(self.recorder) if vad else None
+        self.transcriber = SpeechTranscriber(model_size)
+        self.logger = ExcelLogger(output_file)
 
-    def run(self):
-        logger.info("Voice-to-Text system started")
-        logger.info("Press CTRL + C to stop")
+    # --------------------------------------------------------
+    # Pipeline stages: capture callback -> ring buffer -> VAD ->
+    # transcription worker -> text queue -> log writer
+    # --------------------------------------------------------
 
-        while True:
-            try:
-                audio_data = self.recorder.record()
+    def _transcribe_loop(self, texts):
 
-                text = self.transcriber.transcribe(audio_data, SAMPLE_RATE)
+        if self.vad is not None:
+            chunks = self.vad.segments()
+        else:
+            chunks = self.recorder.chunks()
+
+        try:
+            for audio_data in chunks:
+                try:
+                    text = self.transcriber.transcribe(audio_data, SAMPLE_RATE)
+                except Exception as e:
+                    logger.error(f"Error: {e}")
+                    continue
 
                 if text:
                     logger.info(f"Recognized: {text}")
-                    self.logger.log(text)
+                    # Blocks only if the writer is TEXT_QUEUE_SIZE lines behind
+                    texts.put(text)
+        finally:
+            texts.put(None)
+
+        if self.vad is not None:
+            logger.info(self.vad.summary())
+
+    def _write_loop(self, texts):
 
-            except KeyboardInterrupt:
-                logger.info("System stopped by user")
+        while True:
+            text = texts.get()
+            if text is None:
                 break
 
+            try:
+                self.logger.log(text)
             except Exception as e:
                 logger.error(f"Error: {e}")
 
+    def run(self):
+        logger.info("Voice-to-Text system started")
+        logger.info("Press CTRL + C to stop")
+
+        texts = queue.Queue(maxsize=TEXT_QUEUE_SIZE)
+
+        transcriber = threading.Thread(target=self._transcribe_loop, args=(texts,), name="transcriber")
+        writer = threading.Thread(target=self._write_loop, args=(texts,), name="transcript-writer")
+
+        self.logger.start()
+        self.recorder.start()
+        transcriber.start()
+        writer.start()
+
+        try:
+            while transcriber.is_alive():
+                transcriber.join(timeout=0.5)
+
+        except KeyboardInterrupt:
+            logger.info("System stopped by user")
+
+        finally:
+            # Stop capture; the worker finishes the buffered audio, then the writer drains
+            self.recorder.stop()
+            transcriber.join()
+            writer.join()
+
+            # Final export so the workbook holds the whole session
+            self.logger.close()
+
 
 # ============================================================
 # Entry Point
 # ============================================================
 
-if __name__ == "__main__":
-    system = VoiceToTextSystem()
+def parse_args(argv=None):
+
+    parser = argparse.ArgumentParser(description="Record and transcribe speech until CTRL + C")
+    parser.add_argument("--model", default=MODEL_SIZE, help=f"Whisper model size (default {MODEL_SIZE})")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="Excel workbook exported from the transcript log")
+    parser.add_argument("--no-vad", action="store_true", help=f"transcribe fixed {RECORD_SECONDS}s windows, silence included")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+
+    args = parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(message)s",
+    )
+
+    system = VoiceToTextSystem(args.model, args.output, vad=VAD_ENABLED and not args.no_vad)
     system.run()
-  
\ No newline at end of file
+
+
+if __name__ == "__main__":
+    main()
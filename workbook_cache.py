@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from instrumentation import span
+
+
+logger = logging.getLogger("WorkbookCache")
+
+
+# ================================================================
+# Columnar Sidecar Cache for Excel Workbooks
+# ================================================================
+class WorkbookCache:
+    """
+    Parses an Excel workbook once per file version and keeps a typed
+    Feather sidecar next to it. Later loads of the same version are
+    served from the sidecar with a memory-mapped read.
+
+    A version is identified by path, mtime, size and content hash.
+    mtime and size are checked first so an unchanged file is never
+    re-hashed; a touched-but-identical file re-uses its sidecar.
+    """
+
+    CACHE_DIR_NAME = ".workbook_cache"
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, cache_dir: str | Path | None = None):
+        env_dir = os.environ.get("WORKBOOK_CACHE_DIR")
+        self.cache_dir = Path(cache_dir or env_dir) if (cache_dir or env_dir) else None
+
+    # ------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------
+    def read_excel(self, file_path: str | Path, **kwargs) -> pd.DataFrame:
+
+        path = Path(file_path)
+
+        with span("excel_read", component="WorkbookCache", file=path.name) as timer:
+            df, source = self._read(path, kwargs)
+            timer.tag(source=source, rows=len(df) if isinstance(df, pd.DataFrame) else None)
+
+        return df
+
+    def _read(self, path: Path, kwargs: dict) -> tuple[pd.DataFrame, str]:
+
+        if not self._is_cacheable(kwargs):
+            return pd.read_excel(path, **kwargs), "bypass"
+
+        try:
+            sidecar = self._sidecar_path(path, kwargs)
+        except OSError as exc:
+            logger.warning("Workbook cache unavailable for %s: %s", path, exc)
+            return pd.read_excel(path, **kwargs), "bypass"
+
+        if sidecar.exists():
+            try:
+                table = feather.read_table(sidecar, memory_map=True)
+                logger.info("Loaded %s from sidecar cache", path.name)
+                return table.to_pandas(), "sidecar"
+            except (OSError, pa.ArrowInvalid) as exc:
+                logger.warning("Discarding unreadable sidecar %s: %s", sidecar, exc)
+                sidecar.unlink(missing_ok=True)
+
+        df = pd.read_excel(path, **kwargs)
+        self._write_sidecar(df, sidecar)
+
+        return df, "excel"
+
+    def fingerprint(self, file_path: str | Path) -> str:
+        """Content hash of the workbook's current version."""
+
+        path = Path(file_path)
+        cache_dir = self._cache_dir_for(path)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+        return self._version_hash(path, cache_dir, self._path_key(path))
+
+    def invalidate(self, file_path: str | Path) -> None:
+
+        path = Path(file_path)
+        cache_dir = self._cache_dir_for(path)
+        prefix = self._path_key(path)
+
+        for entry in cache_dir.glob(f"{prefix}-*"):
+            entry.unlink(missing_ok=True)
+
+    # ------------------------------------------------------------
+    # Keying
+    # ------------------------------------------------------------
+    @staticmethod
+    def _is_cacheable(kwargs: dict) -> bool:
+        """Multi-sheet reads return a dict and custom indexes are not
+        round-tripped, so both bypass the cache."""
+
+        sheet_name = kwargs.get("sheet_name", 0)
+        if sheet_name is None or isinstance(sheet_name, (list, tuple)):
+            return False
+
+        return kwargs.get("index_col") is None
+
+    def _cache_dir_for(self, path: Path) -> Path:
+        return self.cache_dir or path.resolve().parent / self.CACHE_DIR_NAME
+
+    @staticmethod
+    def _path_key(path: Path) -> str:
+        digest = hashlib.sha1(str(path.resolve()).encode("utf-8"))
+        return f"{path.stem}-{digest.hexdigest()[:12]}"
+
+    @staticmethod
+    def _options_key(kwargs: dict) -> str:
+        encoded = json.dumps(kwargs, sort_keys=True, default=repr)
+        return hashlib.sha1(encoded.encode("utf-8")).hexdigest()[:8]
+
+    def _content_hash(self, path: Path) -> str:
+
+        digest = hashlib.sha256()
+
+        with open(path, "rb") as fh:
+            for chunk in iter(lambda: fh.read(self.HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+
+        return digest.hexdigest()[:16]
+
+    def _sidecar_path(self, path: Path, kwargs: dict) -> Path:
+
+        cache_dir = self._cache_dir_for(path)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+        path_key = self._path_key(path)
+        content_hash = self._version_hash(path, cache_dir, path_key)
+        options_key = self._options_key(kwargs)
+
+        return cache_dir / f"{path_key}-{content_hash}-{options_key}.feather"
+
+    def _version_hash(self, path: Path, cache_dir: Path, path_key: str) -> str:
+
+        stat = path.stat()
+
+        # mtime/size → content hash, so unchanged files skip hashing
+        index_file = cache_dir / f"{path_key}-index.json"
+        content_hash = self._lookup_index(index_file, stat)
+
+        if content_hash is None:
+            content_hash = self._content_hash(path)
+            self._atomic_write_text(
+                index_file,
+                json.dumps({
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "content_hash": content_hash,
+                }),
+            )
+
+        return content_hash
+
+    @staticmethod
+    def _lookup_index(index_file: Path, stat: os.stat_result) -> Optional[str]:
+
+        try:
+            entry = json.loads(index_file.read_text())
+        except (OSError, ValueError):
+            return None
+
+        if entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size:
+            return entry.get("content_hash")
+
+        return None
+
+    # ------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------
+    def _write_sidecar(self, df: pd.DataFrame, sidecar: Path) -> None:
+
+        if not isinstance(df.index, pd.RangeIndex) or not all(
+            isinstance(col, str) for col in df.columns
+        ):
+            logger.info("Frame shape not cacheable; skipping sidecar for %s", sidecar.name)
+            return
+
+        tmp_path = sidecar.with_suffix(".tmp")
+
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            # Uncompressed so later reads can memory-map the buffers
+            feather.write_feather(table, tmp_path, compression="uncompressed")
+            os.replace(tmp_path, sidecar)
+        except (OSError, pa.ArrowInvalid, pa.ArrowTypeError, ValueError) as exc:
+            logger.warning("Could not write sidecar %s: %s", sidecar.name, exc)
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        self._prune_stale(sidecar)
+
+    @staticmethod
+    def _prune_stale(sidecar: Path) -> None:
+        """Drop sidecars for older versions of the same workbook/options."""
+
+        # stem layout: <path_key>-<content_hash>-<options_key>
+        path_key, _content_hash, options_key = sidecar.stem.rsplit("-", 2)
+
+        for entry in sidecar.parent.glob(f"{path_key}-*-{options_key}.feather"):
+            if entry != sidecar:
+                entry.unlink(missing_ok=True)
+
+    @staticmethod
+    def _atomic_write_text(target: Path, text: str) -> None:
+
+        tmp_path = target.with_suffix(".tmp")
+        tmp_path.write_text(text)
+        os.replace(tmp_path, target)
+
+
+# ================================================================
+# Module-level convenience
+# ================================================================
+_default_cache: Optional[WorkbookCache] = None
+
+
+def _default() -> WorkbookCache:
+
+    global _default_cache
+
+    if _default_cache is None:
+        _default_cache = WorkbookCache()
+
+    return _default_cache
+
+
+def read_excel_cached(file_path: str | Path, **kwargs) -> pd.DataFrame:
+    """Drop-in replacement for ``pd.read_excel`` backed by the sidecar cache."""
+    return _default().read_excel(file_path, **kwargs)
+
+
+def workbook_fingerprint(file_path: str | Path) -> str:
+    """Content hash of a workbook, re-hashed only when mtime or size change."""
+    return _default().fingerprint(file_path)